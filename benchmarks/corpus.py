@@ -0,0 +1,171 @@
+# benchmarks/corpus.py
+"""
+Synthetic Corpora for Benchmarks
+--------------------------------
+- Reddit posts, news articles and tweets with the same fields as
+  data/raw/*.json (and data/twitter.db rows for tweets)
+- Texts mention companies/symbols from the ticker universe (names, symbols
+  and cashtags), so the matcher and the LLM stub have something to find
+- A share of news articles are syndicated copies and a share of Reddit posts
+  are cross-posts, like the real feeds (near-duplicates for sentiment/dedup.py)
+- write_corpus() writes raw and processed (sentiment + tickers attached)
+  datasets plus a market_prices.json, as JSON or JSONL
+
+Generation is seeded, so the same size always yields the same corpus.
+"""
+
+import os
+import json
+import random
+import string
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from pipeline.jsonl import write_records
+
+UNIVERSE_FILE = "data/reference/ticker_universe.json"
+START = datetime(2025, 1, 1)
+SUBREDDITS = ["stocks", "wallstreetbets", "investing", "cryptocurrency"]
+NEWS_SOURCES = ["Reuters", "Bloomberg", "CNBC", "MarketWatch", "Yahoo Finance"]
+SENTIMENTS = ["Positive", "Neutral", "Negative"]
+
+POSITIVE = ["beats estimates", "surges", "rallies", "upgraded", "record revenue", "strong guidance"]
+NEGATIVE = ["misses estimates", "plunges", "downgraded", "faces probe", "cuts guidance", "sell-off"]
+NEUTRAL = ["reports earnings", "holds steady", "announces event", "files 10-Q", "trades flat"]
+FILLER = ("analysts said the market reaction was mixed as investors weighed rates inflation "
+          "and the broader outlook for the sector over the coming quarters while volumes stayed "
+          "near their average and options activity picked up into the close").split()
+
+
+def load_universe(path: str = UNIVERSE_FILE) -> Dict[str, List[str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        universe = json.load(f)
+    return {symbol: entry.get("aliases", []) + entry.get("case_sensitive_aliases", [])
+            for symbol, entry in universe.items()}
+
+
+class CorpusGenerator:
+    def __init__(self, seed: int = 0, duplicate_rate: float = 0.1, universe_path: str = UNIVERSE_FILE):
+        self.rng = random.Random(seed)
+        self.duplicate_rate = duplicate_rate
+        self.universe = load_universe(universe_path)
+        self.symbols = list(self.universe)
+
+    # ----------------------------------------------------------------- text
+    def _mention(self, symbol: str) -> str:
+        names = self.universe[symbol]
+        roll = self.rng.random()
+        if roll < 0.5 and names:
+            return self.rng.choice(names)
+        if roll < 0.8:
+            return "$" + symbol.split("-")[0]
+        return symbol
+
+    def _sentence(self):
+        symbols = self.rng.sample(self.symbols, k=self.rng.choice((1, 1, 1, 2)))
+        sentiment = self.rng.choice(SENTIMENTS)
+        phrase = self.rng.choice({"Positive": POSITIVE, "Negative": NEGATIVE, "Neutral": NEUTRAL}[sentiment])
+        subject = " and ".join(self._mention(s) for s in symbols)
+        return f"{subject} {phrase}", symbols, sentiment
+
+    def _filler(self, words: int) -> str:
+        return " ".join(self.rng.choice(FILLER) for _ in range(words))
+
+    def _time(self, i: int, n: int) -> datetime:
+        # Spread records over 90 days in arrival order
+        return START + timedelta(seconds=int(90 * 86400 * i / max(n, 1)) + self.rng.randrange(60))
+
+    def _id(self, length: int = 7) -> str:
+        return "".join(self.rng.choice(string.ascii_lowercase + string.digits) for _ in range(length))
+
+    # -------------------------------------------------------------- sources
+    def reddit(self, n: int, processed: bool = False) -> List[Dict]:
+        posts = []
+        for i in range(n):
+            if posts and self.rng.random() < self.duplicate_rate:
+                # Cross-post: same text in another subreddit
+                post = dict(self.rng.choice(posts), id=self._id(), subreddit=self.rng.choice(SUBREDDITS))
+            else:
+                title, symbols, sentiment = self._sentence()
+                post = {
+                    "id": self._id(),
+                    "created_utc": self._time(i, n).isoformat(),
+                    "title": title,
+                    "body": self._filler(self.rng.randint(20, 120)),
+                    "score": self.rng.randint(0, 5000),
+                    "num_comments": self.rng.randint(0, 800),
+                    "url": f"https://www.reddit.com/r/x/comments/{i}",
+                    "subreddit": self.rng.choice(SUBREDDITS),
+                }
+                if processed:
+                    post.update(sentiment=sentiment, tickers=symbols)
+            posts.append(post)
+        return posts
+
+    def news(self, n: int, processed: bool = False) -> List[Dict]:
+        articles = []
+        for i in range(n):
+            if articles and self.rng.random() < self.duplicate_rate:
+                # Syndicated copy of an earlier story under another outlet
+                article = dict(self.rng.choice(articles), source=self.rng.choice(NEWS_SOURCES),
+                               url=f"https://news.example.com/{self._id(12)}")
+            else:
+                title, symbols, sentiment = self._sentence()
+                description = self._filler(30)
+                article = {
+                    "title": title,
+                    "description": description,
+                    "content": description + " " + self._filler(60) + " [+2676 chars]",
+                    "published_at": self._time(i, n).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "source": self.rng.choice(NEWS_SOURCES),
+                    "url": f"https://news.example.com/{self._id(12)}",
+                }
+                if processed:
+                    article.update(sentiment=sentiment, tickers=symbols)
+            articles.append(article)
+        return articles
+
+    def tweets(self, n: int) -> List[Dict]:
+        tweets = []
+        for i in range(n):
+            text, _, _ = self._sentence()
+            tweets.append({
+                "id": str(10 ** 18 + i),
+                "text": f"{text} {self._filler(self.rng.randint(3, 25))}",
+                "created_at": self._time(i, n).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                "author_id": str(self.rng.randrange(10 ** 6)),
+                "lang": "en",
+            })
+        return tweets
+
+    def market_prices(self) -> Dict[str, Dict]:
+        as_of = (START + timedelta(days=90)).isoformat()
+        return {s: {"price": round(self.rng.uniform(5, 500), 2), "timestamp": as_of} for s in self.symbols}
+
+
+def write_corpus(out_dir: str, n: int, fmt: str = "json", seed: int = 0,
+                 duplicate_rate: float = 0.1) -> Dict[str, str]:
+    """
+    Write n records per source (raw and processed) under out_dir, laid out
+    like data/; returns the written paths by name.
+    """
+    gen = CorpusGenerator(seed, duplicate_rate)
+    ext = ".jsonl" if fmt == "jsonl" else ".json"
+    paths = {
+        "reddit_raw": os.path.join(out_dir, "raw", "reddit_posts" + ext),
+        "news_raw": os.path.join(out_dir, "raw", "news" + ext),
+        "tweets_raw": os.path.join(out_dir, "raw", "tweets" + ext),
+        "reddit_processed": os.path.join(out_dir, "processed", "reddit_with_sentiment" + ext),
+        "news_processed": os.path.join(out_dir, "processed", "news_with_sentiment" + ext),
+        "market_prices": os.path.join(out_dir, "processed", "market_prices.json"),
+    }
+    for path in paths.values():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_records(paths["reddit_raw"], gen.reddit(n))
+    write_records(paths["news_raw"], gen.news(n))
+    write_records(paths["tweets_raw"], gen.tweets(n))
+    write_records(paths["reddit_processed"], gen.reddit(n, processed=True))
+    write_records(paths["news_processed"], gen.news(n, processed=True))
+    with open(paths["market_prices"], "w", encoding="utf-8") as f:
+        json.dump(gen.market_prices(), f, indent=2)
+    return paths
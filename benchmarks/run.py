@@ -0,0 +1,385 @@
+# benchmarks/run.py
+"""
+Pipeline Benchmark Runner
+-------------------------
+- Stages: analyze (analyze_dataset against the stub LLM), extract
+  (extract_tickers), matcher (TickerMatcher.match over raw Reddit posts and
+  tweets, one core), prices (fetch_prices through OHLCVCache and the stub
+  price server, cold and warm), features (build_feature_dataset), model
+  (XGBoost training plus micro-batched prediction latency), local_model
+  (batched local sentiment inference on tweets, one core) and twitter
+  (the ingestion scheduler against a fake Twitter API: a backfill, then an
+  incremental refresh resumed per query, checked for missed tweets)
+- Each (stage, size) runs in a fresh spawned process on a synthetic corpus
+  (benchmarks/corpus.py), so peak RSS is measured per stage
+- Reports throughput (items/s), latency percentiles (per batch or request)
+  and peak memory as JSON; --baseline compares against an earlier result
+  and exits non-zero if a stage regressed beyond --tolerance
+
+Usage:
+  python -m benchmarks.run --sizes 1000 10000 --output benchmarks/results/latest.json
+  python -m benchmarks.run --sizes 1000 10000 --baseline benchmarks/results/baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.corpus import write_corpus
+from benchmarks.stubs import StubLLMServer, StubPriceServer
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+STAGES = ("analyze", "extract", "matcher", "prices", "features", "model", "local_model", "twitter")
+# Keywords searched by the twitter stage (phrases the synthetic tweets use)
+TWITTER_QUERIES = ("surges", "plunges", "rallies", "upgraded", "downgraded", "earnings")
+# Higher is better for throughput, lower for latency and memory
+COMPARED_METRICS = {"throughput": "higher", "p99_ms": "lower", "peak_rss_mb": "lower"}
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _latency_summary(latencies: List[float]) -> Dict:
+    if not latencies:
+        return {}
+    p50, p99 = np.percentile(np.array(latencies) * 1000, [50, 99])
+    return {"p50_ms": round(float(p50), 3), "p99_ms": round(float(p99), 3)}
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# --------------------------------------------------------------------------- #
+# Stages (each runs inside a spawned worker process)
+# --------------------------------------------------------------------------- #
+
+def bench_analyze(paths: Dict, options: Dict) -> Dict:
+    os.environ["OPENAI_API_BASE"] = options["llm_url"] + "/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    from pipeline import metrics
+    from pipeline.jsonl import iter_records
+    from sentiment.llm_analyzer import analyze_dataset
+
+    # LLM calls and tokens come from the instrumentation counters
+    metrics.enable()
+    records = list(iter_records(paths["reddit_raw"]))[:options["llm_max_items"]]
+    latencies = []
+    started = time.perf_counter()
+    for batch in _chunks(records, options["batch_size"]):
+        t0 = time.perf_counter()
+        analyze_dataset(batch, text_fields=("title", "body"), max_workers=options["llm_workers"],
+                        pack_tokens=options.get("llm_pack_tokens", 0))
+        latencies.append(time.perf_counter() - t0)
+    seconds = time.perf_counter() - started
+    usage = metrics.REGISTRY.to_dict()
+    calls = sum(t["count"] for t in usage["timers"] if t["name"] == "external_call_seconds")
+    tokens = sum(c["value"] for c in usage["counters"] if c["name"] == "llm_tokens_total")
+    return {"items": len(records), "seconds": seconds, "llm_calls": calls, "llm_tokens": int(tokens),
+            **_latency_summary(latencies)}
+
+
+def bench_extract(paths: Dict, options: Dict) -> Dict:
+    from market.price_fetcher import extract_tickers
+    from market.ticker_matcher import TickerMatcher, UNIVERSE_FILE
+
+    files = [paths["reddit_processed"], paths["news_processed"]]
+    matcher = TickerMatcher.from_file(UNIVERSE_FILE)
+    started = time.perf_counter()
+    tickers = extract_tickers(files, matcher)
+    return {"items": 2 * options["size"], "seconds": time.perf_counter() - started, "tickers": len(tickers)}
+
+
+def bench_matcher(paths: Dict, options: Dict) -> Dict:
+    from pipeline.jsonl import iter_records
+    from market.ticker_matcher import TickerMatcher, UNIVERSE_FILE
+
+    matcher = TickerMatcher.from_file(UNIVERSE_FILE)
+    texts = {
+        "reddit": [f"{r['title']} {r['body']}" for r in iter_records(paths["reddit_raw"])],
+        "tweets": [t["text"] for t in iter_records(paths["tweets_raw"])],
+    }
+    result = {"items": 0, "seconds": 0.0}
+    for kind, batch in texts.items():
+        started = time.perf_counter()
+        for text in batch:
+            matcher.match(text)
+        elapsed = time.perf_counter() - started
+        result[f"{kind}_per_second"] = round(len(batch) / elapsed) if elapsed > 0 else None
+        result["items"] += len(batch)
+        result["seconds"] += elapsed
+    return result
+
+
+def bench_prices(paths: Dict, options: Dict) -> Dict:
+    from market.price_cache import OHLCVCache
+    from market.price_fetcher import fetch_prices
+    from benchmarks.stubs import HTTPPriceProvider
+
+    # Price requests scale with the ticker count, not the corpus size
+    tickers = [f"SYM{i:05d}" for i in range(options["tickers"])]
+    cache = OHLCVCache(HTTPPriceProvider(options["price_url"]), os.path.join(paths["workdir"], "ohlcv.db"))
+    timings = {}
+    for label in ("cold", "warm"):
+        t0 = time.perf_counter()
+        fetch_prices(tickers, cache=cache)
+        timings[f"{label}_seconds"] = round(time.perf_counter() - t0, 4)
+    cache.close()
+    return {"items": len(tickers), "seconds": timings["cold_seconds"], **timings}
+
+
+def bench_features(paths: Dict, options: Dict) -> Dict:
+    import models.feature_engineering as fe
+
+    # Point the builder at the synthetic corpus instead of data/processed
+    fe.SENTIMENT_FILES = [paths["reddit_processed"], paths["news_processed"]]
+    fe.MARKET_FILE = paths["market_prices"]
+    started = time.perf_counter()
+    df = fe.build_feature_dataset()
+    return {"items": 2 * options["size"], "seconds": time.perf_counter() - started, "rows": len(df)}
+
+
+def bench_model(paths: Dict, options: Dict) -> Dict:
+    import pandas as pd
+    from concurrent.futures import ThreadPoolExecutor
+    from models.xgboost_model import MicroBatcher, Predictor, train
+
+    rows = options["size"]
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "ticker": rng.choice(["AAPL", "TSLA", "NVDA"], rows),
+        "timestamp": pd.date_range("2025-01-01", periods=rows, freq="min"),
+        "avg_sentiment": rng.uniform(0, 2, rows),
+        "mentions": rng.integers(0, 50, rows),
+        "sentiment_1h": rng.uniform(0, 2, rows),
+        "sentiment_ewm_1d": rng.uniform(0, 2, rows),
+        "rsi_14": rng.uniform(0, 100, rows),
+    })
+    model_dir = os.path.join(paths["workdir"], "model")
+    started = time.perf_counter()
+    train(df, model_dir, params={"n_estimators": 100})
+    train_seconds = time.perf_counter() - started
+
+    batcher = MicroBatcher(Predictor.load(model_dir))
+    requests_ = df.drop(columns=["ticker", "timestamp"]).head(options["requests"]).to_dict("records")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        list(pool.map(batcher.predict, requests_))
+    predict_seconds = time.perf_counter() - started
+    stats = batcher.stats.summary()
+    batcher.close()
+    return {"items": len(requests_), "seconds": predict_seconds, "train_seconds": round(train_seconds, 4),
+            "p50_ms": stats.get("p50_ms"), "p99_ms": stats.get("p99_ms"), "avg_batch": stats.get("avg_batch")}
+
+
+def bench_local_model(paths: Dict, options: Dict) -> Dict:
+    from pipeline.jsonl import iter_records
+    from sentiment.local_model import train, throughput
+
+    texts, labels = [], []
+    for record in iter_records(paths["reddit_processed"]):
+        texts.append(f"{record['title']} {record['body']}")
+        labels.append(record["sentiment"])
+    started = time.perf_counter()
+    model, _ = train(texts, labels)
+    train_seconds = time.perf_counter() - started
+
+    tweets = [t["text"] for t in iter_records(paths["tweets_raw"])]
+    n = max(100_000, len(tweets))
+    started = time.perf_counter()
+    throughput(model, tweets, n=n)
+    return {"items": n, "seconds": time.perf_counter() - started, "train_seconds": round(train_seconds, 4),
+            "mean_chars": round(sum(map(len, tweets)) / max(len(tweets), 1), 1)}
+
+
+def bench_twitter(paths: Dict, options: Dict) -> Dict:
+    from benchmarks.stubs import StubTwitterServer
+    from ingestion.scheduler import IngestionScheduler, TwitterSource, pooled_session
+    from ingestion.twitter import SQLiteStorage, TwitterIngestor
+    from pipeline.jsonl import iter_records
+
+    tweets = list(iter_records(paths["tweets_raw"]))
+    storage = SQLiteStorage(os.path.join(paths["workdir"], "twitter.db"))
+    stream = os.path.join(paths["workdir"], "raw", "stream.jsonl")
+    result = {"items": 0, "seconds": 0.0, "missed": 0, "refetched": 0}
+    # Half the tweets exist for the backfill, the rest arrive before the incremental refresh
+    with StubTwitterServer(tweets, options.get("twitter_latency_ms", 20.0), released=len(tweets) // 2) as api:
+        ingestor = TwitterIngestor(bearer_token="stub", storage=storage, search_url=api.search_url,
+                                   session=pooled_session(options.get("twitter_workers", 4)))
+        source = TwitterSource(TWITTER_QUERIES, max_results=len(tweets), requests_per_minute=60_000,
+                               max_concurrency=options.get("twitter_workers", 4), ingestor=ingestor)
+        known = set()
+        for label in ("backfill", "incremental"):
+            if label == "incremental":
+                api.release()
+            expected = {t["id"] for q in TWITTER_QUERIES for t in api.matching(q)} - known
+            requests_before = api.requests
+            t0 = time.perf_counter()
+            count = IngestionScheduler([source], stream).run()["twitter"]
+            seconds = time.perf_counter() - t0
+            fetched = {r["record_id"] for r in iter_records(stream)} - known
+            result.update({f"{label}_seconds": round(seconds, 4), f"{label}_records": count,
+                           f"{label}_requests": api.requests - requests_before})
+            result["missed"] += len(expected - fetched)
+            # Records of an earlier round fetched again (a since_id that did not hold)
+            result["refetched"] += count - len(fetched)
+            result["items"] += count
+            result["seconds"] += seconds
+            known |= fetched
+    storage.conn.close()
+    return result
+
+
+STAGE_FUNCS: Dict[str, Callable] = {
+    "analyze": bench_analyze,
+    "extract": bench_extract,
+    "matcher": bench_matcher,
+    "prices": bench_prices,
+    "features": bench_features,
+    "model": bench_model,
+    "local_model": bench_local_model,
+    "twitter": bench_twitter,
+}
+
+
+def _run_stage(stage: str, paths: Dict, options: Dict) -> Dict:
+    """Worker entry point: run one stage and attach throughput and memory figures."""
+    rss_before = _peak_rss_mb()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        result = STAGE_FUNCS[stage](paths, options)
+    result["throughput"] = round(result["items"] / result["seconds"], 2) if result["seconds"] > 0 else None
+    result["seconds"] = round(result["seconds"], 4)
+    result["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    result["rss_growth_mb"] = round(result["peak_rss_mb"] - rss_before, 1)
+    return result
+
+
+# --------------------------------------------------------------------------- #
+# Runner and baseline comparison
+# --------------------------------------------------------------------------- #
+
+def run_benchmarks(sizes: List[int], stages=STAGES, options: Dict = None, fmt: str = "jsonl") -> Dict:
+    options = dict(options or {})
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with StubLLMServer(options.get("llm_latency_ms", 50.0), options.get("llm_jitter_ms", 0.0)) as llm, \
+            StubPriceServer(options.get("price_latency_ms", 20.0)) as prices, \
+            tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        options.update(llm_url=llm.url, price_url=prices.url)
+        for size in sizes:
+            workdir = os.path.join(tmp, str(size))
+            t0 = time.perf_counter()
+            paths = write_corpus(workdir, size, fmt=fmt)
+            paths["workdir"] = workdir
+            print(f"[INFO] Generated {size} records per source in {time.perf_counter() - t0:.1f}s")
+            for stage in stages:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    try:
+                        result = pool.submit(_run_stage, stage, paths, {**options, "size": size}).result()
+                    except Exception as e:
+                        result = {"error": f"{type(e).__name__}: {e}"}
+                results.append({"stage": stage, "size": size, **result})
+                print(f"[INFO] {stage} @ {size}: {_describe(result)}")
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "options": {k: v for k, v in options.items() if not k.endswith("_url")},
+        "results": results,
+    }
+
+
+def _describe(result: Dict) -> str:
+    if "error" in result:
+        return f"ERROR {result['error']}"
+    parts = [f"{result['throughput']} items/s", f"{result['seconds']}s", f"peak {result['peak_rss_mb']}MB"]
+    if result.get("p99_ms") is not None:
+        parts.append(f"p50 {result['p50_ms']}ms / p99 {result['p99_ms']}ms")
+    if result.get("llm_calls") is not None:
+        parts.append(f"{result['llm_calls']} LLM calls / {result['llm_tokens']} tokens")
+    if result.get("missed") is not None:
+        parts.append(f"{result['missed']} missed / {result['refetched']} refetched")
+    return ", ".join(parts)
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float = 0.1) -> List[Dict]:
+    """Per (stage, size, metric) changes vs the baseline; `regressed` marks changes beyond tolerance."""
+    base = {(r["stage"], r["size"]): r for r in baseline.get("results", []) if "error" not in r}
+    rows = []
+    for r in current["results"]:
+        old = base.get((r["stage"], r["size"]))
+        if old is None or "error" in r:
+            continue
+        for metric, better in COMPARED_METRICS.items():
+            if r.get(metric) is None or not old.get(metric):
+                continue
+            change = (r[metric] - old[metric]) / old[metric]
+            regressed = change < -tolerance if better == "higher" else change > tolerance
+            rows.append({"stage": r["stage"], "size": r["size"], "metric": metric, "baseline": old[metric],
+                         "current": r[metric], "change_pct": round(change * 100, 1), "regressed": regressed})
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--format", choices=("json", "jsonl"), default="jsonl")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--llm-workers", type=int, default=16)
+    parser.add_argument("--llm-max-items", type=int, default=2000,
+                        help="Cap on records sent through the LLM stage per size")
+    parser.add_argument("--llm-pack-tokens", type=int, default=0,
+                        help="Prompt token budget for packed multi-document requests (0 = one text per request)")
+    parser.add_argument("--price-latency-ms", type=float, default=20.0)
+    parser.add_argument("--twitter-latency-ms", type=float, default=20.0)
+    parser.add_argument("--twitter-workers", type=int, default=4, help="Concurrent Twitter queries")
+    parser.add_argument("--tickers", type=int, default=500, help="Tickers requested by the prices stage")
+    parser.add_argument("--requests", type=int, default=5000, help="Prediction requests in the model stage")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", default=None, help="Earlier result JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, args.stages, {
+        "llm_latency_ms": args.llm_latency_ms, "llm_jitter_ms": args.llm_jitter_ms,
+        "llm_workers": args.llm_workers, "llm_max_items": args.llm_max_items,
+        "llm_pack_tokens": args.llm_pack_tokens,
+        "price_latency_ms": args.price_latency_ms, "tickers": args.tickers,
+        "twitter_latency_ms": args.twitter_latency_ms, "twitter_workers": args.twitter_workers,
+        "requests": args.requests, "batch_size": args.batch_size,
+    }, fmt=args.format)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f), args.tolerance)
+        for row in report["comparison"]:
+            flag = "REGRESSION" if row["regressed"] else "ok"
+            print(f"[{flag}] {row['stage']} @ {row['size']} {row['metric']}: "
+                  f"{row['baseline']} -> {row['current']} ({row['change_pct']:+}%)")
+        regressions = [row for row in report["comparison"] if row["regressed"]]
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] Results -> {args.output}")
+    sys.exit(1 if regressions else 0)
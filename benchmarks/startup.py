@@ -0,0 +1,85 @@
+# benchmarks/startup.py
+"""
+CLI Cold-Start Budgets
+----------------------
+- Times `python -m cli --help` and `python -m cli <command> --help` in fresh
+  interpreters (import + argument parsing, no work), best of --repeat runs
+- Each is checked against a budget: 300 ms for the top-level help, more for
+  commands whose module needs numpy/pandas; exits non-zero if one is over
+- `-X importtime` for a command shows which import blew its budget
+
+Usage:
+  python -m benchmarks.startup
+  python -m benchmarks.startup --commands analyze features --repeat 10
+  python -m benchmarks.startup --budget features=800 --output benchmarks/results/startup.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Optional
+
+from cli import COMMANDS
+
+# Milliseconds; commands not listed get DEFAULT_BUDGET_MS
+HELP_BUDGET_MS = 300
+DEFAULT_BUDGET_MS = 1500
+BUDGETS_MS = {
+    "ingest": 600, "news": 600, "reddit": 600, "twitter": 600, "analyze": 600,
+    "startup": 300,
+}
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_command(args: List[str], repeat: int = 5) -> Dict:
+    """Wall time of `python -m cli <args>` in fresh interpreters."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-m", "cli", *args], cwd=ROOT,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        samples.append((time.perf_counter() - t0) * 1000)
+        if proc.returncode != 0:
+            return {"error": proc.stderr.decode("utf-8", "replace").strip().splitlines()[-1:]}
+    return {"best_ms": round(min(samples), 1), "median_ms": round(statistics.median(samples), 1)}
+
+
+def measure(commands: Optional[List[str]] = None, repeat: int = 5, budgets: Dict[str, float] = None) -> List[Dict]:
+    budgets = {**BUDGETS_MS, **(budgets or {})}
+    rows = [{"command": "--help", "budget_ms": budgets.get("--help", HELP_BUDGET_MS), **time_command(["--help"], repeat)}]
+    for command in commands or list(COMMANDS):
+        rows.append({"command": command, "budget_ms": budgets.get(command, DEFAULT_BUDGET_MS),
+                     **time_command([command, "--help"], repeat)})
+    for row in rows:
+        row["ok"] = "error" not in row and row["best_ms"] <= row["budget_ms"]
+    return rows
+
+
+def _budget(value: str):
+    name, _, ms = value.partition("=")
+    return name, float(ms)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commands", nargs="+", choices=list(COMMANDS), default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=_budget, action="append", default=[],
+                        help="Override a budget, e.g. features=800 or --help=250")
+    parser.add_argument("--output", default=None, help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    rows = measure(args.commands, args.repeat, dict(args.budget))
+    for row in rows:
+        status = "ok" if row["ok"] else "OVER" if "error" not in row else f"ERROR {row['error']}"
+        timing = f"{row['best_ms']:8.1f} ms (median {row['median_ms']:.1f})" if "best_ms" in row else " " * 8
+        print(f"{row['command']:<14} {timing}  budget {row['budget_ms']:.0f} ms  {status}")
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    sys.exit(0 if all(row["ok"] for row in rows) else 1)
@@ -0,0 +1,259 @@
+# benchmarks/stubs.py
+"""
+Local Stub Services for Benchmarks
+----------------------------------
+- StubLLMServer: OpenAI-compatible POST /v1/chat/completions answering the
+  sentiment prompt with valid JSON (tickers found by the local matcher) after
+  a configurable latency; an error rate makes it answer 429 with Retry-After.
+  Packed prompts (sentiment/packing.py) get a JSON array keyed by document id
+- StubPriceServer: GET /ohlcv?tickers=...&start=...&end=... returning
+  synthetic daily bars after a configurable latency
+- StubTwitterServer: Twitter API v2 GET /2/tweets/search/recent over a
+  fixed set of tweets (keyword match, since_id/until_id, max_results/next_token
+  paging, x-rate-limit-* headers); release() makes more of them visible
+  so incremental fetches can be measured
+- HTTPPriceProvider: market.providers.PriceProvider backed by the stub, so
+  fetch_prices/OHLCVCache run unchanged against it
+
+Point the LLM client at the stub with OPENAI_API_BASE=<server.url>/v1.
+"""
+
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+import requests
+
+from market.providers import OHLCV_COLUMNS, PriceProvider, empty_ohlcv
+from market.ticker_matcher import TickerMatcher, UNIVERSE_FILE
+
+SENTIMENTS = ["Negative", "Neutral", "Positive"]
+
+
+class StubServer:
+    """Threaded local HTTP server run in the background; use as a context manager."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def delay(self):
+        with self._lock:
+            self.requests += 1
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+
+    def handle(self, method: str, path: str, query: Dict, body: bytes):
+        """Return (status, headers, payload)."""
+        raise NotImplementedError
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _serve(self, method):
+                parsed = urlparse(self.path)
+                length = int(self.headers.get("Content-Length", 0) or 0)
+                body = self.rfile.read(length) if length else b""
+                status, headers, payload = server.handle(method, parsed.path, parse_qs(parsed.query), body)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                for name, value in {**headers, "Content-Type": "application/json"}.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class StubLLMServer(StubServer):
+    """Chat-completions stub; sentiment is a stable hash of the prompt text."""
+
+    def __init__(self, latency_ms: float = 50.0, jitter_ms: float = 0.0, error_rate: float = 0.0, **kwargs):
+        super().__init__(latency_ms, jitter_ms, **kwargs)
+        self.error_rate = error_rate
+        self.matcher = TickerMatcher.from_file(UNIVERSE_FILE)
+
+    def handle(self, method, path, query, body):
+        if method != "POST" or not path.endswith("/chat/completions"):
+            return 404, {}, {"error": {"message": "not found"}}
+        self.delay()
+        if self.error_rate and random.random() < self.error_rate:
+            return 429, {"Retry-After": "0.1"}, {"error": {"message": "rate limited", "type": "rate_limit"}}
+        request = json.loads(body or b"{}")
+        prompt = request["messages"][-1]["content"]
+        documents = self._documents(prompt)
+        if documents:
+            answer = [{"id": doc["id"], **self._analyze(doc["text"])} for doc in documents]
+        else:
+            answer = self._analyze(prompt)
+        prompt_tokens = len(prompt) // 4 + 1
+        completion_tokens = len(json.dumps(answer)) // 4 + 1
+        return 200, {}, {
+            "id": f"chatcmpl-stub-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": json.dumps(answer)}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def _analyze(self, text: str) -> Dict:
+        return {"sentiment": SENTIMENTS[zlib.crc32(text.encode("utf-8")) % 3], "tickers": self.matcher.match(text)}
+
+    @staticmethod
+    def _documents(prompt: str) -> List[Dict]:
+        """The {"id", "text"} lines of a packed prompt (none for a single-text prompt)."""
+        documents = []
+        for line in prompt.splitlines():
+            if line.startswith('{"id"'):
+                try:
+                    documents.append(json.loads(line))
+                except ValueError:
+                    continue
+        return documents
+
+
+class StubPriceServer(StubServer):
+    """Synthetic daily OHLCV bars; a ticker's series is seeded by its symbol."""
+
+    def handle(self, method, path, query, body):
+        if path != "/ohlcv":
+            return 404, {}, {"error": "not found"}
+        self.delay()
+        tickers = query.get("tickers", [""])[0].split(",")
+        days = pd.date_range(pd.Timestamp(query["start"][0]).normalize(), pd.Timestamp(query["end"][0]),
+                             freq="B", inclusive="left")
+        result = {}
+        for ticker in filter(None, tickers):
+            rng = np.random.default_rng(zlib.crc32(ticker.encode("utf-8")))
+            # Same random walk for a ticker regardless of the requested range
+            offset = (days - pd.Timestamp("2000-01-03")).days.to_numpy() if len(days) else np.array([], dtype=int)
+            close = 100 * np.exp(0.01 * np.sin(offset / 7.0 + rng.uniform(0, 6)) + offset * 1e-4)
+            result[ticker] = {
+                "index": [d.isoformat() for d in days],
+                "Open": close.tolist(), "High": (close * 1.01).tolist(), "Low": (close * 0.99).tolist(),
+                "Close": close.tolist(), "Volume": [1e6] * len(days),
+            }
+        return 200, {}, result
+
+
+class StubTwitterServer(StubServer):
+    """Recent-search stub; only the first `released` tweets (in ID order) exist yet."""
+
+    SEARCH_PATH = "/2/tweets/search/recent"
+
+    def __init__(self, tweets: List[Dict], latency_ms: float = 20.0, jitter_ms: float = 0.0,
+                 released: Optional[int] = None, **kwargs):
+        super().__init__(latency_ms, jitter_ms, **kwargs)
+        self.tweets = sorted(tweets, key=lambda t: int(t["id"]))
+        self.released = len(self.tweets) if released is None else released
+        self._lowered = [t["text"].lower() for t in self.tweets]
+
+    @property
+    def search_url(self) -> str:
+        return self.url + self.SEARCH_PATH
+
+    def release(self, n: Optional[int] = None):
+        """Make n more tweets (default: all) visible to searches."""
+        self.released = len(self.tweets) if n is None else min(len(self.tweets), self.released + n)
+
+    def matching(self, keyword: str, since_id: Optional[str] = None, until_id: Optional[str] = None) -> List[Dict]:
+        """
+        Released tweets containing keyword, newer than since_id and older than
+        until_id, newest first (as the API pages).
+        """
+        keyword, since = keyword.lower(), int(since_id or 0)
+        until = int(until_id) if until_id else None
+        found = [t for t, text in zip(self.tweets[:self.released], self._lowered) if keyword in text
+                 and int(t["id"]) > since and (until is None or int(t["id"]) < until)]
+        return found[::-1]
+
+    def handle(self, method, path, query, body):
+        if method != "GET" or path != self.SEARCH_PATH:
+            return 404, {}, {"title": "Not Found"}
+        self.delay()
+        # "<keyword> lang:en" -> keyword; operators other than lang: are not supported
+        keyword = " ".join(w for w in query.get("query", [""])[0].split() if not w.startswith("lang:"))
+        found = self.matching(keyword, query.get("since_id", [None])[0], query.get("until_id", [None])[0])
+        offset = int(query.get("next_token", ["0"])[0])
+        size = max(10, min(int(query.get("max_results", ["10"])[0]), 100))
+        page = found[offset:offset + size]
+        meta = {"result_count": len(page)}
+        if page:
+            meta.update(newest_id=page[0]["id"], oldest_id=page[-1]["id"])
+        if offset + size < len(found):
+            meta["next_token"] = str(offset + size)
+        headers = {"x-rate-limit-remaining": "1000", "x-rate-limit-reset": str(int(time.time()) + 900)}
+        return 200, headers, {"data": page, "meta": meta} if page else {"meta": meta}
+
+
+class HTTPPriceProvider(PriceProvider):
+    """PriceProvider that requests batches of tickers from a StubPriceServer."""
+
+    def __init__(self, base_url: str, batch_size: int = 200, session: Optional[requests.Session] = None):
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = batch_size
+        self.session = session or requests.Session()
+
+    def fetch_ohlcv(self, tickers: List[str], start, end, interval="1d") -> Dict[str, pd.DataFrame]:
+        results = {}
+        for i in range(0, len(tickers), self.batch_size):
+            batch = tickers[i:i + self.batch_size]
+            response = self.session.get(f"{self.base_url}/ohlcv", params={
+                "tickers": ",".join(batch), "start": pd.Timestamp(start).isoformat(),
+                "end": pd.Timestamp(end).isoformat(), "interval": interval,
+            }, timeout=30)
+            response.raise_for_status()
+            for ticker, data in response.json().items():
+                if not data["index"]:
+                    results[ticker] = empty_ohlcv()
+                    continue
+                frame = pd.DataFrame({c: data[c] for c in OHLCV_COLUMNS}, index=pd.DatetimeIndex(data["index"]))
+                results[ticker] = frame
+        return results
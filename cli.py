@@ -0,0 +1,65 @@
+# cli.py
+"""
+Single Command-Line Entry Point
+-------------------------------
+- One command with subcommands for every pipeline step; each subcommand runs
+  the step's own module CLI (same arguments as `python -m <module>`)
+- Only the chosen subcommand's module is imported, so `--help` and light
+  commands never load pandas/pyarrow/xgboost, and credentials are only
+  needed by the commands that use them
+- `startup` measures cold start per subcommand against budgets
+  (benchmarks/startup.py)
+
+Usage:
+  python -m cli --help
+  python -m cli analyze --incremental
+  python -m cli features --help
+"""
+
+import sys
+import runpy
+
+# subcommand -> (module run as __main__, description)
+COMMANDS = {
+    "ingest": ("ingestion.scheduler", "Fetch News, Reddit and Twitter into the record stream"),
+    "news": ("ingestion.news", "Fetch news articles (NewsAPI)"),
+    "reddit": ("ingestion.reddit", "Fetch Reddit posts"),
+    "twitter": ("ingestion.twitter", "Fetch recent tweets into the local tweet DB"),
+    "analyze": ("main", "LLM sentiment and tickers for raw Reddit/News data"),
+    "local-model": ("sentiment.local_model", "Train/evaluate the local sentiment tier"),
+    "prices": ("market.price_fetcher", "Latest prices for mentioned tickers"),
+    "features": ("models.feature_engineering", "Build the feature dataset"),
+    "model": ("models.xgboost_model", "Train, predict or serve the XGBoost signal model"),
+    "walk-forward": ("models.walk_forward", "Walk-forward / purged CV over a parameter grid"),
+    "backtest": ("models.backtest", "Backtest a sentiment signal"),
+    "daemon": ("pipeline.daemon", "Streaming daemon: ingest -> analyze -> signals"),
+    "bench": ("benchmarks.run", "Pipeline benchmarks against local stubs"),
+    "startup": ("benchmarks.startup", "Measure CLI cold start against budgets"),
+}
+
+
+def usage() -> str:
+    width = max(len(name) for name in COMMANDS)
+    lines = ["usage: python -m cli <command> [options]", "", "commands:"]
+    lines += [f"  {name.ljust(width)}  {description}" for name, (_, description) in COMMANDS.items()]
+    lines += ["", "Run `python -m cli <command> --help` for a command's options."]
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"unknown command: {command}\n\n{usage()}", file=sys.stderr)
+        return 2
+    # The module sees its own arguments, exactly as with `python -m <module>`
+    sys.argv = [sys.argv[0], *rest]
+    runpy.run_module(COMMANDS[command][0], run_name="__main__", alter_sys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,35 +6,15 @@ News Ingestion Script for AI Trading Bot
 - Saves results to JSON file for sentiment analysis
 """
 
-import os
-import json
 import requests
-from datetime import datetime
-from dotenv import load_dotenv
-
-# Load API key from .env
-load_dotenv()
-NEWS_API_KEY = os.getenv("NEWS_API_KEY")
-
-if not NEWS_API_KEY:
-    raise ValueError("Missing NEWS_API_KEY. Please add it to .env")
+from pipeline.env import require_env
+from pipeline.jsonl import write_records
+from pipeline import metrics
 
 BASE_URL = "https://newsapi.org/v2/everything"
 
-def fetch_news(keywords, limit=20):
-    """Fetch news articles containing given keywords."""
-    query = " OR ".join(keywords)
-    params = {
-        "q": query,
-        "apiKey": NEWS_API_KEY,
-        "language": "en",
-        "sortBy": "publishedAt",
-        "pageSize": limit
-    }
-    response = requests.get(BASE_URL, params=params)
-    response.raise_for_status()
-    data = response.json()
-    
+def parse_articles(data):
+    """Convert a NewsAPI response body into article records."""
     results = []
     for article in data.get("articles", []):
         results.append({
@@ -47,13 +27,47 @@ def fetch_news(keywords, limit=20):
         })
     return results
 
-def save_news_to_json(news, output_path="data/raw/news.json"):
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(news, f, indent=2, ensure_ascii=False)
-    print(f"[INFO] Saved {len(news)} news articles to {output_path}")
+def fetch_news(keywords, limit=20, session=None, rate_budget=None):
+    """
+    Fetch news articles containing given keywords.
+    A shared requests.Session and ingestion.rate_budget.RateBudget may be passed in.
+    Raises ValueError if NEWS_API_KEY is not set (environment or .env).
+    """
+    query = " OR ".join(keywords)
+    params = {
+        "q": query,
+        "apiKey": require_env("NEWS_API_KEY", "Please add it to .env"),
+        "language": "en",
+        "sortBy": "publishedAt",
+        "pageSize": limit
+    }
+    if rate_budget:
+        rate_budget.acquire()
+    with metrics.span("external_call", service="newsapi"):
+        response = (session or requests).get(BASE_URL, params=params, timeout=15)
+        if rate_budget:
+            rate_budget.observe(response.headers, response.status_code)
+        response.raise_for_status()
+    articles = parse_articles(response.json())
+    metrics.inc("items_total", len(articles), stage="ingest", source="news")
+    return articles
+
+def save_news_to_json(news, output_path="data/raw/news.json", append=False):
+    """
+    Save news articles as a JSON array, or as JSONL for .jsonl/.jsonl.gz/.jsonl.zst
+    paths (where append=True adds to the existing file instead of rewriting it).
+    """
+    count = write_records(output_path, news, append=append)
+    print(f"[INFO] Saved {count} news articles to {output_path}")
 
 if __name__ == "__main__":
-    KEYWORDS = ["Tesla", "Bitcoin", "Apple", "Microsoft"]
-    news = fetch_news(KEYWORDS, limit=30)
-    save_news_to_json(news)
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keywords", nargs="+", default=["Tesla", "Bitcoin", "Apple", "Microsoft"])
+    parser.add_argument("--limit", type=int, default=30)
+    parser.add_argument("--output", default="data/raw/news.json")
+    args = parser.parse_args()
+
+    news = fetch_news(args.keywords, limit=args.limit)
+    save_news_to_json(news, args.output)
@@ -0,0 +1,70 @@
+# ingestion/rate_budget.py
+"""
+Header-driven rate budgets for ingestion sources
+-------------------------------------------------
+- Token bucket per source (configured requests/minute)
+- observe() reads provider rate-limit headers (Twitter x-rate-limit-*,
+  Reddit x-ratelimit-*, generic Retry-After) and slows or pauses the
+  source until the advertised reset instead of sleeping blindly
+"""
+
+import threading
+import time
+from typing import Mapping, Optional
+
+from sentiment.rate_limit import TokenBucket
+
+REMAINING_HEADERS = ("x-rate-limit-remaining", "x-ratelimit-remaining")
+RESET_HEADERS = ("x-rate-limit-reset", "x-ratelimit-reset")
+
+
+def _header(headers: Mapping, names) -> Optional[float]:
+    lowered = {k.lower(): v for k, v in (headers or {}).items()}
+    for name in names:
+        if name in lowered:
+            try:
+                return float(lowered[name])
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+class RateBudget:
+    """Thread-safe request budget for one source."""
+
+    def __init__(self, requests_per_minute: float):
+        self.bucket = TokenBucket(requests_per_minute)
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until the source may send another request."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(self.blocked_until - now, self.bucket.wait_time(1, now))
+                if wait <= 0:
+                    self.bucket.consume(1)
+                    return
+            time.sleep(wait)
+
+    def observe(self, headers: Mapping, status_code: int = 200):
+        """Update the budget from a response's rate-limit headers."""
+        remaining = _header(headers, REMAINING_HEADERS)
+        reset = _header(headers, RESET_HEADERS)
+        retry_after = _header(headers, ("retry-after",))
+        if reset is not None:
+            # Twitter sends an epoch timestamp, Reddit seconds until reset
+            reset = reset - time.time() if reset > 1e9 else reset
+            reset = max(reset, 0.0)
+
+        with self._lock:
+            now = time.monotonic()
+            if status_code == 429 or (remaining is not None and remaining <= 0):
+                pause = retry_after if retry_after is not None else (reset if reset is not None else 60.0)
+                self.blocked_until = max(self.blocked_until, now + pause)
+            elif remaining is not None and reset:
+                # Spread what is left of the window evenly until the reset
+                self.bucket._refill(now)
+                self.bucket.available = min(self.bucket.available, remaining)
+                self.bucket.rate = min(self.bucket.capacity / 60.0, max(remaining / reset, 1e-3))
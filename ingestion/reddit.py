@@ -7,29 +7,28 @@ Reddit Ingestion Script for AI Trading Bot
 """
 
 import os
-import json
+import functools
 from datetime import datetime
 from typing import List
-import praw
-from dotenv import load_dotenv
+from pipeline.env import require_env
+from pipeline.jsonl import write_records
+from pipeline import metrics
 
-# Load environment variables from .env
-load_dotenv()
 
-# Reddit API authentication
-REDDIT_CLIENT_ID = os.getenv("REDDIT_CLIENT_ID")
-REDDIT_CLIENT_SECRET = os.getenv("REDDIT_CLIENT_SECRET")
-REDDIT_USER_AGENT = os.getenv("REDDIT_USER_AGENT", "ai-trading-bot/1.0")
-
-if not REDDIT_CLIENT_ID or not REDDIT_CLIENT_SECRET:
-    raise ValueError("Missing Reddit API credentials. Please set them in the .env file.")
-
-# Create Reddit API client
-reddit = praw.Reddit(
-    client_id=REDDIT_CLIENT_ID,
-    client_secret=REDDIT_CLIENT_SECRET,
-    user_agent=REDDIT_USER_AGENT
-)
+@functools.lru_cache(maxsize=None)
+def get_client():
+    """
+    Reddit API client, created on first use from REDDIT_CLIENT_ID /
+    REDDIT_CLIENT_SECRET (environment or .env); raises ValueError if missing.
+    """
+    client_id = require_env("REDDIT_CLIENT_ID", "Please set the Reddit API credentials in the .env file.")
+    client_secret = require_env("REDDIT_CLIENT_SECRET", "Please set the Reddit API credentials in the .env file.")
+    import praw
+    return praw.Reddit(
+        client_id=client_id,
+        client_secret=client_secret,
+        user_agent=os.getenv("REDDIT_USER_AGENT", "ai-trading-bot/1.0")
+    )
 
 def fetch_reddit_posts(keywords: List[str], subreddits: List[str], limit: int = 50):
     """Fetch recent Reddit posts containing given keywords."""
@@ -39,30 +38,40 @@ def fetch_reddit_posts(keywords: List[str], subreddits: List[str], limit: int =
 
     print(f"[INFO] Searching for: {search_query} in {subreddit_str}")
 
-    subreddit = reddit.subreddit(subreddit_str)
-    for post in subreddit.search(search_query, sort="new", limit=limit):
-        results.append({
-            "id": post.id,
-            "created_utc": datetime.utcfromtimestamp(post.created_utc).isoformat(),
-            "title": post.title,
-            "body": post.selftext,
-            "score": post.score,
-            "num_comments": post.num_comments,
-            "url": post.url,
-            "subreddit": post.subreddit.display_name
-        })
+    subreddit = get_client().subreddit(subreddit_str)
+    # praw pages lazily, so the span covers the whole iteration
+    with metrics.span("external_call", service="reddit"):
+        for post in subreddit.search(search_query, sort="new", limit=limit):
+            results.append({
+                "id": post.id,
+                "created_utc": datetime.utcfromtimestamp(post.created_utc).isoformat(),
+                "title": post.title,
+                "body": post.selftext,
+                "score": post.score,
+                "num_comments": post.num_comments,
+                "url": post.url,
+                "subreddit": post.subreddit.display_name
+            })
+    metrics.inc("items_total", len(results), stage="ingest", source="reddit")
     return results
 
-def save_posts_to_json(posts, output_path: str):
-    """Save fetched Reddit posts to JSON file."""
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(posts, f, indent=2, ensure_ascii=False)
-    print(f"[INFO] Saved {len(posts)} posts to {output_path}")
+def save_posts_to_json(posts, output_path: str, append: bool = False):
+    """
+    Save fetched Reddit posts to JSON file, or to JSONL for .jsonl/.jsonl.gz/.jsonl.zst
+    paths (where append=True adds to the existing file instead of rewriting it).
+    """
+    count = write_records(output_path, posts, append=append)
+    print(f"[INFO] Saved {count} posts to {output_path}")
 
 if __name__ == "__main__":
-    KEYWORDS = ["Tesla", "TSLA", "Bitcoin", "BTC", "AAPL", "Apple"]
-    SUBREDDITS = ["stocks", "wallstreetbets", "investing", "cryptocurrency"]
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keywords", nargs="+", default=["Tesla", "TSLA", "Bitcoin", "BTC", "AAPL", "Apple"])
+    parser.add_argument("--subreddits", nargs="+", default=["stocks", "wallstreetbets", "investing", "cryptocurrency"])
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--output", default="data/raw/reddit_posts.json")
+    args = parser.parse_args()
 
-    posts = fetch_reddit_posts(KEYWORDS, SUBREDDITS, limit=50)
-    save_posts_to_json(posts, "data/raw/reddit_posts.json")
+    posts = fetch_reddit_posts(args.keywords, args.subreddits, limit=args.limit)
+    save_posts_to_json(posts, args.output)
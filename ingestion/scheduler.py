@@ -0,0 +1,191 @@
+# ingestion/scheduler.py
+"""
+Unified Ingestion Scheduler
+---------------------------
+- Runs News, Reddit and Twitter ingestion concurrently on one thread pool
+- Fans out per keyword (News, Twitter) and per subreddit (Reddit)
+- Each source has a pooled requests.Session, a concurrency cap and a
+  header-driven RateBudget (ingestion/rate_budget.py)
+- All sources write to one normalized JSONL record stream
+  (data/raw/stream.jsonl): the original fields plus `source_type` and `record_id`
+
+A full refresh takes about as long as the slowest source, not the sum of all three.
+
+Usage:
+  python -m ingestion.scheduler --keywords Tesla Bitcoin Apple --subreddits stocks wallstreetbets
+"""
+
+import os
+import time
+import argparse
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ingestion.rate_budget import RateBudget
+from pipeline.env import load_env
+from pipeline.jsonl import write_records
+
+logger = logging.getLogger(__name__)
+
+STREAM_FILE = "data/raw/stream.jsonl"
+
+
+def pooled_session(pool_size: int = 16) -> requests.Session:
+    """Session whose connection pool is large enough for the source's concurrency."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class Source:
+    """One ingestion source: a list of fan-out keys and a fetch() per key."""
+    name = "source"
+    id_field = "id"
+
+    def __init__(self, keys: Iterable[str], requests_per_minute: float, max_concurrency: int = 4):
+        self.keys = list(keys)
+        self.budget = RateBudget(requests_per_minute)
+        self.slots = threading.Semaphore(max_concurrency)
+        self.session = pooled_session(max_concurrency)
+
+    def fetch(self, key: str) -> List[Dict]:
+        raise NotImplementedError
+
+    def normalize(self, record: Dict) -> Dict:
+        return {**record, "source_type": self.name, "record_id": str(record.get(self.id_field))}
+
+    def run_key(self, key: str) -> List[Dict]:
+        with self.slots:
+            return [self.normalize(r) for r in self.fetch(key)]
+
+
+class NewsSource(Source):
+    name = "news"
+    id_field = "url"
+
+    def __init__(self, keywords, limit: int = 30, requests_per_minute: float = 30, max_concurrency: int = 4):
+        super().__init__(keywords, requests_per_minute, max_concurrency)
+        self.limit = limit
+
+    def fetch(self, key):
+        from ingestion.news import fetch_news
+        return fetch_news([key], limit=self.limit, session=self.session, rate_budget=self.budget)
+
+
+class RedditSource(Source):
+    name = "reddit"
+
+    def __init__(self, keywords, subreddits, limit: int = 50, requests_per_minute: float = 60):
+        # praw is not thread-safe, so one request at a time; praw also honours Reddit's headers itself
+        super().__init__(subreddits, requests_per_minute, max_concurrency=1)
+        self.keywords = list(keywords)
+        self.limit = limit
+
+    def fetch(self, key):
+        from ingestion.reddit import fetch_reddit_posts
+        self.budget.acquire()
+        return fetch_reddit_posts(self.keywords, [key], limit=self.limit)
+
+
+class TwitterSource(Source):
+    name = "twitter"
+
+    def __init__(self, queries, max_results: int = 100, requests_per_minute: float = 60,
+                 max_concurrency: int = 4, ingestor=None):
+        super().__init__(queries, requests_per_minute, max_concurrency)
+        self.max_results = max_results
+        if ingestor is None:
+            from ingestion.twitter import TwitterIngestor
+            ingestor = TwitterIngestor(session=self.session, rate_budget=self.budget)
+        self.ingestor = ingestor
+
+    def fetch(self, key):
+        return self.ingestor.fetch_recent(key, max_results=self.max_results, resume=True)
+
+
+class IngestionScheduler:
+    """Runs every (source, key) task concurrently and appends results to one stream."""
+
+    def __init__(self, sources: List[Source], output_path: str = STREAM_FILE, max_workers: Optional[int] = None):
+        self.sources = sources
+        self.output_path = output_path
+        self.max_workers = max_workers or max(1, sum(len(s.keys) for s in sources))
+        self._write_lock = threading.Lock()
+
+    def run(self) -> Dict[str, int]:
+        """Fetch everything once; returns new record counts per source."""
+        counts = {s.name: 0 for s in self.sources}
+        timings = {s.name: 0.0 for s in self.sources}
+        seen = set()
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {
+                pool.submit(self._timed, source, key): (source, key)
+                for source in self.sources for key in source.keys
+            }
+            for future in as_completed(futures):
+                source, key = futures[future]
+                try:
+                    records, elapsed = future.result()
+                except Exception as e:
+                    logger.error("%s fetch for '%s' failed: %s", source.name, key, e)
+                    continue
+                timings[source.name] = max(timings[source.name], elapsed)
+                # Keys overlap (e.g. a post matching two keywords); keep one copy
+                fresh = []
+                for record in records:
+                    marker = (source.name, record["record_id"])
+                    if marker not in seen:
+                        seen.add(marker)
+                        fresh.append(record)
+                with self._write_lock:
+                    write_records(self.output_path, fresh, append=True)
+                counts[source.name] += len(fresh)
+
+        total = time.perf_counter() - started
+        for name, count in counts.items():
+            logger.info("%s: %d records (slowest task %.1fs)", name, count, timings[name])
+        logger.info("Ingestion refresh finished in %.1fs -> %s", total, self.output_path)
+        return counts
+
+    @staticmethod
+    def _timed(source: Source, key: str):
+        t0 = time.perf_counter()
+        records = source.run_key(key)
+        return records, time.perf_counter() - t0
+
+
+def default_sources(keywords, subreddits) -> List[Source]:
+    """Sources whose credentials are configured in the environment/.env."""
+    load_env()
+    sources = []
+    if os.getenv("NEWS_API_KEY"):
+        sources.append(NewsSource(keywords))
+    if os.getenv("REDDIT_CLIENT_ID") and os.getenv("REDDIT_CLIENT_SECRET"):
+        sources.append(RedditSource(keywords, subreddits))
+    if os.getenv("TWITTER_BEARER_TOKEN"):
+        sources.append(TwitterSource(keywords))
+    return sources
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keywords", nargs="+", default=["Tesla", "Bitcoin", "Apple", "Microsoft"])
+    parser.add_argument("--subreddits", nargs="+", default=["stocks", "wallstreetbets", "investing", "cryptocurrency"])
+    parser.add_argument("--output", default=STREAM_FILE)
+    args = parser.parse_args()
+
+    sources = default_sources(args.keywords, args.subreddits)
+    if not sources:
+        print("[WARN] No source credentials configured. Exiting.")
+    else:
+        IngestionScheduler(sources, args.output).run()
@@ -3,6 +3,8 @@
 Twitter ingestion helper (Twitter API v2 recent search)
 - Uses Bearer Token for auth (env var, .env file, or passed in)
 - Stores tweets to a local SQLite DB by default
+- Resumable per query: since_id of the newest stored tweet, plus the ranges
+  left unfetched when a refresh hit max_results before the last page
 - Simple retry/backoff and basic rate-limit handling
 """
 
@@ -11,15 +13,13 @@ import time
 import json
 import logging
 import sqlite3
-from typing import List, Dict, Optional
+import threading
+from typing import List, Dict, Optional, Tuple
 import requests
-from dotenv import load_dotenv  # NEW: for .env file loading
-
-# Load environment variables from .env if available
-load_dotenv()
+from pipeline.env import load_env
+from pipeline import metrics
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 
 class SQLiteStorage:
@@ -27,8 +27,18 @@ class SQLiteStorage:
     def __init__(self, path: str = "data/twitter.db"):
         os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
         self.conn = sqlite3.connect(path, check_same_thread=False)
+        # Serializes writers when several fetches share this storage
+        self._lock = threading.Lock()
+        self._configure()
         self._create_table()
 
+    def _configure(self):
+        # WAL + NORMAL sync: one fsync per checkpoint instead of per commit
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA cache_size=-65536")  # 64 MB page cache
+
     def _create_table(self):
         self.conn.execute(
             """
@@ -41,87 +51,217 @@ class SQLiteStorage:
             );
             """
         )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tweets_created_at ON tweets(created_at)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tweets_author_id ON tweets(author_id)")
+        # Newest tweet ID fetched per query: each query resumes from its own since_id
+        self.conn.execute("CREATE TABLE IF NOT EXISTS since_ids (query TEXT PRIMARY KEY, since_id TEXT)")
+        # Tweets in (since_id, until_id) not fetched yet because a refresh stopped at max_results
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS gaps (query TEXT, since_id TEXT, until_id TEXT, PRIMARY KEY (query, until_id))"
+        )
         self.conn.commit()
 
-    def save_tweet(self, tweet: Dict):
+    def save_tweets(self, tweets: List[Dict]) -> int:
+        """Insert or replace many tweets in a single transaction; returns the row count."""
+        rows = [
+            (
+                tweet.get("id"),
+                tweet.get("text"),
+                tweet.get("created_at"),
+                tweet.get("author_id"),
+                json.dumps(tweet, ensure_ascii=False),
+            )
+            for tweet in tweets
+        ]
+        if not rows:
+            return 0
         try:
+            with self._lock, self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO tweets (id, text, created_at, author_id, raw_json) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+        except Exception:
+            logger.exception("Failed to save batch of %d tweets", len(rows))
+            return 0
+        return len(rows)
+
+    def save_tweet(self, tweet: Dict):
+        self.save_tweets([tweet])
+
+    def newest_id(self, query: str) -> Optional[str]:
+        """Newest tweet ID fetched for this query (used as since_id to resume), or None."""
+        with self._lock:
+            row = self.conn.execute("SELECT since_id FROM since_ids WHERE query = ?", (query,)).fetchone()
+        return row[0] if row else None
+
+    def set_newest_id(self, query: str, tweet_id: str):
+        """Advance the query's since_id; never moves it backwards (tweet IDs are numeric strings)."""
+        with self._lock, self.conn:
             self.conn.execute(
-                "INSERT OR REPLACE INTO tweets (id, text, created_at, author_id, raw_json) VALUES (?, ?, ?, ?, ?)",
-                (
-                    tweet.get("id"),
-                    tweet.get("text"),
-                    tweet.get("created_at"),
-                    tweet.get("author_id"),
-                    json.dumps(tweet, ensure_ascii=False),
-                ),
+                """
+                INSERT INTO since_ids (query, since_id) VALUES (?, ?)
+                ON CONFLICT(query) DO UPDATE SET since_id = excluded.since_id
+                WHERE CAST(excluded.since_id AS INTEGER) > CAST(since_ids.since_id AS INTEGER)
+                """,
+                (query, tweet_id),
             )
-            self.conn.commit()
-        except Exception:
-            logger.exception("Failed to save tweet %s", tweet.get("id"))
+
+    def add_gap(self, query: str, since_id: str, until_id: str):
+        """Remember that tweets newer than since_id and older than until_id were not fetched."""
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO gaps (query, since_id, until_id) VALUES (?, ?, ?)",
+                              (query, since_id, until_id))
+
+    def gaps(self, query: str) -> List[Tuple[str, str]]:
+        """Unfetched (since_id, until_id) ranges for this query, newest first."""
+        with self._lock:
+            rows = self.conn.execute("SELECT since_id, until_id FROM gaps WHERE query = ?", (query,)).fetchall()
+        return sorted(rows, key=lambda r: int(r[1]), reverse=True)
+
+    def close_gap(self, query: str, until_id: str, remaining_until: Optional[str] = None):
+        """Drop a filled gap, or shrink it to end at remaining_until when only partly fetched."""
+        with self._lock, self.conn:
+            if remaining_until:
+                self.conn.execute("UPDATE gaps SET until_id = ? WHERE query = ? AND until_id = ?",
+                                  (remaining_until, query, until_id))
+            else:
+                self.conn.execute("DELETE FROM gaps WHERE query = ? AND until_id = ?", (query, until_id))
 
 
 class TwitterIngestor:
     SEARCH_URL = "https://api.twitter.com/2/tweets/search/recent"
 
-    def __init__(self, bearer_token: Optional[str] = None, storage: Optional[SQLiteStorage] = None):
-        # Prefer explicit token > environment variable > .env (loaded above)
+    def __init__(self, bearer_token: Optional[str] = None, storage: Optional[SQLiteStorage] = None,
+                 search_url: Optional[str] = None, session: Optional[requests.Session] = None,
+                 rate_budget=None):
+        # Prefer explicit token > environment variable > .env
+        if not bearer_token:
+            load_env()
         self.bearer_token = bearer_token or os.getenv("TWITTER_BEARER_TOKEN")
         if not self.bearer_token:
             raise ValueError("Twitter bearer token required (env TWITTER_BEARER_TOKEN, .env file, or param).")
         self.headers = {"Authorization": f"Bearer {self.bearer_token}"}
         self.storage = storage or SQLiteStorage()
+        # Overridable so tests and benchmarks can target a local fake API
+        self.search_url = search_url or os.getenv("TWITTER_SEARCH_URL", self.SEARCH_URL)
+        self.session = session or requests.Session()
+        # Optional ingestion.rate_budget.RateBudget shared with a scheduler
+        self.rate_budget = rate_budget
 
     def _request(self, params: Dict) -> Dict:
         backoff = 1
         for attempt in range(6):
-            resp = requests.get(self.SEARCH_URL, headers=self.headers, params=params, timeout=15)
+            if self.rate_budget:
+                self.rate_budget.acquire()
+            with metrics.span("external_call", service="twitter"):
+                resp = self.session.get(self.search_url, headers=self.headers, params=params, timeout=15)
+            if self.rate_budget:
+                self.rate_budget.observe(resp.headers, resp.status_code)
             if resp.status_code == 200:
                 return resp.json()
             elif resp.status_code == 429:
-                # Rate limit, backoff
-                logger.warning("Twitter rate-limited. Sleeping %s seconds.", backoff)
-                time.sleep(backoff)
+                # Rate limit: wait for the window reset the API advertises
+                reset = resp.headers.get("x-rate-limit-reset")
+                wait = max(float(reset) - time.time(), 1) if reset else backoff
+                logger.warning("Twitter rate-limited. Sleeping %.0f seconds.", wait)
+                metrics.inc("retries_total", service="twitter", reason="rate_limit")
+                if not self.rate_budget:
+                    time.sleep(wait)
                 backoff = min(backoff * 2, 60)
             else:
                 logger.warning("Twitter API returned %s: %s", resp.status_code, resp.text)
+                metrics.inc("retries_total", service="twitter", reason="transient")
                 time.sleep(backoff)
                 backoff = min(backoff * 2, 30)
         raise RuntimeError("Twitter API failed after retries")
 
-    def fetch_recent(self, query: str, max_results: int = 100, lang: str = "en") -> List[Dict]:
+    def _paginate(self, params: Dict, limit: int) -> Tuple[List[Dict], bool, bool]:
+        """
+        Follow next_token pages until `limit` tweets or the last page.
+        Returns (tweets, all saved, exhausted: no matching tweet was left out).
         """
-        Fetch recent tweets for a query.
+        tweets: List[Dict] = []
+        next_token = None
+        saved = True
+        while len(tweets) < limit:
+            # The API accepts 10..100 results per page
+            params["max_results"] = str(max(10, min(limit - len(tweets), 100)))
+            if next_token:
+                params["next_token"] = next_token
+            data = self._request(params)
+            received = data.get("data", []) or []
+            page = received[:limit - len(tweets)]
+            saved = self.storage.save_tweets(page) == len(page) and saved
+            tweets.extend(page)
+            next_token = (data.get("meta") or {}).get("next_token")
+            if not page or (not next_token and len(page) == len(received)):
+                return tweets, saved, True
+        return tweets, saved, False
+
+    def fetch_recent(self, query: str, max_results: int = 100, lang: str = "en",
+                     since_id: Optional[str] = None, resume: bool = False) -> List[Dict]:
+        """
+        Fetch recent tweets for a query, following next_token pages.
         Parameters:
             query: search query (Twitter v2 query).
-            max_results: up to 100 per request (Twitter limit).
+            max_results: total tweets wanted; fetched in pages of up to 100 (Twitter limit).
+            since_id: only return tweets newer than this ID.
+            resume: start after the newest tweet fetched before for this same query
+                (overrides since_id; a query never fetched before is backfilled),
+                then spend what is left of max_results on older ranges an earlier
+                refresh had to cut short.
         Returns:
             list of tweet dicts (with created_at if requested).
         """
         params = {
             "query": query,
-            "max_results": str(min(max_results, 100)),
             "tweet.fields": "created_at,lang,author_id",
         }
         if lang:
             params["query"] = f"{query} lang:{lang}"
+        key = params["query"]
+        if resume:
+            since_id = self.storage.newest_id(key) or since_id
+        if since_id:
+            params["since_id"] = since_id
+
+        # Pages come newest first: a cut-off refresh leaves (since_id, oldest fetched) unfetched
+        tweets, saved, exhausted = self._paginate(params, max_results)
+        # Only resume past tweets that were stored; a failed save is fetched again next time
+        if tweets and saved:
+            if not exhausted and since_id:
+                self.storage.add_gap(key, since_id, min(tweets, key=lambda t: int(t["id"]))["id"])
+            newest = max(tweets, key=lambda t: int(t["id"]))["id"]
+            self.storage.set_newest_id(key, newest)
 
-        data = self._request(params)
-        tweets = data.get("data", []) or []
+        if resume:
+            for gap_since, gap_until in self.storage.gaps(key):
+                if len(tweets) >= max_results:
+                    break
+                gap_params = {**params, "since_id": gap_since, "until_id": gap_until}
+                gap_params.pop("next_token", None)
+                filled, saved, exhausted = self._paginate(gap_params, max_results - len(tweets))
+                tweets.extend(filled)
+                if saved:
+                    oldest = min(filled, key=lambda t: int(t["id"]))["id"] if filled else None
+                    self.storage.close_gap(key, gap_until, None if exhausted else oldest)
+
+        metrics.inc("items_total", len(tweets), stage="ingest", source="twitter")
         logger.info("Fetched %d tweets for query '%s'", len(tweets), query)
-        for t in tweets:
-            self.storage.save_tweet(t)
         return tweets
 
-
 if __name__ == "__main__":
     # quick demo (reads TWITTER_BEARER_TOKEN from .env or env vars)
     import argparse
 
+    logging.basicConfig(level=logging.INFO)
     parser = argparse.ArgumentParser()
     parser.add_argument("--q", default="bitcoin", help="Search query")
     parser.add_argument("--n", type=int, default=10)
+    parser.add_argument("--resume", action="store_true", help="Only fetch tweets newer than this query's last fetch")
     args = parser.parse_args()
 
     ingestor = TwitterIngestor()
-    tweets = ingestor.fetch_recent(args.q, max_results=args.n)
+    tweets = ingestor.fetch_recent(args.q, max_results=args.n, resume=args.resume)
     print(f"Saved {len(tweets)} tweets.")
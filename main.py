@@ -1,27 +1,134 @@
 #Import json library for the output
+import os
 import json
+import argparse
 from sentiment.llm_analyzer import analyze_dataset
+from sentiment.cache import LLMCache
+from pipeline.config import LLM_CACHE_PATH, LLM_CACHE_BYPASS, SOURCES, build_llm_options
+from pipeline.state import PipelineState
+from pipeline.jsonl import find_dataset, is_jsonl, iter_records_with_offsets, write_records
+from pipeline import metrics
+
+# Records analyzed (and checkpointed) per streaming batch
+BATCH_SIZE = int(os.getenv("PIPELINE_BATCH_SIZE", "500"))
+
+
+def _batches(iterable, size):
+    batch = []
+    for entry in iterable:
+        batch.append(entry)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _load_checkpoint(output_path, raw_path):
+    """Byte offset into raw_path reached by an interrupted streaming run."""
+    ckpt = output_path + ".ckpt"
+    if not os.path.exists(ckpt):
+        return 0
+    with open(ckpt, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data["offset"] if data.get("input") == raw_path else 0
+
+
+def _save_checkpoint(output_path, raw_path, offset):
+    with open(output_path + ".ckpt", "w", encoding="utf-8") as f:
+        json.dump({"input": raw_path, "offset": offset}, f)
 
-if __name__ == "__main__":
-    # Load raw Reddit posts
-    with open("data/raw/reddit_posts.json", "r", encoding="utf-8") as f:
-        reddit_posts = json.load(f)
 
-    # Load raw News articles
-    with open("data/raw/news.json", "r", encoding="utf-8") as f:
-        news_articles = json.load(f)
+def _mark_written(state, source, analyzed):
+    """Mark analyzed records processed (failed ones stay pending) and queue their tickers downstream."""
+    if state is None:
+        return
+    state.mark_processed(source, analyzed)
+    changed = {t for item in analyzed if not item.get("analysis_error") for t in item.get("tickers", [])}
+    state.mark_dirty("prices", changed)
+    state.mark_dirty("features", changed)
 
-    # Analyze Reddit posts with LLM
-    reddit_with_sentiment = analyze_dataset(reddit_posts, text_fields=("title", "body"))
 
-    # Analyze News articles with LLM
-    news_with_sentiment = analyze_dataset(news_articles, text_fields=("title", "description"))
+def process_source(source, llm_options, state=None, fmt="json", resume=False):
+    """
+    Analyze one source batch by batch. JSONL outputs are appended per batch and
+    checkpointed, so `resume` continues an interrupted run from its byte offset.
+    With a PipelineState only records not processed before are analyzed, and
+    they are appended to the existing processed file; records whose analysis
+    failed are not written and are retried by the next incremental run.
+    Records are only marked processed once they are written: per batch for
+    JSONL, after the final write for JSON.
+    """
+    raw_stem, out_stem, text_fields = SOURCES[source]
+    raw_path = find_dataset(raw_stem)
+    if raw_path is None:
+        print(f"[WARN] No raw data for {source} at {raw_stem}.*")
+        return 0
+    output_path = out_stem + (".jsonl" if fmt == "jsonl" else ".json")
+    streaming = is_jsonl(output_path)
+
+    offset = _load_checkpoint(output_path, raw_path) if resume else 0
+    append = state is not None or offset > 0
+    if streaming and not append:
+        write_records(output_path, [])
+    watermark = state.watermark(source) if state is not None else None
+
+    pending, unmarked, total = [], [], 0
+    for batch in _batches(iter_records_with_offsets(raw_path, offset), BATCH_SIZE):
+        records = [record for _, record in batch]
+        if state is not None:
+            records = state.new_records(source, records, watermark=watermark)
+        analyzed = analyze_dataset(records, text_fields=text_fields, **llm_options)
+        done = analyzed
+        if state is not None:
+            # Failed records are not written and not marked processed, so the next run retries them
+            done = [item for item in analyzed if not item.get("analysis_error")]
+            if len(done) < len(analyzed):
+                print(f"[WARN] {source}: {len(analyzed) - len(done)} records failed analysis; "
+                      "left for the next incremental run")
+
+        if streaming:
+            write_records(output_path, done, append=True)
+            _save_checkpoint(output_path, raw_path, batch[-1][0])
+            _mark_written(state, source, analyzed)
+        else:
+            pending.extend(done)
+            unmarked.extend(analyzed)
+        total += len(done)
+
+    if not streaming:
+        write_records(output_path, pending, append=append)
+        _mark_written(state, source, unmarked)
+    if os.path.exists(output_path + ".ckpt"):
+        os.remove(output_path + ".ckpt")
+    print(f"[INFO] {source}: analyzed {total} records -> {output_path}")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only analyze records not seen by a previous run and append them")
+    parser.add_argument("--format", choices=("json", "jsonl"), default="json",
+                        help="Processed output format (jsonl streams and checkpoints per batch)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted jsonl run from its last checkpoint")
+    args = parser.parse_args()
+
+    cache = LLMCache(LLM_CACHE_PATH, bypass=LLM_CACHE_BYPASS)
+    llm_options = build_llm_options(cache)
+    state = PipelineState() if args.incremental else None
 
-    # Save to processed folder
-    with open("data/processed/reddit_with_sentiment.json", "w", encoding="utf-8") as f:
-        json.dump(reddit_with_sentiment, f, indent=2, ensure_ascii=False)
+    # Analyze Reddit posts and News articles with LLM and save to processed folder
+    for source in SOURCES:
+        process_source(source, llm_options, state, fmt=args.format, resume=args.resume)
 
-    with open("data/processed/news_with_sentiment.json", "w", encoding="utf-8") as f:
-        json.dump(news_with_sentiment, f, indent=2, ensure_ascii=False)
+    cache.evict()
+    print(f"[INFO] LLM cache: {cache.stats()}")
+    cache.close()
+    if state is not None:
+        state.close()
 
+    # PIPELINE_METRICS=1: timings, token usage and cost -> data/metrics/sentiment.{prom,json}
+    metrics.dump(prefix="sentiment")
     print("[INFO] Sentiment analysis complete and saved.")
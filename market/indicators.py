@@ -0,0 +1,358 @@
+# market/indicators.py
+"""
+Technical Indicators
+--------------------
+- Batch mode: NumPy functions over whole histories. Inputs may be 1-D (one
+  symbol) or 2-D (time x symbols); recursive indicators loop over time only,
+  vectorized across symbols
+- Incremental mode: small stateful classes whose update() costs O(1) per bar
+  (ring buffers for windowed sums, running EMAs for the rest)
+- Both modes share warm-up rules and return NaN until an indicator is defined,
+  so their outputs match bar for bar
+
+Indicators: SMA, EMA, RSI (Wilder), MACD, ATR (Wilder), Bollinger Bands, VWAP
+"""
+
+import math
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+NAN = float("nan")
+
+
+# --------------------------------------------------------------------------- #
+# Batch mode
+# --------------------------------------------------------------------------- #
+
+def _as_float(x) -> np.ndarray:
+    return np.asarray(x, dtype=np.float64)
+
+
+def _rolling_sum(x: np.ndarray, n: int) -> np.ndarray:
+    out = np.full(x.shape, np.nan)
+    if len(x) >= n:
+        windows = np.lib.stride_tricks.sliding_window_view(x, n, axis=0)
+        out[n - 1:] = windows.sum(axis=-1)
+    return out
+
+
+def sma(x, n: int) -> np.ndarray:
+    x = _as_float(x)
+    return _rolling_sum(x, n) / n
+
+
+def _smooth(x: np.ndarray, n: int, alpha: float) -> np.ndarray:
+    """EMA-style recursion seeded with the SMA of the first n values."""
+    out = np.full(x.shape, np.nan)
+    if len(x) < n:
+        return out
+    out[n - 1] = x[:n].mean(axis=0)
+    for t in range(n, len(x)):
+        out[t] = out[t - 1] + alpha * (x[t] - out[t - 1])
+    return out
+
+
+def ema(x, n: int) -> np.ndarray:
+    return _smooth(_as_float(x), n, 2.0 / (n + 1))
+
+
+def _ema_skip_nan_prefix(x: np.ndarray, n: int) -> np.ndarray:
+    """EMA of a series that starts with NaN rows (e.g. the MACD line), seeded at the first full row."""
+    out = np.full(x.shape, np.nan)
+    valid_rows = ~np.isnan(x).reshape(len(x), -1).any(axis=1)
+    if not valid_rows.any():
+        return out
+    first = int(np.argmax(valid_rows))
+    out[first:] = ema(x[first:], n)
+    return out
+
+
+def rsi(close, n: int = 14) -> np.ndarray:
+    close = _as_float(close)
+    out = np.full(close.shape, np.nan)
+    if len(close) <= n:
+        return out
+    delta = np.diff(close, axis=0)
+    gain = np.clip(delta, 0, None)
+    loss = np.clip(-delta, 0, None)
+    avg_gain = _smooth(gain, n, 1.0 / n)
+    avg_loss = _smooth(loss, n, 1.0 / n)
+    out[1:] = _rsi_from_averages(avg_gain, avg_loss)
+    return out
+
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    value = np.where((avg_loss == 0) & (avg_gain > 0), 100.0, value)
+    value = np.where((avg_loss == 0) & (avg_gain == 0), 50.0, value)
+    return np.where(np.isnan(avg_gain), np.nan, value)
+
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9):
+    """Returns (macd_line, signal_line, histogram)."""
+    close = _as_float(close)
+    line = ema(close, fast) - ema(close, slow)
+    sig = _ema_skip_nan_prefix(line, signal)
+    return line, sig, line - sig
+
+
+def true_range(high, low, close) -> np.ndarray:
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    tr = high - low
+    prev = close[:-1]
+    tr[1:] = np.maximum.reduce([tr[1:], np.abs(high[1:] - prev), np.abs(low[1:] - prev)])
+    return tr
+
+
+def atr(high, low, close, n: int = 14) -> np.ndarray:
+    return _smooth(true_range(high, low, close), n, 1.0 / n)
+
+
+def bollinger(close, n: int = 20, k: float = 2.0):
+    """Returns (middle, upper, lower) using the population standard deviation."""
+    close = _as_float(close)
+    mid = sma(close, n)
+    mean_sq = _rolling_sum(close * close, n) / n
+    std = np.sqrt(np.maximum(mean_sq - mid * mid, 0.0))
+    return mid, mid + k * std, mid - k * std
+
+
+def vwap(high, low, close, volume, n: Optional[int] = None) -> np.ndarray:
+    """Rolling VWAP over n bars of typical price, or cumulative when n is None."""
+    typical = (_as_float(high) + _as_float(low) + _as_float(close)) / 3.0
+    volume = _as_float(volume)
+    if n is None:
+        pv, v = np.cumsum(typical * volume, axis=0), np.cumsum(volume, axis=0)
+    else:
+        pv, v = _rolling_sum(typical * volume, n), _rolling_sum(volume, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(v > 0, pv / v, np.nan)
+
+
+def compute_indicators(ohlcv: pd.DataFrame) -> pd.DataFrame:
+    """Default indicator set (same columns as IndicatorState) for one OHLCV frame."""
+    o = ohlcv
+    macd_line, macd_signal, macd_hist = macd(o["Close"])
+    bb_mid, bb_upper, bb_lower = bollinger(o["Close"])
+    return pd.DataFrame({
+        "sma_20": sma(o["Close"], 20),
+        "ema_20": ema(o["Close"], 20),
+        "rsi_14": rsi(o["Close"], 14),
+        "macd": macd_line,
+        "macd_signal": macd_signal,
+        "macd_hist": macd_hist,
+        "atr_14": atr(o["High"], o["Low"], o["Close"], 14),
+        "bb_mid": bb_mid,
+        "bb_upper": bb_upper,
+        "bb_lower": bb_lower,
+        "vwap_20": vwap(o["High"], o["Low"], o["Close"], o["Volume"], 20),
+    }, index=o.index)
+
+
+# --------------------------------------------------------------------------- #
+# Incremental mode
+# --------------------------------------------------------------------------- #
+
+class RollingSum:
+    """
+    Fixed-size ring buffer with a running sum. NaN values are counted rather
+    than added, so a window is NaN only while it contains one (as in batch mode).
+    """
+    __slots__ = ("n", "buf", "pos", "count", "total", "nans")
+
+    def __init__(self, n: int):
+        self.n = n
+        self.buf = [0.0] * n
+        self.pos = 0
+        self.count = 0
+        self.total = 0.0
+        self.nans = 0
+
+    def update(self, x: float) -> float:
+        """Add x; returns the window sum once n values were seen, else NaN."""
+        old = self.buf[self.pos]
+        if math.isnan(old):
+            self.nans -= 1
+        else:
+            self.total -= old
+        if math.isnan(x):
+            self.nans += 1
+        else:
+            self.total += x
+        self.buf[self.pos] = x
+        self.pos = (self.pos + 1) % self.n
+        self.count = min(self.count + 1, self.n)
+        return self.total if self.count == self.n and not self.nans else NAN
+
+
+class SMA:
+    __slots__ = ("n", "window")
+
+    def __init__(self, n: int):
+        self.n = n
+        self.window = RollingSum(n)
+
+    def update(self, x: float) -> float:
+        return self.window.update(x) / self.n
+
+
+class _Smoother:
+    """Recursion shared by EMA/Wilder: SMA seed over n values, then value += alpha * (x - value)."""
+    __slots__ = ("n", "alpha", "seen", "value")
+
+    def __init__(self, n: int, alpha: float):
+        self.n = n
+        self.alpha = alpha
+        self.seen = 0
+        self.value = 0.0
+
+    def update(self, x: float) -> float:
+        self.seen += 1
+        if self.seen < self.n:
+            self.value += x
+            return NAN
+        if self.seen == self.n:
+            self.value = (self.value + x) / self.n
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+class EMA(_Smoother):
+    __slots__ = ()
+
+    def __init__(self, n: int):
+        super().__init__(n, 2.0 / (n + 1))
+
+
+class Wilder(_Smoother):
+    __slots__ = ()
+
+    def __init__(self, n: int):
+        super().__init__(n, 1.0 / n)
+
+
+class RSI:
+    __slots__ = ("gain", "loss", "prev")
+
+    def __init__(self, n: int = 14):
+        self.gain = Wilder(n)
+        self.loss = Wilder(n)
+        self.prev = None
+
+    def update(self, close: float) -> float:
+        prev, self.prev = self.prev, close
+        if prev is None:
+            return NAN
+        delta = close - prev
+        g = self.gain.update(max(delta, 0.0))
+        l = self.loss.update(max(-delta, 0.0))
+        if math.isnan(g):
+            return NAN
+        if l == 0:
+            return 100.0 if g > 0 else 50.0
+        return 100.0 - 100.0 / (1.0 + g / l)
+
+
+class MACD:
+    __slots__ = ("fast", "slow", "signal")
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, close: float):
+        """Returns (macd_line, signal_line, histogram)."""
+        line = self.fast.update(close) - self.slow.update(close)
+        if math.isnan(line):
+            return NAN, NAN, NAN
+        sig = self.signal.update(line)
+        return line, sig, line - sig
+
+
+class ATR:
+    __slots__ = ("smoother", "prev_close")
+
+    def __init__(self, n: int = 14):
+        self.smoother = Wilder(n)
+        self.prev_close = None
+
+    def update(self, high: float, low: float, close: float) -> float:
+        tr = high - low
+        if self.prev_close is not None:
+            tr = max(tr, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        return self.smoother.update(tr)
+
+
+class Bollinger:
+    __slots__ = ("n", "k", "sums", "squares")
+
+    def __init__(self, n: int = 20, k: float = 2.0):
+        self.n = n
+        self.k = k
+        self.sums = RollingSum(n)
+        self.squares = RollingSum(n)
+
+    def update(self, close: float):
+        """Returns (middle, upper, lower)."""
+        mid = self.sums.update(close) / self.n
+        mean_sq = self.squares.update(close * close) / self.n
+        std = math.sqrt(max(mean_sq - mid * mid, 0.0)) if not math.isnan(mid) else NAN
+        return mid, mid + self.k * std, mid - self.k * std
+
+
+class VWAP:
+    """Rolling VWAP over n bars, or cumulative when n is None."""
+    __slots__ = ("pv", "v", "cum_pv", "cum_v")
+
+    def __init__(self, n: Optional[int] = None):
+        self.pv = RollingSum(n) if n else None
+        self.v = RollingSum(n) if n else None
+        self.cum_pv = 0.0
+        self.cum_v = 0.0
+
+    def update(self, high: float, low: float, close: float, volume: float) -> float:
+        typical = (high + low + close) / 3.0
+        if self.pv is None:
+            self.cum_pv += typical * volume
+            self.cum_v += volume
+            pv, v = self.cum_pv, self.cum_v
+        else:
+            pv, v = self.pv.update(typical * volume), self.v.update(volume)
+        return pv / v if v > 0 else NAN
+
+
+class IndicatorState:
+    """Per-symbol incremental state for the default indicator set (see compute_indicators)."""
+    __slots__ = ("sma_20", "ema_20", "rsi_14", "macd", "atr_14", "bb", "vwap_20")
+
+    def __init__(self):
+        self.sma_20 = SMA(20)
+        self.ema_20 = EMA(20)
+        self.rsi_14 = RSI(14)
+        self.macd = MACD()
+        self.atr_14 = ATR(14)
+        self.bb = Bollinger(20, 2.0)
+        self.vwap_20 = VWAP(20)
+
+    def update(self, open_: float, high: float, low: float, close: float, volume: float) -> Dict[str, float]:
+        macd_line, macd_signal, macd_hist = self.macd.update(close)
+        bb_mid, bb_upper, bb_lower = self.bb.update(close)
+        return {
+            "sma_20": self.sma_20.update(close),
+            "ema_20": self.ema_20.update(close),
+            "rsi_14": self.rsi_14.update(close),
+            "macd": macd_line,
+            "macd_signal": macd_signal,
+            "macd_hist": macd_hist,
+            "atr_14": self.atr_14.update(high, low, close),
+            "bb_mid": bb_mid,
+            "bb_upper": bb_upper,
+            "bb_lower": bb_lower,
+            "vwap_20": self.vwap_20.update(high, low, close, volume),
+        }
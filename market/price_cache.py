@@ -0,0 +1,257 @@
+# market/price_cache.py
+"""
+Local OHLCV Cache
+-----------------
+- SQLite store of OHLCV bars per (ticker, interval) in data/cache/ohlcv.db
+- Tracks the time range already fetched per symbol, and only asks the provider
+  for the missing head/tail ranges; tickers missing the same range share one
+  batched provider call
+- Empty answers are not trusted as coverage (yfinance answers empty during
+  outages too): only ranges that returned bars, short gaps next to stored
+  bars (weekends, holidays), and empty ranges before a symbol's first bar
+  (pre-IPO) while the provider demonstrably answers, are marked as fetched
+- Negative cache: symbols that keep returning no data at all (e.g.
+  LLM-hallucinated tickers) are remembered for INVALID_TTL and not requested again
+"""
+
+import os
+import sqlite3
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from market.providers import OHLCV_COLUMNS, PriceProvider, empty_ohlcv
+from pipeline import metrics
+
+DEFAULT_PRICE_CACHE = "data/cache/ohlcv.db"
+INVALID_TTL = timedelta(days=7)
+# Only an empty answer over at least this span marks a symbol invalid
+# (a weekend or holiday range is legitimately empty for real symbols)
+MIN_INVALID_SPAN = timedelta(days=5)
+# Empty answers for an unknown symbol, at least MISS_INTERVAL apart, before it is cached as invalid
+INVALID_AFTER_MISSES = 2
+MISS_INTERVAL = timedelta(hours=1)
+
+
+def _ts(value) -> pd.Timestamp:
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts
+
+
+class OHLCVCache:
+    """Serves OHLCV history from disk, fetching only uncovered ranges."""
+
+    def __init__(self, provider: PriceProvider, path: str = DEFAULT_PRICE_CACHE):
+        self.provider = provider
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._create_tables()
+
+    def _create_tables(self):
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS bars (
+                ticker TEXT, interval TEXT, ts TEXT,
+                open REAL, high REAL, low REAL, close REAL, volume REAL,
+                PRIMARY KEY (ticker, interval, ts)
+            );
+            CREATE TABLE IF NOT EXISTS coverage (
+                ticker TEXT, interval TEXT, start TEXT, end TEXT,
+                PRIMARY KEY (ticker, interval)
+            );
+            CREATE TABLE IF NOT EXISTS invalid_symbols (
+                ticker TEXT PRIMARY KEY,
+                checked_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS empty_answers (
+                ticker TEXT PRIMARY KEY,
+                misses INTEGER,
+                last_at TEXT
+            );
+            """
+        )
+        self.conn.commit()
+
+    def _coverage(self, ticker: str, interval: str):
+        row = self.conn.execute(
+            "SELECT start, end FROM coverage WHERE ticker = ? AND interval = ?", (ticker, interval)
+        ).fetchone()
+        return (pd.Timestamp(row[0]), pd.Timestamp(row[1])) if row else None
+
+    def is_invalid(self, ticker: str) -> bool:
+        row = self.conn.execute("SELECT checked_at FROM invalid_symbols WHERE ticker = ?", (ticker,)).fetchone()
+        return bool(row) and datetime.utcnow() - datetime.fromisoformat(row[0]) < INVALID_TTL
+
+    def _missing_ranges(self, ticker, start, end, interval):
+        covered = self._coverage(ticker, interval)
+        if covered is None:
+            return [(start, end)]
+        ranges = []
+        if start < covered[0]:
+            ranges.append((start, covered[0]))
+        if end > covered[1]:
+            # Start at the coverage edge so the covered range stays contiguous
+            ranges.append((covered[1], end))
+        return ranges
+
+    def _store(self, ticker, interval, frame):
+        rows = [
+            (ticker, interval, _ts(ts).isoformat(), *[float(v) if pd.notna(v) else None for v in values])
+            for ts, values in zip(frame.index, frame[OHLCV_COLUMNS].itertuples(index=False, name=None))
+        ]
+        self.conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _has_bars(self, ticker, interval) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM bars WHERE ticker = ? AND interval = ? LIMIT 1", (ticker, interval)
+        ).fetchone() is not None
+
+    def _first_bar(self, ticker, interval) -> Optional[pd.Timestamp]:
+        row = self.conn.execute(
+            "SELECT MIN(ts) FROM bars WHERE ticker = ? AND interval = ?", (ticker, interval)
+        ).fetchone()
+        return pd.Timestamp(row[0]) if row and row[0] else None
+
+    def _provider_answers(self, tickers, interval) -> set:
+        """Tickers the provider returns bars for right at their first stored bar (probes for an outage)."""
+        firsts = {t: self._first_bar(t, interval) for t in tickers}
+        try:
+            frames = self.provider.fetch_ohlcv(list(firsts), min(firsts.values()),
+                                               max(firsts.values()) + MIN_INVALID_SPAN, interval)
+        except Exception:
+            return set()
+        return {t for t in firsts if not frames.get(t, empty_ohlcv()).empty}
+
+    def _extend_coverage(self, ticker, interval, start, end):
+        covered = self._coverage(ticker, interval)
+        if covered:
+            start, end = min(start, covered[0]), max(end, covered[1])
+        self.conn.execute(
+            "INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?)",
+            (ticker, interval, start.isoformat(), end.isoformat()),
+        )
+
+    def _load(self, ticker, start, end, interval) -> pd.DataFrame:
+        rows = self.conn.execute(
+            "SELECT ts, open, high, low, close, volume FROM bars "
+            "WHERE ticker = ? AND interval = ? AND ts >= ? AND ts < ? ORDER BY ts",
+            (ticker, interval, start.isoformat(), end.isoformat()),
+        ).fetchall()
+        if not rows:
+            return empty_ohlcv()
+        frame = pd.DataFrame(rows, columns=["Date", *OHLCV_COLUMNS])
+        frame["Date"] = pd.to_datetime(frame["Date"])
+        return frame.set_index("Date")
+
+    def get_ohlcv(self, tickers: List[str], start, end: Optional[datetime] = None,
+                  interval: str = "1d") -> Dict[str, pd.DataFrame]:
+        """
+        OHLCV bars in [start, end) per ticker. Invalid symbols are omitted.
+        Coverage never extends past the start of today, so the current
+        (still forming) bar is re-fetched on every call.
+        """
+        start = _ts(start)
+        if interval.endswith(("d", "wk", "mo")):
+            # Daily-or-coarser bars: align to midnight so repeat queries hit the same ranges
+            start = start.normalize()
+        today = pd.Timestamp(datetime.utcnow().date())
+        end = _ts(end) if end is not None else today + timedelta(days=1)
+        settled_end = min(end, today)
+
+        # Group tickers by identical missing range so each range is one batched call
+        wanted = defaultdict(list)
+        for ticker in dict.fromkeys(tickers):
+            if self.is_invalid(ticker):
+                continue
+            ranges = self._missing_ranges(ticker, start, settled_end, interval) if start < settled_end else []
+            if end > settled_end:
+                ranges.append((max(start, settled_end), end))
+            for rng in ranges:
+                wanted[rng].append(ticker)
+
+        if metrics.enabled():
+            # Tickers whose settled history came entirely from disk
+            fetched = {t for (range_start, _), batch in wanted.items() if range_start < settled_end for t in batch}
+            metrics.inc("cache_hits_total", len(set(tickers) - fetched), cache="ohlcv")
+            metrics.inc("cache_misses_total", len(fetched), cache="ohlcv")
+
+        # ticker -> longest range the provider answered with no data
+        empty_span = defaultdict(timedelta)
+        # Long empty ranges before a symbol's first stored bar: pre-IPO unless the provider is down
+        empty_heads = []
+        answered = False
+        for (range_start, range_end), batch in wanted.items():
+            try:
+                frames = self.provider.fetch_ohlcv(batch, range_start, range_end, interval)
+            except Exception as e:
+                metrics.inc("external_call_failures_total", service="prices")
+                print(f"[ERROR] Price provider failed for {len(batch)} tickers: {e}")
+                continue
+            for ticker in batch:
+                frame = frames.get(ticker, empty_ohlcv())
+                if frame.empty:
+                    empty_span[ticker] = max(empty_span[ticker], range_end - range_start)
+                    # A short gap next to stored bars is a weekend/holiday; anything else may be an
+                    # outage, so the range stays uncovered and is asked for again
+                    confirmed = range_end - range_start < MIN_INVALID_SPAN and self._has_bars(ticker, interval)
+                    first = self._first_bar(ticker, interval)
+                    if not confirmed and first is not None and range_end <= first and range_start < settled_end:
+                        empty_heads.append((ticker, range_start, range_end))
+                else:
+                    self._store(ticker, interval, frame)
+                    self.conn.execute("DELETE FROM empty_answers WHERE ticker = ?", (ticker,))
+                    confirmed = answered = True
+                if confirmed and range_start < settled_end:
+                    self._extend_coverage(ticker, interval, range_start, min(range_end, settled_end))
+            self.conn.commit()
+
+        if empty_heads:
+            # The head is real if the provider is up: it returned bars in this call, or
+            # it still returns the bars stored right after the head
+            answering = None if answered else self._provider_answers({t for t, _, _ in empty_heads}, interval)
+            for ticker, range_start, range_end in empty_heads:
+                if answering is None or ticker in answering:
+                    self._extend_coverage(ticker, interval, range_start, min(range_end, settled_end))
+            self.conn.commit()
+
+        results = {}
+        for ticker in dict.fromkeys(tickers):
+            if self.is_invalid(ticker):
+                continue
+            frame = self._load(ticker, start, end, interval)
+            if frame.empty and empty_span[ticker] >= MIN_INVALID_SPAN and self._is_unknown(ticker) \
+                    and self._record_miss(ticker) >= INVALID_AFTER_MISSES:
+                self._mark_invalid(ticker)
+                print(f"[WARN] No data for {ticker}; caching as invalid symbol")
+                continue
+            results[ticker] = frame
+        return results
+
+    def _is_unknown(self, ticker) -> bool:
+        """True if no bar was ever stored for this symbol in any interval."""
+        return self.conn.execute("SELECT 1 FROM bars WHERE ticker = ? LIMIT 1", (ticker,)).fetchone() is None
+
+    def _record_miss(self, ticker) -> int:
+        """Count an empty answer (once per MISS_INTERVAL); returns the misses so far."""
+        now = datetime.utcnow()
+        row = self.conn.execute("SELECT misses, last_at FROM empty_answers WHERE ticker = ?", (ticker,)).fetchone()
+        if row and now - datetime.fromisoformat(row[1]) < MISS_INTERVAL:
+            return row[0]
+        misses = (row[0] if row else 0) + 1
+        self.conn.execute("INSERT OR REPLACE INTO empty_answers VALUES (?, ?, ?)", (ticker, misses, now.isoformat()))
+        self.conn.commit()
+        return misses
+
+    def _mark_invalid(self, ticker):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO invalid_symbols VALUES (?, ?)", (ticker, datetime.utcnow().isoformat())
+        )
+        self.conn.execute("DELETE FROM empty_answers WHERE ticker = ?", (ticker,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
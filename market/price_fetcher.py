@@ -3,7 +3,8 @@
 Market Price Fetcher (Dynamic Tickers)
 --------------------------------------
 - Reads tickers from processed sentiment JSON files
-- Fetches latest stock/crypto prices using Yahoo Finance (yfinance)
+- Fetches latest stock/crypto prices using Yahoo Finance (yfinance), batched
+  across tickers and cached on disk (market/price_cache.py)
 - Saves results into data/processed/market_prices.json 
 
 
@@ -11,50 +12,83 @@ Market Price Fetcher (Dynamic Tickers)
 
 import os
 import json
-from datetime import datetime
-import yfinance as yf
+import argparse
+from datetime import datetime, timedelta
+from market.ticker_matcher import TickerMatcher, UNIVERSE_FILE
+from market.providers import YahooProvider
+from market.price_cache import OHLCVCache, DEFAULT_PRICE_CACHE
+from pipeline.state import PipelineState
+from pipeline.jsonl import find_dataset, iter_records
+from pipeline import metrics
 
 # Paths for the data 
 DATA_DIR = "data/processed"
+# Processed datasets may be JSON arrays or (compressed) JSONL
 PROCESSED_FILES = [
-    os.path.join(DATA_DIR, "reddit_with_sentiment.json"),
-    os.path.join(DATA_DIR, "news_with_sentiment.json")
+    find_dataset(os.path.join(DATA_DIR, name)) or os.path.join(DATA_DIR, name + ".json")
+    for name in ("reddit_with_sentiment", "news_with_sentiment")
 ]
 OUTPUT_FILE = os.path.join(DATA_DIR, "market_prices.json")
+# Daily bars requested per ticker; covers weekends/holidays before the last close
+LOOKBACK_DAYS = 7
 
-def extract_tickers(files):
-    """Extract unique tickers from processed JSON files."""
+@metrics.timed("stage", stage="extract")
+def extract_tickers(files, matcher=None):
+    """
+    Extract unique tickers from processed JSON files.
+    With a TickerMatcher, tickers are normalized to canonical symbols (BTC -> BTC-USD).
+    """
     tickers = set()
     for file_path in files:
         if not os.path.exists(file_path):
             print(f"[WARN] File not found: {file_path}")
             continue
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        for item in data:
-            tickers.update(item.get("tickers", []))
+        for item in iter_records(file_path):
+            item_tickers = item.get("tickers", [])
+            if matcher is not None:
+                item_tickers = [matcher.normalize(t) for t in item_tickers]
+            tickers.update(item_tickers)
     return list(tickers)
 
-def fetch_prices(tickers):
-    """Fetch latest prices from Yahoo Finance."""
+@metrics.timed("stage", stage="prices")
+def fetch_prices(tickers, provider=None, cache=None, lookback_days=LOOKBACK_DAYS):
+    """
+    Fetch latest prices for all tickers in one batched request.
+    Bars come through an OHLCVCache (on-disk, only missing ranges are fetched);
+    by default Yahoo Finance backs a cache at DEFAULT_PRICE_CACHE.
+    """
+    own_cache = cache is None
+    if own_cache:
+        cache = OHLCVCache(provider or YahooProvider(), DEFAULT_PRICE_CACHE)
+    start = datetime.utcnow() - timedelta(days=lookback_days)
+    history = cache.get_ohlcv(list(tickers), start)
+    if own_cache:
+        cache.close()
+
     prices = {}
     for ticker in tickers:
-        try:
-            stock = yf.Ticker(ticker)
-            hist = stock.history(period="1d")
-            if not hist.empty:
-                price = hist["Close"].iloc[-1]
-                prices[ticker] = {
-                    "price": float(price),
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-                print(f"[INFO] {ticker}: {price}")
-            else:
-                print(f"[WARN] No data for {ticker}")
-        except Exception as e:
-            print(f"[ERROR] Could not fetch {ticker}: {e}")
+        hist = history.get(ticker)
+        if hist is None or hist.empty or hist["Close"].dropna().empty:
+            print(f"[WARN] No data for {ticker}")
+            continue
+        price = hist["Close"].dropna().iloc[-1]
+        prices[ticker] = {
+            "price": float(price),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        print(f"[INFO] {ticker}: {price}")
     return prices
 
+def fetch_history(tickers, days, provider=None, cache=None):
+    """Daily OHLCV history for the last `days` days per ticker, served through the cache."""
+    own_cache = cache is None
+    if own_cache:
+        cache = OHLCVCache(provider or YahooProvider(), DEFAULT_PRICE_CACHE)
+    history = cache.get_ohlcv(list(tickers), datetime.utcnow() - timedelta(days=days))
+    if own_cache:
+        cache.close()
+    return history
+
 def save_prices(prices, output_path):
     """Save fetched prices to JSON file."""
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -62,10 +96,36 @@ def save_prices(prices, output_path):
         json.dump(prices, f, indent=2)
     print(f"[INFO] Saved prices to {output_path}")
 
+def load_prices(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
 if __name__ == "__main__":
-    tickers = extract_tickers(PROCESSED_FILES)
-    if not tickers:
-        print("[WARN] No tickers found. Exiting.")
-    else:
-        prices = fetch_prices(tickers)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only fetch tickers with new mentions and merge into the existing file")
+    args = parser.parse_args()
+
+    matcher = TickerMatcher.from_file(UNIVERSE_FILE) if os.path.exists(UNIVERSE_FILE) else None
+    if args.incremental:
+        state = PipelineState()
+        dirty = state.dirty_tickers("prices")
+        tickers = [matcher.normalize(t) for t in dirty] if matcher else list(dirty)
+        prices = load_prices(OUTPUT_FILE)
+        fetched = fetch_prices(sorted(set(tickers)))
+        prices.update(fetched)
         save_prices(prices, OUTPUT_FILE)
+        state.mark_dirty("features", fetched)
+        state.clear_dirty("prices", dirty)
+        state.close()
+    else:
+        tickers = extract_tickers(PROCESSED_FILES, matcher)
+        if not tickers:
+            print("[WARN] No tickers found. Exiting.")
+        else:
+            prices = fetch_prices(tickers)
+            save_prices(prices, OUTPUT_FILE)
+    metrics.dump(prefix="prices")
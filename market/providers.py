@@ -0,0 +1,91 @@
+# market/providers.py
+"""
+OHLCV Price Providers
+---------------------
+- PriceProvider: interface for batched multi-ticker OHLCV downloads
+- YahooProvider: one yf.download call per batch instead of one request per symbol
+- StaticProvider: local in-memory provider for tests and benchmarks
+"""
+
+from typing import Dict, List
+
+import pandas as pd
+
+from pipeline import metrics
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def empty_ohlcv() -> pd.DataFrame:
+    return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name="Date"), dtype=float)
+
+
+class PriceProvider:
+    """
+    Fetches OHLCV bars for many tickers at once.
+    Implementations return {ticker: DataFrame indexed by bar time with OHLCV_COLUMNS};
+    unknown/invalid symbols map to an empty DataFrame.
+    """
+
+    def fetch_ohlcv(self, tickers: List[str], start: pd.Timestamp, end: pd.Timestamp,
+                    interval: str = "1d") -> Dict[str, pd.DataFrame]:
+        raise NotImplementedError
+
+
+class YahooProvider(PriceProvider):
+    """Batched Yahoo Finance downloads (yfinance threads the HTTP calls internally)."""
+
+    def __init__(self, batch_size: int = 200):
+        self.batch_size = batch_size
+
+    def fetch_ohlcv(self, tickers, start, end, interval="1d"):
+        # yfinance is slow to import; only load it when Yahoo is actually queried
+        import yfinance as yf
+
+        results = {}
+        for i in range(0, len(tickers), self.batch_size):
+            batch = list(tickers[i:i + self.batch_size])
+            with metrics.span("external_call", service="yahoo"):
+                data = yf.download(
+                    batch, start=start, end=end, interval=interval,
+                    group_by="ticker", auto_adjust=False, threads=True, progress=False,
+                )
+            for ticker in batch:
+                results[ticker] = self._extract(data, ticker, len(batch))
+        return results
+
+    @staticmethod
+    def _extract(data: pd.DataFrame, ticker: str, batch_len: int) -> pd.DataFrame:
+        if data is None or data.empty:
+            return empty_ohlcv()
+        if isinstance(data.columns, pd.MultiIndex):
+            if ticker not in data.columns.get_level_values(0):
+                return empty_ohlcv()
+            frame = data[ticker]
+        elif batch_len == 1:
+            frame = data
+        else:
+            return empty_ohlcv()
+        frame = frame.reindex(columns=OHLCV_COLUMNS).dropna(how="all")
+        if frame.index.tz is not None:
+            frame.index = frame.index.tz_convert("UTC").tz_localize(None)
+        return frame
+
+
+class StaticProvider(PriceProvider):
+    """Serves OHLCV frames from memory and records every request it receives."""
+
+    def __init__(self, frames: Dict[str, pd.DataFrame]):
+        self.frames = frames
+        self.calls: List[tuple] = []
+
+    def fetch_ohlcv(self, tickers, start, end, interval="1d"):
+        self.calls.append((tuple(tickers), start, end, interval))
+        results = {}
+        for ticker in tickers:
+            frame = self.frames.get(ticker)
+            if frame is None:
+                results[ticker] = empty_ohlcv()
+            else:
+                results[ticker] = frame[(frame.index >= start) & (frame.index < end)]
+        return results
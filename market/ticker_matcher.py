@@ -0,0 +1,157 @@
+# market/ticker_matcher.py
+"""
+Local Ticker Matcher
+--------------------
+- Builds an Aho-Corasick automaton once from a symbol/alias universe file
+  (data/reference/ticker_universe.json, e.g. "Tesla" -> TSLA, "Bitcoin" -> BTC-USD)
+- Scans each text in a single pass over its word tokens, so matches always sit
+  on word boundaries and multi-word aliases ("Berkshire Hathaway") work
+- Case rules: all-caps aliases (AAPL, BTC) are case-sensitive, names are not;
+  cashtags ($tsla) always match, and word-like symbols can be cashtag-only.
+  Names that are also common words ("Apple", "Ripple", "Ether") are listed under
+  "case_sensitive_aliases" and only match with their exact capitalization
+- Hyphenated compounds ("Tesla-backed") are split for name lookup, unless the
+  whole token is itself an alias (BTC-USD); symbols never match on a fragment
+- Normalizes LLM-produced tickers to canonical symbols (BTC -> BTC-USD, $TSLA -> TSLA)
+"""
+
+import re
+import json
+from typing import Dict, List, Set
+
+UNIVERSE_FILE = "data/reference/ticker_universe.json"
+
+# Words (with optional $ prefix) joined by . - & as in BRK.B, BTC-USD, AT&T
+TOKEN_RE = re.compile(r"(\$?)([A-Za-z0-9]+(?:[.\-&][A-Za-z0-9]+)*)")
+
+
+def tokenize(text: str):
+    """Yield (is_cashtag, token) pairs for a text."""
+    for m in TOKEN_RE.finditer(text or ""):
+        yield bool(m.group(1)), m.group(2)
+
+
+class TickerMatcher:
+    """Token-level Aho-Corasick automaton over every alias in the universe."""
+
+    def __init__(self, universe: Dict[str, Dict]):
+        self.symbols: Set[str] = set(universe)
+        # Lowercased cashtag body -> canonical symbol ($btc, $tsla, $brk.b)
+        self.cashtags: Dict[str, str] = {}
+        # Trie: list of {token: next_state};
+        # outputs[state] = [(symbol, case_sensitive, is_symbol, tokens)]
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List] = [[]]
+
+        for symbol, spec in universe.items():
+            spec = spec or {}
+            aliases = list(spec.get("aliases", []))
+            exact = set(spec.get("case_sensitive_aliases", []))
+            aliases += [alias for alias in exact if alias not in aliases]
+            self.cashtags[symbol.lower()] = symbol
+            base = symbol.split("-")[0]
+            if base != symbol:
+                self.cashtags.setdefault(base.lower(), symbol)
+            if not spec.get("cashtag_only"):
+                aliases.append(symbol)
+            for alias in aliases:
+                if alias.isupper() and alias.replace("-", "").replace(".", "").isalnum():
+                    self.cashtags.setdefault(alias.lower(), symbol)
+                self._add_alias(alias, symbol, alias in exact)
+        self._build_failure_links()
+
+    @classmethod
+    def from_file(cls, path: str = UNIVERSE_FILE) -> "TickerMatcher":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _add_alias(self, alias: str, symbol: str, case_sensitive: bool = False):
+        tokens = [tok for _, tok in tokenize(alias)]
+        if not tokens:
+            return
+        state = 0
+        for tok in tokens:
+            key = tok.lower()
+            nxt = self._goto[state].get(key)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][key] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        # All-caps aliases are symbols/abbreviations and must match exactly
+        self._out[state].append((symbol, case_sensitive or alias.isupper(), alias.isupper(), tokens))
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for key, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and key not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(key, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def match(self, text: str) -> List[str]:
+        """Return canonical symbols mentioned in text, in first-seen order."""
+        found: Dict[str, None] = {}
+        goto, fail, out, cashtags = self._goto, self._fail, self._out, self.cashtags
+        root = goto[0]
+        window: List[str] = []
+        # Window positions that are fragments of a split hyphenated token
+        fragments: List[bool] = []
+        state = 0
+        for cash, whole in TOKEN_RE.findall(text or ""):
+            key = whole.lower()
+            if cash and key in cashtags:
+                found.setdefault(cashtags[key], None)
+            if not state and key not in root and "-" not in whole:
+                continue
+            if "-" in whole and key not in root and key not in goto[state]:
+                parts = whole.split("-")
+            else:
+                parts = (whole,)
+            for tok in parts:
+                key = tok.lower()
+                if not state:
+                    state = root.get(key, 0)
+                    if not state:
+                        continue
+                else:
+                    while state and key not in goto[state]:
+                        state = fail[state]
+                    state = goto[state].get(key, 0)
+                    if not state:
+                        window.clear()
+                        fragments.clear()
+                        continue
+                window.append(tok)
+                fragments.append(len(parts) > 1)
+                for symbol, case_sensitive, is_symbol, tokens in out[state]:
+                    if case_sensitive and window[-len(tokens):] != tokens:
+                        continue
+                    if is_symbol and any(fragments[-len(tokens):]):
+                        continue
+                    found.setdefault(symbol, None)
+        return list(found)
+
+    def has_match(self, text: str) -> bool:
+        return bool(self.match(text))
+
+    def normalize(self, ticker: str) -> str:
+        """Map an LLM-produced ticker/alias to its canonical symbol when known."""
+        raw = (ticker or "").strip().lstrip("$")
+        key = raw.lower()
+        if key in self.cashtags:
+            return self.cashtags[key]
+        matches = self.match(raw)
+        if len(matches) == 1:
+            return matches[0]
+        return raw.upper()
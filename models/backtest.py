@@ -0,0 +1,248 @@
+# models/backtest.py
+"""
+Vectorized Backtester
+---------------------
+- Simulates a whole (time x tickers) signal matrix at once: the loop runs over
+  bars only, every ticker is updated with NumPy array ops
+- Fees, slippage, stop-loss/take-profit and per-position size limits
+- Parameter sweeps (sentiment thresholds, smoothing windows, ...) run across a
+  process pool; price and signal matrices are placed once in shared memory and
+  attached read-only by each worker instead of being pickled per task
+
+Signals are sentiment-style scores centred on 0 (e.g. avg_sentiment - 1):
+above `entry_threshold` goes long, below -`entry_threshold` goes short (if
+allowed). Positions are taken at bar t's close and earn bar t+1's return;
+align_signal only lets a feature row reach the first bar after its timestamp.
+
+Usage:
+  python -m models.backtest --column sentiment_ewm_1d --days 365 --processes 8
+"""
+
+import os
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from market.indicators import sma
+from pipeline.shm import attach, release, share
+
+TRADING_DAYS = 252
+
+DEFAULT_PARAMS = {
+    "entry_threshold": 0.2,
+    "window": 1,
+    "allow_short": False,
+    "max_position": 0.1,
+    "fee_bps": 1.0,
+    "slippage_bps": 5.0,
+    "stop_loss": None,
+    "take_profit": None,
+}
+
+
+def signal_to_target(signal: np.ndarray, entry_threshold: float, window: int = 1,
+                     allow_short: bool = False) -> np.ndarray:
+    """Smoothed signal -> target direction in {-1, 0, 1} (NaN signals mean flat)."""
+    if window > 1:
+        signal = sma(signal, window)
+    target = np.zeros(signal.shape)
+    target[signal > entry_threshold] = 1.0
+    if allow_short:
+        target[signal < -entry_threshold] = -1.0
+    return target
+
+
+def run_backtest(close: np.ndarray, signal: np.ndarray, **params) -> Dict:
+    """
+    Backtest one parameter set on aligned (T x N) close and signal matrices.
+    Returns metrics plus the per-bar portfolio return series.
+    """
+    p = {**DEFAULT_PARAMS, **params}
+    close = np.asarray(close, dtype=np.float64)
+    target = signal_to_target(np.asarray(signal, dtype=np.float64), p["entry_threshold"],
+                              int(p["window"]), bool(p["allow_short"]))
+    T, N = close.shape
+    with np.errstate(divide="ignore", invalid="ignore"):
+        asset_ret = np.nan_to_num(close[1:] / close[:-1] - 1.0, nan=0.0, posinf=0.0, neginf=0.0)
+    cost_rate = (p["fee_bps"] + p["slippage_bps"]) / 1e4
+    stop_loss, take_profit = p["stop_loss"], p["take_profit"]
+
+    direction = np.zeros(N)        # current held direction per ticker
+    entry = np.full(N, np.nan)     # entry price of the open position
+    blocked = np.zeros(N)          # direction stopped out; re-entry waits for a new signal
+    weights_prev = np.zeros(N)
+    port_ret = np.zeros(T)
+    turnover = np.zeros(T)
+    trades = 0
+
+    for t in range(T):
+        price = close[t]
+        want = target[t].copy()
+        tradable = ~np.isnan(price)
+        want[~tradable] = direction[~tradable]
+
+        # Stop-loss / take-profit on open positions, evaluated at this bar's close
+        if stop_loss is not None or take_profit is not None:
+            open_pos = direction != 0
+            with np.errstate(invalid="ignore"):
+                pnl = direction * (price / entry - 1.0)
+            exit_now = np.zeros(N, dtype=bool)
+            if stop_loss is not None:
+                exit_now |= open_pos & (pnl <= -stop_loss)
+            if take_profit is not None:
+                exit_now |= open_pos & (pnl >= take_profit)
+            blocked[exit_now] = direction[exit_now]
+        # A stopped-out direction stays blocked until the target changes
+        blocked[want != blocked] = 0
+        want[(blocked != 0) & (want == blocked)] = 0
+
+        changed = want != direction
+        trades += int(np.count_nonzero(changed & (want != 0)))
+        entry[changed] = price[changed]
+        entry[want == 0] = np.nan
+        direction = want
+
+        # Size: max_position per ticker, gross exposure capped at 1
+        weights = direction * p["max_position"]
+        gross = np.abs(weights).sum()
+        if gross > 1.0:
+            weights /= gross
+        turnover[t] = np.abs(weights - weights_prev).sum()
+        if t + 1 < T:
+            port_ret[t + 1] += weights @ asset_ret[t]
+        port_ret[t] -= turnover[t] * cost_rate
+        weights_prev = weights
+
+    return {**summarize(port_ret), "turnover": float(turnover.sum()), "trades": trades, "returns": port_ret}
+
+
+def summarize(returns: np.ndarray, periods_per_year: int = TRADING_DAYS) -> Dict:
+    equity = np.cumprod(1.0 + returns)
+    years = max(len(returns) / periods_per_year, 1e-9)
+    std = returns.std()
+    peak = np.maximum.accumulate(equity)
+    return {
+        "total_return": float(equity[-1] - 1.0) if len(equity) else 0.0,
+        "cagr": float(equity[-1] ** (1.0 / years) - 1.0) if len(equity) and equity[-1] > 0 else -1.0,
+        "sharpe": float(returns.mean() / std * np.sqrt(periods_per_year)) if std > 0 else 0.0,
+        "max_drawdown": float((equity / peak - 1.0).min()) if len(equity) else 0.0,
+    }
+
+
+def param_grid(grid: Dict[str, Iterable]) -> List[Dict]:
+    """Expand {"name": [values]} into the list of parameter combinations."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+# --------------------------------------------------------------------------- #
+# Parallel sweeps over shared read-only arrays
+# --------------------------------------------------------------------------- #
+
+_shared = {}
+
+
+def _init_worker(close_spec, signal_spec):
+    # Keep the SharedMemory handles referenced for the worker's lifetime
+    _shared["close_shm"], _shared["close"] = attach(close_spec)
+    _shared["signal_shm"], _shared["signal"] = attach(signal_spec)
+
+
+def _run_shared(params):
+    result = run_backtest(_shared["close"], _shared["signal"], **params)
+    result.pop("returns")
+    return {**params, **result}
+
+
+def run_sweep(close: np.ndarray, signal: np.ndarray, grid: Dict[str, Iterable],
+              processes: Optional[int] = None, base_params: Optional[Dict] = None) -> pd.DataFrame:
+    """
+    Backtest every combination in `grid` (merged over base_params) and return
+    one row of parameters + metrics per combination, best Sharpe first.
+    """
+    combos = [{**(base_params or {}), **combo} for combo in param_grid(grid)]
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    signal = np.ascontiguousarray(signal, dtype=np.float64)
+    processes = processes or os.cpu_count() or 1
+
+    started = time.perf_counter()
+    if processes == 1:
+        rows = []
+        for combo in combos:
+            result = run_backtest(close, signal, **combo)
+            result.pop("returns")
+            rows.append({**combo, **result})
+    else:
+        close_shm, close_spec = share(close)
+        signal_shm, signal_spec = share(signal)
+        try:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                     initargs=(close_spec, signal_spec)) as pool:
+                chunksize = max(1, len(combos) // (processes * 4))
+                rows = list(pool.map(_run_shared, combos, chunksize=chunksize))
+        finally:
+            release((close_shm, signal_shm))
+    elapsed = time.perf_counter() - started
+    print(f"[INFO] Swept {len(combos)} parameter sets over {close.shape[1]} tickers x "
+          f"{close.shape[0]} bars in {elapsed:.1f}s")
+    return pd.DataFrame(rows).sort_values("sharpe", ascending=False).reset_index(drop=True)
+
+
+def align_signal(features: pd.DataFrame, column: str, index: pd.DatetimeIndex, tickers: List[str],
+                 neutral: float = 1.0) -> np.ndarray:
+    """
+    Pivot feature rows (ticker, timestamp, column) onto a price index, carrying
+    the latest known value forward and centring it on the neutral code.
+
+    A feature row is first usable at the first bar strictly after its
+    timestamp: daily bars are stamped at midnight but trade at the close, so
+    a post made after the close on day D (or any time on D) is traded at D+1's
+    close, never at D's.
+    """
+    bars = pd.DatetimeIndex(index)
+    if bars.tz is not None:
+        bars = bars.tz_convert("UTC").tz_localize(None)
+    df = features[["ticker", "timestamp", column]].copy()
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True).dt.tz_localize(None)
+    df = df.sort_values("timestamp", kind="stable")
+    position = bars.searchsorted(df["timestamp"].to_numpy(), side="right")
+    # Rows newer than the last bar have no bar to trade on yet
+    df = df[position < len(bars)].assign(bar=position[position < len(bars)])
+    wide = df.pivot_table(index="bar", columns="ticker", values=column, aggfunc="last")
+    wide = wide.reindex(index=range(len(bars)), columns=tickers).ffill()
+    return wide.to_numpy(dtype=np.float64) - neutral
+
+
+if __name__ == "__main__":
+    from models.feature_store import FeatureStore
+    from market.price_fetcher import fetch_history
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--column", default="avg_sentiment", help="Feature column used as the signal")
+    parser.add_argument("--days", type=int, default=365, help="Days of daily history to backtest")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    features = FeatureStore().read(columns=[args.column])
+    tickers = sorted(features["ticker"].unique()) if not features.empty else []
+    if not tickers:
+        raise SystemExit("No feature rows in the feature store; run `python -m models.feature_engineering` first.")
+    history = fetch_history(tickers, args.days)
+    tickers = [t for t in tickers if t in history and not history[t].empty]
+    if not tickers:
+        raise SystemExit("No price history for any ticker in the feature store.")
+    close = pd.DataFrame({t: history[t]["Close"] for t in tickers}).sort_index()
+    signal = align_signal(features, args.column, close.index, tickers)
+
+    results = run_sweep(close.to_numpy(), signal, {
+        "entry_threshold": [0.1, 0.25, 0.5],
+        "window": [1, 3, 5],
+        "stop_loss": [None, 0.05, 0.1],
+        "take_profit": [None, 0.1, 0.2],
+    }, processes=args.processes)
+    print(results.head(10).to_string())
@@ -3,24 +3,47 @@
 Feature Engineering for Trading Bot
 -----------------------------------
 - Combines sentiment data (Reddit + News) with market price snapshots
+- Rolling (15m/1h/1d) and exponentially-decayed sentiment per ticker, weighted by source
+- Near-duplicate records (syndicated articles, cross-posts) count once; the
+  `duplicates` column says how many copies were left out
 - Produces a feature dataset for modeling and later used in the prediction models 
 - The Features will be saved to data/features/features_dataset.csv to be used latter
 """
 
 import os
 import json
+import argparse
+from collections import deque
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
+from pipeline.state import PipelineState
+from pipeline.jsonl import find_dataset, iter_records
+from pipeline import metrics
+from market.ticker_matcher import TickerMatcher, UNIVERSE_FILE
+from market.indicators import compute_indicators
 
 # Paths
 DATA_DIR = "data/processed"
+# Sentiment datasets may be JSON arrays or (compressed) JSONL
 SENTIMENT_FILES = [
-    os.path.join(DATA_DIR, "reddit_with_sentiment.json"),
-    os.path.join(DATA_DIR, "news_with_sentiment.json")
+    find_dataset(os.path.join(DATA_DIR, name)) or os.path.join(DATA_DIR, name + ".json")
+    for name in ("reddit_with_sentiment", "news_with_sentiment")
 ]
+# Only these fields are kept in memory while streaming records in
+SENTIMENT_COLUMNS = ("tickers", "sentiment", "source", "subreddit", "published_at", "created_utc", "created_at",
+                     "duplicate_of")
 MARKET_FILE = os.path.join(DATA_DIR, "market_prices.json")
 OUTPUT_FILE = os.path.join("data/features", "features_dataset.csv")
 
+SENTIMENT_CODES = {"Negative": 0, "Neutral": 1, "Positive": 2}
+NEUTRAL_CODE = SENTIMENT_CODES["Neutral"]
+# Window label -> pandas offset; also the half-life of the decayed feature
+WINDOWS = {"15m": "15min", "1h": "1h", "1d": "1D"}
+# How much one mention counts towards the weighted features, per source type
+SOURCE_WEIGHTS = {"news": 1.0, "reddit": 0.6, "twitter": 0.4}
+# Days of daily bars loaded so every indicator is past its warm-up
+INDICATOR_HISTORY_DAYS = 120
+
 
 def load_sentiment_data():
     """Load sentiment JSON files and merge into one DataFrame."""
@@ -29,11 +52,8 @@ def load_sentiment_data():
         if not os.path.exists(path):
             print(f"[WARN] Missing: {path}")
             continue
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        if isinstance(data, dict):  # edge case: JSON saved as dict
-            data = [data]
-        dfs.append(pd.DataFrame(data))
+        rows = ({k: item[k] for k in SENTIMENT_COLUMNS if k in item} for item in iter_records(path))
+        dfs.append(pd.DataFrame(rows))
     if not dfs:
         raise FileNotFoundError("No sentiment data found.")
     return pd.concat(dfs, ignore_index=True)
@@ -57,52 +77,284 @@ def load_market_data():
 
 
 def encode_sentiment(df):
-    """Encode sentiment (Positive/Neutral/Negative)."""
-    le = LabelEncoder()
-    df["sentiment_encoded"] = le.fit_transform(df["sentiment"])
+    """
+    Encode sentiment (Positive/Neutral/Negative) as 2/1/0.
+    The mapping is fixed so codes do not shift when a label is absent from a batch.
+    """
+    df["sentiment_encoded"] = df["sentiment"].map(SENTIMENT_CODES).fillna(NEUTRAL_CODE)
     return df
 
 
-def build_feature_dataset():
-    """Merge sentiment + market prices into a feature dataset."""
+def flatten_mentions(sentiment_df, matcher=None):
+    """
+    One row per (record, ticker) mention with a UTC timestamp, source type,
+    source weight and encoded sentiment, built without any Python row loop.
+    Near-duplicates of an earlier record (see sentiment/dedup.py) are flagged
+    in `is_duplicate` so they can be left out of the aggregates.
+    """
+    df = sentiment_df.copy()
+    for col in ("tickers", "sentiment", "subreddit", "published_at", "created_utc", "created_at", "duplicate_of"):
+        if col not in df:
+            df[col] = None
+
+    # Source type: Reddit posts carry a subreddit, tweets a created_at, news the rest
+    df["source_type"] = "news"
+    df.loc[df["created_at"].notna(), "source_type"] = "twitter"
+    df.loc[df["subreddit"].notna(), "source_type"] = "reddit"
+    df["ts"] = pd.to_datetime(
+        df["published_at"].fillna(df["created_utc"]).fillna(df["created_at"]),
+        utc=True, errors="coerce", format="ISO8601",
+    )
+
+    df["is_duplicate"] = df["duplicate_of"].notna()
+
+    flat = df[["tickers", "sentiment", "source_type", "ts", "is_duplicate"]].explode("tickers")
+    flat = flat.rename(columns={"tickers": "ticker"}).dropna(subset=["ticker"])
+    flat["ticker"] = flat["ticker"].astype(str)
+    if matcher is not None:
+        # Normalize each distinct symbol once (BTC -> BTC-USD)
+        uniques = flat["ticker"].unique()
+        flat["ticker"] = flat["ticker"].map(dict(zip(uniques, map(matcher.normalize, uniques))))
+    flat["sentiment"] = flat["sentiment"].fillna("Neutral")
+    flat["weight"] = flat["source_type"].map(SOURCE_WEIGHTS).fillna(1.0)
+    return encode_sentiment(flat).reset_index(drop=True)
+
+
+def window_features(flat, as_of, windows=WINDOWS):
+    """
+    Rolling and exponentially-decayed sentiment per ticker as of each ticker's
+    timestamp in `as_of` (DataFrame with ticker + as_of columns).
+
+    For each window label w:
+      sentiment_{w}     source-weighted mean code of mentions in (as_of - w, as_of]
+      mentions_{w}      mention count in that window
+      sentiment_ewm_{w} source-weighted mean with exponential decay, half-life w
+    Mentions after as_of are ignored, so snapshots never see the future.
+    """
+    merged = flat.merge(as_of[["ticker", "as_of"]], on="ticker", how="inner")
+    age = (merged["as_of"] - merged["ts"]).dt.total_seconds().to_numpy()
+    valid = ~np.isnan(age) & (age >= 0)
+    merged, age = merged[valid], age[valid]
+    weighted = (merged["weight"] * merged["sentiment_encoded"]).to_numpy()
+    weight = merged["weight"].to_numpy()
+    keys = merged["ticker"].to_numpy()
+
+    columns = {}
+    for label, span in windows.items():
+        seconds = pd.Timedelta(span).total_seconds()
+        in_window = age < seconds
+        decay = np.exp2(-age / seconds)
+        parts = pd.DataFrame({
+            "ticker": keys,
+            "ws": weighted * in_window,
+            "w": weight * in_window,
+            "n": in_window.astype(np.int64),
+            "ews": weighted * decay,
+            "ew": weight * decay,
+        }).groupby("ticker", sort=False).sum()
+        columns[f"sentiment_{label}"] = parts["ws"] / parts["w"].where(parts["w"] > 0)
+        columns[f"mentions_{label}"] = parts["n"]
+        columns[f"sentiment_ewm_{label}"] = parts["ews"] / parts["ew"].where(parts["ew"] > 0)
+
+    result = pd.DataFrame(columns).reset_index()
+    result = as_of[["ticker"]].merge(result, on="ticker", how="left")
+    for label in windows:
+        result[f"sentiment_{label}"] = result[f"sentiment_{label}"].fillna(NEUTRAL_CODE)
+        result[f"sentiment_ewm_{label}"] = result[f"sentiment_ewm_{label}"].fillna(NEUTRAL_CODE)
+        result[f"mentions_{label}"] = result[f"mentions_{label}"].fillna(0).astype(np.int64)
+    return result
+
+
+class IncrementalSentimentWindows:
+    """
+    Per-ticker window state updated as records arrive, matching window_features.
+
+    Each window keeps a deque of in-window mentions with running sums, and an
+    exponentially-decayed numerator/denominator rescaled on every update, so
+    adding a mention or reading a ticker's features is amortized O(1).
+    """
+
+    def __init__(self, windows=WINDOWS, source_weights=None):
+        self.windows = {label: pd.Timedelta(span).total_seconds() for label, span in windows.items()}
+        self.source_weights = dict(SOURCE_WEIGHTS if source_weights is None else source_weights)
+        # ticker -> {label: [deque, sum_ws, sum_w, ewm_ws, ewm_w, last_ts]}
+        self._state = {}
+
+    def _ticker_state(self, ticker):
+        if ticker not in self._state:
+            self._state[ticker] = {label: [deque(), 0.0, 0.0, 0.0, 0.0, None] for label in self.windows}
+        return self._state[ticker]
+
+    @staticmethod
+    def _seconds(ts):
+        """Epoch seconds; naive timestamps are taken as UTC."""
+        ts = pd.Timestamp(ts)
+        if ts.tzinfo is None:
+            ts = ts.tz_localize("UTC")
+        return ts.timestamp()
+
+    def update(self, ticker, sentiment, ts, source_type="news"):
+        """Add one mention (mentions must arrive in timestamp order per ticker)."""
+        t = self._seconds(ts)
+        code = SENTIMENT_CODES.get(sentiment, NEUTRAL_CODE)
+        w = self.source_weights.get(source_type, 1.0)
+        for label, entry in self._ticker_state(ticker).items():
+            seconds = self.windows[label]
+            if entry[5] is not None:
+                factor = 2.0 ** (-(t - entry[5]) / seconds)
+                entry[3] *= factor
+                entry[4] *= factor
+            entry[5] = t
+            entry[3] += w * code
+            entry[4] += w
+            entry[0].append((t, w * code, w))
+            entry[1] += w * code
+            entry[2] += w
+
+    def features(self, ticker, as_of):
+        """Feature dict for one ticker as of `as_of` (same columns as window_features)."""
+        t = self._seconds(as_of)
+        state = self._state.get(ticker)
+        row = {"ticker": ticker}
+        for label, seconds in self.windows.items():
+            entry = state[label] if state else None
+            if entry is None:
+                row[f"sentiment_{label}"] = float(NEUTRAL_CODE)
+                row[f"mentions_{label}"] = 0
+                row[f"sentiment_ewm_{label}"] = float(NEUTRAL_CODE)
+                continue
+            window = entry[0]
+            while window and t - window[0][0] >= seconds:
+                _, ws, w = window.popleft()
+                entry[1] -= ws
+                entry[2] -= w
+            if not window:
+                entry[1] = entry[2] = 0.0  # reset float drift
+            row[f"sentiment_{label}"] = entry[1] / entry[2] if entry[2] > 0 else float(NEUTRAL_CODE)
+            row[f"mentions_{label}"] = len(window)
+            factor = 2.0 ** (-(t - entry[5]) / seconds) if entry[4] > 0 else 0.0
+            # Fully decayed weight (underflow to 0) reads as Neutral, as in window_features
+            if entry[4] * factor > 0:
+                row[f"sentiment_ewm_{label}"] = (entry[3] * factor) / (entry[4] * factor)
+            else:
+                row[f"sentiment_ewm_{label}"] = float(NEUTRAL_CODE)
+        return row
+
+
+def indicator_features(ohlcv):
+    """Latest technical indicator values per ticker from {ticker: OHLCV DataFrame}."""
+    rows = []
+    for ticker, frame in ohlcv.items():
+        if frame is None or frame.empty:
+            continue
+        latest = compute_indicators(frame).iloc[-1].to_dict()
+        latest["ticker"] = ticker
+        rows.append(latest)
+    return pd.DataFrame(rows)
+
+
+@metrics.timed("stage", stage="features")
+def build_feature_dataset(tickers=None, windows=WINDOWS, matcher=None, ohlcv=None):
+    """
+    Merge sentiment + market prices into a feature dataset.
+    If `tickers` is given, only rows for those tickers are built.
+
+    Besides the all-time avg_sentiment/mentions, each row carries windowed
+    sentiment features computed as of the row's price timestamp, and the latest
+    technical indicators when OHLCV history ({ticker: DataFrame}) is given.
+    """
     sentiment_df = load_sentiment_data()
     market_df = load_market_data()
+    if tickers is not None:
+        market_df = market_df[market_df["ticker"].isin(set(tickers))]
 
-    # Flatten sentiment tickers (each record may have multiple tickers)
-    records = []
-    for _, row in sentiment_df.iterrows():
-        tickers = row.get("tickers", [])
-        for t in tickers:
-            records.append({
-                "ticker": t,
-                "sentiment": row.get("sentiment", "Neutral"),
-                "source": row.get("source", ""),
-                "published_at": row.get("published_at", "")
-            })
-    sentiment_flat = pd.DataFrame(records)
+    # Flatten sentiment tickers (each record may have multiple tickers),
+    # normalized with the ticker universe so they line up with price symbols
+    if matcher is None and os.path.exists(UNIVERSE_FILE):
+        matcher = TickerMatcher.from_file(UNIVERSE_FILE)
+    sentiment_flat = flatten_mentions(sentiment_df, matcher)
 
     if sentiment_flat.empty:
         raise ValueError("No sentiment-ticker mappings found.")
 
-    # Encode sentiment
-    sentiment_flat = encode_sentiment(sentiment_flat)
+    # Syndicated copies / cross-posts count once; how many there were is its own feature
+    duplicates = sentiment_flat[sentiment_flat["is_duplicate"]].groupby("ticker").size().rename("duplicates")
+    sentiment_flat = sentiment_flat[~sentiment_flat["is_duplicate"]]
 
-    # Aggregate by ticker → average sentiment
-    agg_sentiment = sentiment_flat.groupby("ticker")["sentiment_encoded"].mean().reset_index()
-    agg_sentiment.rename(columns={"sentiment_encoded": "avg_sentiment"}, inplace=True)
+    # Aggregate by ticker → average sentiment and mention count
+    agg_sentiment = sentiment_flat.groupby("ticker")["sentiment_encoded"].agg(["mean", "size"]).reset_index()
+    agg_sentiment.columns = ["ticker", "avg_sentiment", "mentions"]
+    agg_sentiment = agg_sentiment.merge(duplicates.reset_index(), on="ticker", how="left")
 
     # Merge with market prices
     feature_df = market_df.merge(agg_sentiment, on="ticker", how="left")
 
     # Fill missing sentiment with Neutral (1)
-    feature_df["avg_sentiment"].fillna(1.0, inplace=True)
+    feature_df["avg_sentiment"] = feature_df["avg_sentiment"].fillna(float(NEUTRAL_CODE))
+    feature_df["mentions"] = feature_df["mentions"].fillna(0).astype(np.int64)
+    feature_df["duplicates"] = feature_df["duplicates"].fillna(0).astype(np.int64)
+
+    # Windowed features as of each ticker's price snapshot
+    as_of = feature_df[["ticker"]].copy()
+    as_of["as_of"] = pd.to_datetime(feature_df["timestamp"], utc=True, format="ISO8601")
+    windowed = window_features(sentiment_flat, as_of, windows)
+    feature_df = feature_df.merge(windowed, on="ticker", how="left")
+
+    if ohlcv is not None:
+        indicators = indicator_features(ohlcv)
+        if not indicators.empty:
+            feature_df = feature_df.merge(indicators, on="ticker", how="left")
 
     return feature_df
 
 
+def update_feature_dataset(state, output_path=OUTPUT_FILE, store=None, ohlcv=None):
+    """
+    Rebuild only the rows of tickers whose sentiment or price changed.
+    Recomputed rows are also appended to the feature store, if given.
+    """
+    dirty = state.dirty_tickers("features")
+    if not os.path.exists(output_path):
+        df = updated = build_feature_dataset(ohlcv=ohlcv)
+    elif not dirty:
+        print("[INFO] No changed tickers; features are up to date.")
+        return pd.read_csv(output_path)
+    else:
+        existing = pd.read_csv(output_path)
+        updated = build_feature_dataset(tickers=dirty, ohlcv=ohlcv)
+        df = pd.concat([existing[~existing["ticker"].isin(dirty)], updated], ignore_index=True)
+        print(f"[INFO] Recomputed features for {len(updated)} tickers")
+    if store is not None:
+        store.append(updated)
+    state.clear_dirty("features", dirty)
+    return df
+
+
 if __name__ == "__main__":
-    df = build_feature_dataset()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only recompute tickers whose inputs changed since the last run")
+    parser.add_argument("--indicators", action="store_true",
+                        help="Add technical indicators from cached daily OHLCV history")
+    args = parser.parse_args()
+
+    ohlcv = None
+    if args.indicators:
+        from market.price_fetcher import fetch_history
+        ohlcv = fetch_history(load_market_data()["ticker"].tolist(), INDICATOR_HISTORY_DAYS)
+
+    # Parquet store is the primary output; the CSV is kept as a convenience export
+    from models.feature_store import FeatureStore
+    store = FeatureStore()
+    if args.incremental:
+        state = PipelineState()
+        df = update_feature_dataset(state, store=store, ohlcv=ohlcv)
+        state.close()
+    else:
+        df = build_feature_dataset(ohlcv=ohlcv)
+        store.append(df)
     os.makedirs("data/features", exist_ok=True)
     df.to_csv(OUTPUT_FILE, index=False)
-    print(f" Features saved to {OUTPUT_FILE}")
+    print(f" Features saved to {store.root} and {OUTPUT_FILE}")
     print(df.head())
+    metrics.dump(prefix="features")
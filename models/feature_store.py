@@ -0,0 +1,171 @@
+# models/feature_store.py
+"""
+Partitioned Feature Store
+-------------------------
+- Append-only Parquet dataset under data/features/store/, hive-partitioned
+  by date and ticker (date=2025-08-19/ticker=TSLA/part-<uuid>.parquet)
+- Typed columns (see FEATURE_SCHEMA); unknown feature columns keep their inferred type.
+  Columns added by later appends (e.g. --indicators) are readable: the dataset
+  schema is unified across all part files, older parts read them as null
+- Every append stamps its rows with a monotonic `written_at` (ns); re-appended
+  (ticker, timestamp) rows resolve to the most recent write on read
+- Reads push ticker/date predicates and column selection down to Parquet, so
+  "TSLA, last 30 days, 5 columns" only touches those partitions and columns
+- CSV export kept as a convenience (data/features/features_dataset.csv)
+"""
+
+import os
+import time
+import uuid
+import threading
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+FEATURE_STORE_DIR = os.path.join("data/features", "store")
+PARTITION_COLUMNS = ["date", "ticker"]
+PARTITION_SCHEMA = pa.schema([("date", pa.string()), ("ticker", pa.string())])
+WRITE_SEQUENCE_COLUMN = "written_at"
+
+# Known columns and their Arrow types
+FEATURE_SCHEMA = {
+    "ticker": pa.string(),
+    "timestamp": pa.timestamp("us"),
+    "price": pa.float64(),
+    "avg_sentiment": pa.float64(),
+    WRITE_SEQUENCE_COLUMN: pa.int64(),
+}
+
+_sequence_lock = threading.Lock()
+_last_sequence = 0
+
+
+def _next_write_sequence() -> int:
+    """Wall-clock nanoseconds, forced strictly increasing within this process."""
+    global _last_sequence
+    with _sequence_lock:
+        _last_sequence = max(time.time_ns(), _last_sequence + 1)
+        return _last_sequence
+
+
+def _naive_utc(value) -> pd.Timestamp:
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts
+
+
+class FeatureStore:
+    """Append-only, date/ticker partitioned Parquet store for feature rows."""
+
+    def __init__(self, root: str = FEATURE_STORE_DIR):
+        self.root = root
+
+    def _to_table(self, df: pd.DataFrame) -> pa.Table:
+        df = df.copy()
+        df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True).dt.tz_localize(None)
+        df["date"] = df["timestamp"].dt.strftime("%Y-%m-%d")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        for name, typ in FEATURE_SCHEMA.items():
+            if name in table.column_names and table.schema.field(name).type != typ:
+                idx = table.column_names.index(name)
+                table = table.set_column(idx, name, table.column(name).cast(typ))
+        return table
+
+    def append(self, df: pd.DataFrame) -> int:
+        """Append feature rows (needs `ticker` and `timestamp` columns); returns rows written."""
+        if df.empty:
+            return 0
+        missing = {"ticker", "timestamp"} - set(df.columns)
+        if missing:
+            raise ValueError(f"Feature rows are missing required columns: {sorted(missing)}")
+        sequence = _next_write_sequence()
+        table = self._to_table(df.assign(**{WRITE_SEQUENCE_COLUMN: sequence}))
+        os.makedirs(self.root, exist_ok=True)
+        # Unique, time-ordered basename per write keeps earlier parts untouched (append-only)
+        pq.write_to_dataset(
+            table,
+            root_path=self.root,
+            partition_cols=PARTITION_COLUMNS,
+            basename_template=f"part-{sequence:020d}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        return table.num_rows
+
+    def _dataset(self):
+        partitioning = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+        dataset = ds.dataset(self.root, format="parquet", partitioning=partitioning)
+        # Discovery takes the schema of the first part only; unify across all parts
+        # so columns added by later appends can be selected (missing -> null)
+        schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+        if not schemas:
+            return dataset
+        schema = pa.unify_schemas([*schemas, PARTITION_SCHEMA], promote_options="permissive")
+        return ds.dataset(self.root, schema=schema, format="parquet", partitioning=partitioning)
+
+    def read(self, tickers: Optional[Iterable[str]] = None, start: Optional[datetime] = None,
+             end: Optional[datetime] = None, columns: Optional[List[str]] = None,
+             latest_only: bool = False) -> pd.DataFrame:
+        """
+        Load feature rows filtered by ticker and [start, end) timestamp range.
+        With latest_only=True only the newest row per ticker is returned.
+        """
+        if not os.path.isdir(self.root):
+            raise FileNotFoundError(f"Feature store not found: {self.root}")
+
+        predicate = None
+
+        def _and(expr):
+            return expr if predicate is None else predicate & expr
+
+        if tickers is not None:
+            predicate = _and(ds.field("ticker").isin(list(tickers)))
+        if start is not None:
+            start = _naive_utc(start)
+            # Partition pruning on the date directory, then exact timestamp filter
+            predicate = _and(ds.field("date") >= start.strftime("%Y-%m-%d"))
+            predicate = _and(ds.field("timestamp") >= pa.scalar(start.to_pydatetime(), pa.timestamp("us")))
+        if end is not None:
+            end = _naive_utc(end)
+            predicate = _and(ds.field("date") <= end.strftime("%Y-%m-%d"))
+            predicate = _and(ds.field("timestamp") < pa.scalar(end.to_pydatetime(), pa.timestamp("us")))
+
+        dataset = self._dataset()
+        has_sequence = WRITE_SEQUENCE_COLUMN in dataset.schema.names
+        read_columns = None
+        if columns is not None:
+            unknown = [c for c in columns if c not in dataset.schema.names]
+            if unknown:
+                raise KeyError(f"Feature store has no column(s) {unknown}")
+            # ticker/timestamp/written_at are needed to order and de-duplicate rows
+            read_columns = list(dict.fromkeys(["ticker", "timestamp", *columns]))
+            if has_sequence:
+                read_columns.append(WRITE_SEQUENCE_COLUMN)
+
+        table = dataset.to_table(columns=read_columns, filter=predicate)
+        df = table.to_pandas()
+        if df.empty:
+            return df.drop(columns=[WRITE_SEQUENCE_COLUMN], errors="ignore")
+        df["ticker"] = df["ticker"].astype(str)
+        order = ["ticker", "timestamp", WRITE_SEQUENCE_COLUMN] if has_sequence else ["ticker", "timestamp"]
+        # Parts written before written_at existed sort first (oldest)
+        df = df.sort_values(order, kind="mergesort", na_position="first")
+        # Re-appended snapshots: keep the most recent write per (ticker, timestamp)
+        df = df.drop_duplicates(["ticker", "timestamp"], keep="last")
+        df = df.drop(columns=[WRITE_SEQUENCE_COLUMN], errors="ignore")
+        if latest_only:
+            df = df.groupby("ticker", sort=False).tail(1)
+        if columns is not None:
+            df = df[list(dict.fromkeys(["ticker", "timestamp", *columns]))]
+        return df.reset_index(drop=True)
+
+    def export_csv(self, output_path: str, **filters) -> pd.DataFrame:
+        """Write (a filtered slice of) the store to CSV."""
+        df = self.read(**filters)
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        df.drop(columns=["date"], errors="ignore").to_csv(output_path, index=False)
+        return df
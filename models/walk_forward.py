@@ -0,0 +1,274 @@
+# models/walk_forward.py
+"""
+Walk-Forward / Purged Cross-Validation for the XGBoost signal model
+-------------------------------------------------------------------
+- Rows are ordered by timestamp (or published_at) and split by time only, so
+  no fold ever trains on the future of its test window
+- walk_forward: expanding (or fixed-length rolling) train window followed by
+  the next test block
+- purged_kfold: contiguous time blocks; training rows within `purge` before a
+  test block and `embargo` after it are dropped to stop label leakage
+- Every (fold, hyperparameter candidate) pair runs in a process pool. The
+  feature matrix and labels are placed once in shared memory (pipeline/shm.py,
+  as in models/backtest.py) and folds are passed as index ranges, so no
+  DataFrame is pickled to the workers
+- Reports per-fold accuracy, macro F1, log loss and train/predict timing,
+  plus a per-candidate summary
+- Without a 'label' column the trainer's weak label is used, and
+  avg_sentiment and the sentiment_* windows are left out of the inputs (as in
+  models/xgboost_model.py): they would let the model read its label back
+
+Usage:
+  python -m models.walk_forward --folds 5 --scheme walk_forward --purge 1D --processes 4
+"""
+
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from models.backtest import param_grid
+from models.xgboost_model import (DEFAULT_PARAMS, CLASSES, MODEL_DIR, load_training_data, select_features,
+                                  with_weak_label)
+from pipeline.shm import attach, release, share
+
+TIME_COLUMNS = ("timestamp", "published_at")
+RESULTS_FILE = os.path.join(MODEL_DIR, "walk_forward.csv")
+
+# A fold is (train ranges, test range) of [start, stop) positions in time order
+Ranges = List[Tuple[int, int]]
+Fold = Tuple[Ranges, Tuple[int, int]]
+
+
+def _boundaries(n: int, blocks: int) -> np.ndarray:
+    return np.linspace(0, n, blocks + 1).astype(int)
+
+
+def walk_forward_folds(times: pd.Series, n_folds: int = 5, purge: pd.Timedelta = pd.Timedelta(0),
+                       train_size: Optional[int] = None) -> List[Fold]:
+    """
+    Expanding-window folds over time-sorted rows: the first block only trains,
+    each later block is tested on a model trained on everything before it
+    (minus `purge`), or on the last `train_size` rows for a rolling window.
+    """
+    ts = times.to_numpy()
+    bounds = _boundaries(len(ts), n_folds + 1)
+    folds = []
+    for k in range(1, n_folds + 1):
+        test_start, test_stop = int(bounds[k]), int(bounds[k + 1])
+        train_stop = int(np.searchsorted(ts, ts[test_start] - purge, side="left"))
+        train_start = max(0, train_stop - train_size) if train_size else 0
+        if train_stop > train_start and test_stop > test_start:
+            folds.append(([(train_start, train_stop)], (test_start, test_stop)))
+    return folds
+
+
+def purged_kfold_folds(times: pd.Series, n_folds: int = 5, purge: pd.Timedelta = pd.Timedelta(0),
+                       embargo: pd.Timedelta = pd.Timedelta(0)) -> List[Fold]:
+    """Contiguous time blocks; train on the others minus the purge/embargo gaps around the test block."""
+    ts = times.to_numpy()
+    bounds = _boundaries(len(ts), n_folds)
+    folds = []
+    for k in range(n_folds):
+        test_start, test_stop = int(bounds[k]), int(bounds[k + 1])
+        if test_stop <= test_start:
+            continue
+        before = int(np.searchsorted(ts, ts[test_start] - purge, side="left"))
+        after = int(np.searchsorted(ts, ts[test_stop - 1] + embargo, side="right"))
+        train = [(a, b) for a, b in ((0, before), (after, len(ts))) if b > a]
+        if train:
+            folds.append((train, (test_start, test_stop)))
+    return folds
+
+
+# --------------------------------------------------------------------------- #
+# Metrics
+# --------------------------------------------------------------------------- #
+
+def classification_metrics(y: np.ndarray, proba: np.ndarray, n_classes: int) -> Dict:
+    pred = proba.argmax(axis=1)
+    f1 = []
+    for c in range(n_classes):
+        tp = np.sum((pred == c) & (y == c))
+        fp = np.sum((pred == c) & (y != c))
+        fn = np.sum((pred != c) & (y == c))
+        if tp + fp + fn:
+            f1.append(2 * tp / (2 * tp + fp + fn))
+    picked = np.clip(proba[np.arange(len(y)), y], 1e-15, 1.0)
+    return {
+        "accuracy": float((pred == y).mean()),
+        "macro_f1": float(np.mean(f1)) if f1 else 0.0,
+        "log_loss": float(-np.log(picked).mean()),
+    }
+
+
+# --------------------------------------------------------------------------- #
+# Fold evaluation (in workers)
+# --------------------------------------------------------------------------- #
+
+_shared = {}
+
+
+def _init_worker(X_spec, y_spec, n_classes):
+    # Keep the SharedMemory handles referenced for the worker's lifetime
+    _shared["X_shm"], _shared["X"] = attach(X_spec)
+    _shared["y_shm"], _shared["y"] = attach(y_spec)
+    _shared["n_classes"] = n_classes
+
+
+def _take(array: np.ndarray, ranges: Ranges) -> np.ndarray:
+    if len(ranges) == 1:
+        return array[ranges[0][0]:ranges[0][1]]
+    return np.concatenate([array[a:b] for a, b in ranges])
+
+
+def evaluate_fold(X: np.ndarray, y: np.ndarray, n_classes: int, fold: Fold, params: Dict) -> Dict:
+    """Train on the fold's train ranges and score its test range."""
+    import xgboost as xgb
+
+    train_ranges, (test_start, test_stop) = fold
+    X_train, y_train = _take(X, train_ranges), _take(y, train_ranges)
+    X_test, y_test = X[test_start:test_stop], y[test_start:test_stop]
+
+    train_rows, weight = len(y_train), None
+    if len(np.unique(y_train)) < n_classes:
+        # The classifier needs every class present; add one near-zero-weight NaN row per class
+        X_train = np.vstack([X_train, np.full((n_classes, X.shape[1]), np.nan, dtype=X.dtype)])
+        y_train = np.concatenate([y_train, np.arange(n_classes, dtype=y.dtype)])
+        weight = np.concatenate([np.ones(train_rows), np.full(n_classes, 1e-6)])
+
+    model = xgb.XGBClassifier(**{**DEFAULT_PARAMS, **params},
+                              objective="multi:softprob" if n_classes > 2 else "binary:logistic")
+    started = time.perf_counter()
+    model.fit(X_train, y_train, sample_weight=weight, verbose=False)
+    train_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    proba = np.asarray(model.predict_proba(X_test))
+    predict_seconds = time.perf_counter() - started
+    return {
+        "train_rows": train_rows,
+        "test_rows": len(y_test),
+        **classification_metrics(y_test, proba, n_classes),
+        "train_seconds": round(train_seconds, 4),
+        "predict_seconds": round(predict_seconds, 4),
+    }
+
+
+def _run_shared(task):
+    fold_id, fold, candidate_id, params = task
+    result = evaluate_fold(_shared["X"], _shared["y"], _shared["n_classes"], fold, params)
+    return {"candidate": candidate_id, "fold": fold_id, **params, **result}
+
+
+# --------------------------------------------------------------------------- #
+# Runner
+# --------------------------------------------------------------------------- #
+
+def prepare(df: pd.DataFrame, time_column: Optional[str] = None):
+    """Time-sorted (X, y, times, features, classes) from feature rows."""
+    time_column = time_column or next((c for c in TIME_COLUMNS if c in df), None)
+    if time_column is None:
+        raise ValueError(f"Need one of {TIME_COLUMNS} to split by time.")
+    df = df.assign(_t=pd.to_datetime(df[time_column], utc=True, format="ISO8601"))
+    df = df.dropna(subset=["_t"]).sort_values("_t", kind="mergesort").reset_index(drop=True)
+
+    excluded = [time_column, "_t"]
+    if "label" not in df:
+        # Same weak label as the trainer, without the sentiment columns it is derived from
+        df, leaking = with_weak_label(df)
+        excluded += leaking
+    features = select_features(df, excluded)
+    classes = [c for c in CLASSES if c in set(df["label"])] + sorted(set(df["label"]) - set(CLASSES))
+    y = df["label"].map({c: i for i, c in enumerate(classes)}).to_numpy(dtype=np.int32)
+    X = np.ascontiguousarray(df[features].to_numpy(dtype=np.float32))
+    return X, y, df["_t"], features, classes
+
+
+def run_walk_forward(df: pd.DataFrame, grid: Optional[Dict[str, Sequence]] = None, n_folds: int = 5,
+                     scheme: str = "walk_forward", purge: str = "0D", embargo: str = "0D",
+                     train_size: Optional[int] = None, processes: Optional[int] = None,
+                     time_column: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Evaluate every hyperparameter candidate in `grid` on every time fold.
+    Returns (per-fold results, per-candidate summary sorted by mean macro F1).
+    """
+    X, y, times, features, classes = prepare(df, time_column)
+    purge_td, embargo_td = pd.Timedelta(purge), pd.Timedelta(embargo)
+    if scheme == "walk_forward":
+        folds = walk_forward_folds(times, n_folds, purge_td, train_size)
+    elif scheme == "purged_kfold":
+        folds = purged_kfold_folds(times, n_folds, purge_td, embargo_td)
+    else:
+        raise ValueError(f"Unknown scheme: {scheme}")
+    if not folds:
+        raise ValueError("Not enough rows for the requested folds.")
+
+    candidates = param_grid(grid) if grid else [{}]
+    processes = processes or os.cpu_count() or 1
+    # Parallelism comes from the pool; keep each booster single-threaded unless running serially
+    threads = 1 if processes > 1 else DEFAULT_PARAMS["n_jobs"]
+    tasks = [(f, fold, c, {"n_jobs": threads, **params})
+             for c, params in enumerate(candidates) for f, fold in enumerate(folds)]
+
+    started = time.perf_counter()
+    if processes == 1:
+        rows = []
+        for fold_id, fold, candidate_id, params in tasks:
+            result = evaluate_fold(X, y, len(classes), fold, params)
+            rows.append({"candidate": candidate_id, "fold": fold_id, **params, **result})
+    else:
+        X_shm, X_spec = share(X)
+        y_shm, y_spec = share(y)
+        try:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                     initargs=(X_spec, y_spec, len(classes))) as pool:
+                rows = list(pool.map(_run_shared, tasks))
+        finally:
+            release((X_shm, y_shm))
+    elapsed = time.perf_counter() - started
+
+    results = pd.DataFrame(rows)
+    results["test_start"] = results["fold"].map({f: times.iloc[t[0]] for f, (_, t) in enumerate(folds)})
+    results["test_end"] = results["fold"].map({f: times.iloc[t[1] - 1] for f, (_, t) in enumerate(folds)})
+    param_columns = sorted({k for c in candidates for k in c})
+    summary = (results.groupby("candidate")
+               .agg(**{c: (c, "first") for c in param_columns},
+                    folds=("fold", "size"),
+                    accuracy=("accuracy", "mean"),
+                    macro_f1=("macro_f1", "mean"),
+                    macro_f1_std=("macro_f1", "std"),
+                    log_loss=("log_loss", "mean"),
+                    train_seconds=("train_seconds", "sum"))
+               .sort_values("macro_f1", ascending=False)
+               .reset_index())
+    print(f"[INFO] Evaluated {len(candidates)} candidates x {len(folds)} folds ({scheme}) on "
+          f"{len(y)} rows x {len(features)} features in {elapsed:.1f}s")
+    return results, summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default=None, help="Features CSV (defaults to the feature store)")
+    parser.add_argument("--scheme", choices=("walk_forward", "purged_kfold"), default="walk_forward")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--purge", default="0D", help="Gap before each test block, e.g. 1D")
+    parser.add_argument("--embargo", default="0D", help="Gap after each test block (purged_kfold)")
+    parser.add_argument("--train-size", type=int, default=None, help="Rolling train window in rows")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--output", default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    results, summary = run_walk_forward(
+        load_training_data(args.input),
+        grid={"max_depth": [3, 6], "learning_rate": [0.05, 0.1], "n_estimators": [200, 400]},
+        n_folds=args.folds, scheme=args.scheme, purge=args.purge, embargo=args.embargo,
+        train_size=args.train_size, processes=args.processes,
+    )
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    results.to_csv(args.output, index=False)
+    print(summary.to_string())
+    print(f"[INFO] Per-fold results -> {args.output}")
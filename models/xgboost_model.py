@@ -1,30 +1,467 @@
-# models/xgboost_model.py
-
 # models/xgboost_model.py
 """
 XGBoost model for Buy/Sell/Hold signals
 
-- Trains a multi-class classifier on engineered features.
-- If 'label' is missing in the input CSV, derives a weak label from avg_sentiment.
+- Trains a multi-class classifier on engineered features (histogram tree
+  method, time-ordered validation split with early stopping).
+- Reads training rows from the Parquet feature store (models/feature_store.py),
+  or from a features CSV when --input is given.
+- If 'label' is missing in the input, derives a weak label from avg_sentiment
+  (and then leaves avg_sentiment and the sentiment_* window features out of
+  the inputs, so the model cannot copy or re-derive its own label).
 - Saves model, label encoder, and feature metadata.
 - Can also run prediction on a features CSV.
+- Predictor loads the artifacts once and stays warm; MicroBatcher merges
+  concurrent requests into one predict call and tracks p50/p99 latency;
+  --mode serve exposes both over a local HTTP endpoint.
 
 Usage:
-  # Train (uses data/features/features_dataset.csv by default)
-  python models/xgboost_model.py --mode train
+  # Train (uses the feature store by default)
+  python -m models.xgboost_model --mode train
 
   # Predict (reads data/features/features_dataset.csv by default)
-  python models/xgboost_model.py --mode predict
+  python -m models.xgboost_model --mode predict
 
   # Custom paths
-  python models/xgboost_model.py --mode train --input data/features/my_features.csv
-  python models/xgboost_model.py --mode predict --input data/features/my_latest_features.csv
+  python -m models.xgboost_model --mode train --input data/features/my_features.csv
+  python -m models.xgboost_model --mode predict --input data/features/my_latest_features.csv
+
+  # Serve: POST /predict {"features": {...}} or {"rows": [{...}, ...]}; GET /stats, /metrics
+  python -m models.xgboost_model --mode serve --port 8765
 """
 
 import os
 import json
+import time
+import queue
 import argparse
+import threading
 import warnings
-from typing import List, Tuple
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
 import numpy as np
-import pandas as pd
\ No newline at end of file
+import pandas as pd
+
+from pipeline import metrics
+
+FEATURES_CSV = os.path.join("data/features", "features_dataset.csv")
+PREDICTIONS_CSV = os.path.join("data/features", "predictions.csv")
+MODEL_DIR = "data/models"
+MODEL_FILE = "xgb_model.json"
+ENCODER_FILE = "label_encoder.json"
+META_FILE = "feature_meta.json"
+
+CLASSES = ["SELL", "HOLD", "BUY"]
+# avg_sentiment (0=Negative .. 2=Positive) thresholds for the weak label
+WEAK_LABEL_SELL_BELOW = 0.8
+WEAK_LABEL_BUY_ABOVE = 1.2
+# Identifiers and targets, never model inputs
+NON_FEATURE_COLUMNS = {"ticker", "timestamp", "date", "label"}
+
+DEFAULT_PARAMS = {
+    "tree_method": "hist",
+    "max_bin": 256,
+    "n_estimators": 400,
+    "max_depth": 6,
+    "learning_rate": 0.05,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "n_jobs": -1,
+}
+
+
+# --------------------------------------------------------------------------- #
+# Training
+# --------------------------------------------------------------------------- #
+
+def load_training_data(input_path: Optional[str] = None) -> pd.DataFrame:
+    """Feature rows from a CSV, or the whole feature store, oldest first."""
+    if input_path:
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"Features file not found: {input_path}")
+        df = pd.read_csv(input_path)
+    else:
+        from models.feature_store import FeatureStore
+        df = FeatureStore().read()
+    if df.empty:
+        raise ValueError("No feature rows to train on.")
+    if "timestamp" in df:
+        df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, format="ISO8601")
+        df = df.sort_values("timestamp", kind="mergesort").reset_index(drop=True)
+    return df
+
+
+def weak_label(avg_sentiment: pd.Series) -> pd.Series:
+    """SELL/HOLD/BUY from the average sentiment code."""
+    label = pd.Series("HOLD", index=avg_sentiment.index)
+    label[avg_sentiment < WEAK_LABEL_SELL_BELOW] = "SELL"
+    label[avg_sentiment > WEAK_LABEL_BUY_ABOVE] = "BUY"
+    return label
+
+
+def with_weak_label(df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Add the weak label to rows without one. Returns the rows and the columns
+    that must not be inputs: avg_sentiment and the sentiment_* windows (the
+    same mentions averaged, or the label restated).
+    """
+    if "avg_sentiment" not in df:
+        raise ValueError("Need a 'label' column or 'avg_sentiment' to derive one.")
+    warnings.warn("No 'label' column; deriving a weak label from avg_sentiment.")
+    leaking = [c for c in df.columns if c == "avg_sentiment" or str(c).startswith("sentiment_")]
+    return df.assign(label=weak_label(df["avg_sentiment"])), leaking
+
+
+def select_features(df: pd.DataFrame, exclude=()) -> List[str]:
+    """Numeric feature columns in a stable order."""
+    skip = NON_FEATURE_COLUMNS | set(exclude)
+    return [c for c in df.columns if c not in skip and pd.api.types.is_numeric_dtype(df[c])]
+
+
+def train(df: pd.DataFrame, model_dir: str = MODEL_DIR, validation_fraction: float = 0.2,
+          params: Optional[Dict] = None) -> Dict:
+    """Fit the classifier, save model/encoder/metadata to model_dir; returns the metadata."""
+    import xgboost as xgb
+
+    excluded = []
+    if "label" not in df:
+        df, excluded = with_weak_label(df)
+    features = select_features(df, excluded)
+    if not features:
+        raise ValueError("No numeric feature columns found.")
+
+    # Time-ordered split: validate on the most recent rows
+    n_val = int(len(df) * validation_fraction) if len(df) >= 10 else 0
+    split = len(df) - n_val
+
+    # Classes are encoded from the training rows only: XGBoost needs labels 0..k-1 without gaps
+    seen = set(df["label"].iloc[:split])
+    if len(seen) < 2:
+        raise ValueError(f"Need at least two label classes in the training rows, got {sorted(seen)}.")
+    classes = [c for c in CLASSES if c in seen] + sorted(seen - set(CLASSES))
+    codes = {c: i for i, c in enumerate(classes)}
+    X = df[features].to_numpy(dtype=np.float32)
+    y = df["label"].map(codes).to_numpy()
+    if n_val:
+        known = pd.notna(y[split:])
+        if not known.all():
+            unseen = sorted(set(df["label"].iloc[split:][~known]))
+            warnings.warn(f"{int((~known).sum())} validation rows have labels not in the training rows "
+                          f"({unseen}); they are left out of validation.")
+        X_val, y_val = X[split:][known], y[split:][known].astype(np.int64)
+        n_val = len(y_val)
+    y = y[:split].astype(np.int64)
+
+    model = xgb.XGBClassifier(**{**DEFAULT_PARAMS, **(params or {})},
+                              objective="multi:softprob" if len(classes) > 2 else "binary:logistic",
+                              early_stopping_rounds=30 if n_val else None)
+    eval_set = [(X_val, y_val)] if n_val else None
+    started = time.perf_counter()
+    model.fit(X[:split], y, eval_set=eval_set, verbose=False)
+    elapsed = time.perf_counter() - started
+
+    meta = {
+        "features": features,
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "rows": len(df),
+        "train_seconds": round(elapsed, 3),
+        "weak_label": bool(excluded),
+    }
+    if n_val:
+        meta["validation_accuracy"] = float((model.predict(X_val) == y_val).mean())
+        meta["best_iteration"] = int(model.best_iteration)
+
+    os.makedirs(model_dir, exist_ok=True)
+    model.save_model(os.path.join(model_dir, MODEL_FILE))
+    with open(os.path.join(model_dir, ENCODER_FILE), "w", encoding="utf-8") as f:
+        json.dump({"classes": classes}, f)
+    with open(os.path.join(model_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    print(f"[INFO] Trained on {len(df)} rows x {len(features)} features in {elapsed:.1f}s -> {model_dir}")
+    return meta
+
+
+# --------------------------------------------------------------------------- #
+# Warm prediction
+# --------------------------------------------------------------------------- #
+
+class Predictor:
+    """Model, label encoder and feature list loaded once and reused for every call."""
+
+    def __init__(self, model, classes: List[str], features: List[str]):
+        self.model = model
+        self.classes = list(classes)
+        self.features = list(features)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, model_dir: str = MODEL_DIR) -> "Predictor":
+        import xgboost as xgb
+
+        model = xgb.XGBClassifier()
+        model.load_model(os.path.join(model_dir, MODEL_FILE))
+        with open(os.path.join(model_dir, ENCODER_FILE), "r", encoding="utf-8") as f:
+            classes = json.load(f)["classes"]
+        with open(os.path.join(model_dir, META_FILE), "r", encoding="utf-8") as f:
+            features = json.load(f)["features"]
+        return cls(model, classes, features)
+
+    def vectorize_row(self, row: Dict) -> np.ndarray:
+        """
+        One row (feature name -> value) as a float32 vector; missing features
+        are NaN. Raises TypeError/ValueError for a malformed row.
+        """
+        if not isinstance(row, dict):
+            raise TypeError(f"features must be an object of feature name -> number, got {type(row).__name__}")
+        x = np.full(len(self.features), np.nan, dtype=np.float32)
+        for j, name in enumerate(self.features):
+            value = row.get(name)
+            if value is not None:
+                try:
+                    x[j] = value
+                except (TypeError, ValueError):
+                    raise ValueError(f"feature {name!r} is not numeric: {value!r}") from None
+        return x
+
+    def vectorize(self, rows: List[Dict]) -> np.ndarray:
+        """Rows (feature name -> value) to a float32 matrix; missing features are NaN."""
+        X = np.empty((len(rows), len(self.features)), dtype=np.float32)
+        for i, row in enumerate(rows):
+            X[i] = self.vectorize_row(row)
+        return X
+
+    def predict_matrix(self, X: np.ndarray) -> np.ndarray:
+        """Class probabilities for a feature matrix in self.features order."""
+        with self._lock, metrics.span("stage", stage="predict"):
+            proba = self.model.predict_proba(X)
+        metrics.inc("items_total", len(X), stage="predict")
+        return np.asarray(proba)
+
+    def decode(self, proba: np.ndarray) -> List[Dict]:
+        return [
+            {"signal": self.classes[int(p.argmax())],
+             "probabilities": {c: float(v) for c, v in zip(self.classes, p)}}
+            for p in proba
+        ]
+
+    def predict_rows(self, rows: List[Dict]) -> List[Dict]:
+        return self.decode(self.predict_matrix(self.vectorize(rows)))
+
+    def predict_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Signal and per-class probabilities for every row of a features DataFrame."""
+        X = df.reindex(columns=self.features).to_numpy(dtype=np.float32)
+        proba = self.predict_matrix(X)
+        out = df[[c for c in ("ticker", "timestamp") if c in df]].copy()
+        out["signal"] = [self.classes[i] for i in proba.argmax(axis=1)]
+        for i, c in enumerate(self.classes):
+            out[f"p_{c.lower()}"] = proba[:, i]
+        return out
+
+
+class LatencyStats:
+    """Latency percentiles over the most recent `window` requests."""
+
+    def __init__(self, window: int = 10_000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    def record_batch(self, latencies: List[float]):
+        with self._lock:
+            self.samples.extend(latencies)
+            self.count += len(latencies)
+            self.batches += 1
+
+    def summary(self) -> Dict:
+        with self._lock:
+            samples = np.array(self.samples)
+            count, batches = self.count, self.batches
+        if not len(samples):
+            return {"requests": count, "batches": batches}
+        p50, p99 = np.percentile(samples, [50, 99]) * 1000
+        return {"requests": count, "batches": batches, "avg_batch": round(count / max(batches, 1), 2),
+                "p50_ms": round(float(p50), 3), "p99_ms": round(float(p99), 3),
+                "max_ms": round(float(samples.max() * 1000), 3)}
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests for up to max_wait_ms (or max_batch rows) and
+    answers them with a single Predictor call from one background thread.
+    """
+
+    def __init__(self, predictor: Predictor, max_batch: int = 256, max_wait_ms: float = 2.0):
+        self.predictor = predictor
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.stats = LatencyStats()
+        self._queue: "queue.Queue[Tuple[Dict, Future, float]]" = queue.Queue()
+        self._stopped = threading.Event()
+        # Held for the stopped check plus enqueue, so nothing is queued after close() stops intake
+        self._intake = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, features: Dict) -> Future:
+        future = Future()
+        with self._intake:
+            if self._stopped.is_set():
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put((features, future, time.perf_counter()))
+        return future
+
+    def predict(self, features: Dict, timeout: Optional[float] = None) -> Dict:
+        """Blocking single-row prediction through the shared batch."""
+        return self.submit(features).result(timeout)
+
+    def predict_many(self, rows: List[Dict], timeout: Optional[float] = None) -> List[Dict]:
+        futures = [self.submit(row) for row in rows]
+        return [f.result(timeout) for f in futures]
+
+    def _run(self):
+        while not self._stopped.is_set() or not self._queue.empty():
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._answer(batch)
+
+    def _answer(self, batch):
+        # Each request is validated on its own, so a malformed one only fails its own future
+        rows, valid = [], []
+        for features, future, submitted in batch:
+            try:
+                rows.append(self.predictor.vectorize_row(features))
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            valid.append((future, submitted))
+        if not valid:
+            return
+        try:
+            results = self.predictor.decode(self.predictor.predict_matrix(np.vstack(rows)))
+        except Exception as e:
+            for future, _ in valid:
+                future.set_exception(e)
+            return
+        done = time.perf_counter()
+        self.stats.record_batch([done - submitted for _, submitted in valid])
+        for (future, _), result in zip(valid, results):
+            future.set_result(result)
+
+    def close(self):
+        """Stop accepting requests; queued ones are still answered."""
+        with self._intake:
+            self._stopped.set()
+        self._worker.join()
+        # Only reachable if the worker died: never leave a caller waiting for its timeout
+        while True:
+            try:
+                _, future, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if not future.done():
+                future.set_exception(RuntimeError("MicroBatcher is closed"))
+
+
+def make_server(batcher: MicroBatcher, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """Local HTTP endpoint; each request thread waits on the shared micro-batch."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._reply(200, batcher.stats.summary())
+            elif self.path == "/metrics":
+                body = metrics.REGISTRY.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            elif self.path == "/health":
+                self._reply(200, {"status": "ok", "features": batcher.predictor.features})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._reply(404, {"error": "not found"})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if "rows" in request:
+                    self._reply(200, {"predictions": batcher.predict_many(request["rows"], timeout=30)})
+                else:
+                    self._reply(200, batcher.predict(request.get("features", {}), timeout=30))
+            except (ValueError, TypeError, AttributeError) as e:
+                self._reply(400, {"error": str(e)})
+            except FutureTimeoutError:
+                self._reply(504, {"error": "prediction timed out"})
+            except RuntimeError as e:
+                # The batcher is shutting down
+                self._reply(503, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=("train", "predict", "serve"), default="train")
+    parser.add_argument("--input", default=None,
+                        help="Features CSV (train: defaults to the feature store; predict: features_dataset.csv)")
+    parser.add_argument("--output", default=PREDICTIONS_CSV)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    if args.mode == "train":
+        meta = train(load_training_data(args.input), args.model_dir)
+        print(json.dumps(meta, indent=2))
+    elif args.mode == "predict":
+        predictor = Predictor.load(args.model_dir)
+        df = pd.read_csv(args.input or FEATURES_CSV)
+        started = time.perf_counter()
+        predictions = predictor.predict_frame(df)
+        elapsed = time.perf_counter() - started
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        predictions.to_csv(args.output, index=False)
+        print(f"[INFO] Predicted {len(df)} rows in {elapsed * 1000:.1f}ms -> {args.output}")
+        print(predictions.head(20).to_string())
+    else:
+        batcher = MicroBatcher(Predictor.load(args.model_dir), args.max_batch, args.max_wait_ms)
+        server = make_server(batcher, args.host, args.port)
+        print(f"[INFO] Serving predictions on http://{args.host}:{args.port}/predict")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            batcher.close()
+            print(f"[INFO] Latency: {batcher.stats.summary()}")
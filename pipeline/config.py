@@ -0,0 +1,74 @@
+# pipeline/config.py
+"""
+Shared Pipeline Settings
+------------------------
+- LLM analysis settings read from the environment (concurrency and rate
+  budgets, cache, packing, near-duplicate clustering, local tier)
+- The raw/processed dataset layout per source
+- build_llm_options(): the analyze_dataset() keyword arguments shared by the
+  one-shot run (main.py) and the streaming daemon (pipeline/daemon.py)
+"""
+
+import os
+from sentiment.cache import DEFAULT_CACHE_PATH
+from sentiment.dedup import NearDuplicateIndex
+from market.ticker_matcher import TickerMatcher, UNIVERSE_FILE
+
+# Concurrency and rate budgets for the LLM calls (0 = unlimited budget)
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "8"))
+LLM_RPM = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TPM = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+# Set LLM_CACHE_BYPASS=1 to force fresh LLM calls
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH)
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "0") == "1"
+# Set SKIP_UNMATCHED=1 to skip the LLM for texts with no known ticker/company
+SKIP_UNMATCHED = os.getenv("SKIP_UNMATCHED", "0") == "1"
+# Prompt tokens per packed multi-document LLM request (0 = one request per text)
+LLM_PACK_TOKENS = int(os.getenv("LLM_PACK_TOKENS", "0"))
+# Estimated Jaccard similarity above which texts count as near-duplicates (0 = off, e.g. 0.7 to enable)
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0"))
+# Set LOCAL_TIER=1 to accept confident local-model predictions (python -m sentiment.local_model)
+LOCAL_TIER = os.getenv("LOCAL_TIER", "0") == "1"
+LOCAL_MODEL_DIR = os.getenv("LOCAL_MODEL_DIR", "data/models")
+# Share of locally accepted texts also sent to the LLM to keep measuring agreement
+LOCAL_TIER_AUDIT_RATE = float(os.getenv("LOCAL_TIER_AUDIT_RATE", "0.02"))
+
+# source name -> (raw dataset stem, processed dataset stem, text fields sent to the LLM)
+SOURCES = {
+    "reddit": ("data/raw/reddit_posts", "data/processed/reddit_with_sentiment", ("title", "body")),
+    "news": ("data/raw/news", "data/processed/news_with_sentiment", ("title", "description")),
+}
+
+
+def build_llm_options(cache):
+    """analyze_dataset() keyword arguments from the LLM_* / dedup settings above."""
+    return {
+        "cache": cache,
+        "matcher": TickerMatcher.from_file(UNIVERSE_FILE),
+        "skip_unmatched": SKIP_UNMATCHED,
+        "max_workers": LLM_MAX_WORKERS,
+        "requests_per_minute": LLM_RPM or None,
+        "tokens_per_minute": LLM_TPM or None,
+        # One index for all sources, so cross-posts between them are caught too
+        "dedup": NearDuplicateIndex(NEAR_DUP_THRESHOLD) if NEAR_DUP_THRESHOLD > 0 else None,
+        "pack_tokens": LLM_PACK_TOKENS,
+        "local_model": load_local_model() if LOCAL_TIER else None,
+        "audit_rate": LOCAL_TIER_AUDIT_RATE,
+    }
+
+
+def load_local_model():
+    """The trained local sentiment model, or None (everything goes to the LLM)."""
+    from sentiment.local_model import LocalSentimentModel, META_FILE
+
+    if not os.path.exists(os.path.join(LOCAL_MODEL_DIR, META_FILE)):
+        print(f"[WARN] LOCAL_TIER=1 but no local model in {LOCAL_MODEL_DIR}; "
+              "train one with `python -m sentiment.local_model`")
+        return None
+    try:
+        model = LocalSentimentModel.load(LOCAL_MODEL_DIR)
+    except ValueError as e:
+        print(f"[WARN] {e}")
+        return None
+    print(f"[INFO] Local sentiment tier: threshold {model.threshold:.2f}")
+    return model
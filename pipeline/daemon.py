@@ -0,0 +1,536 @@
+# pipeline/daemon.py
+"""
+Streaming Daemon
+----------------
+- One long-running process instead of the ingestion -> main.py -> price_fetcher
+  -> feature_engineering -> model chain of scripts joined by files
+- Stages run on their own threads, connected by bounded queues: a full queue
+  blocks the stage feeding it (backpressure), so a slow LLM or price provider
+  slows reading instead of growing memory
+    ingest   tails the normalized record stream (data/raw/stream.jsonl), and
+             with --ingest also refreshes it with the ingestion scheduler
+    analyze  micro-batches new records through analyze_dataset (LLM cache,
+             dedup index and rate budgets shared for the whole run)
+    signal   updates per-ticker sentiment windows mention by mention, refreshes
+             prices/indicators for touched tickers, and predicts BUY/SELL/HOLD
+             with the warm model when one is trained
+- Signals are appended to data/signals/signals.jsonl with the end-to-end
+  latency from the newest mention's publish time to the signal
+- The signal stage checkpoints the stream offset, the per-ticker window state,
+  the output file sizes and the processed IDs/watermarks in one pipeline-state
+  transaction, covering exactly the batches already applied to the windows
+  (every checkpoint_interval seconds and at shutdown); a restart resumes there
+  and cuts the output files back to the checkpointed sizes
+- SIGINT/SIGTERM stop reading and drain the queues; if a stage fails, the
+  others stop too and run() raises
+
+Usage:
+  python -m pipeline.daemon
+  python -m pipeline.daemon --ingest --keywords Tesla Bitcoin --poll-interval 120
+"""
+
+import os
+import json
+import time
+import queue
+import pickle
+import signal
+import argparse
+import threading
+from collections import defaultdict, namedtuple
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pipeline.config import build_llm_options, LLM_CACHE_PATH, LLM_CACHE_BYPASS, SOURCES
+from sentiment.llm_analyzer import analyze_dataset
+from sentiment.cache import LLMCache
+from ingestion.scheduler import IngestionScheduler, STREAM_FILE, default_sources
+from market.indicators import compute_indicators
+from market.price_fetcher import fetch_history
+from market.price_cache import OHLCVCache, DEFAULT_PRICE_CACHE
+from models.feature_engineering import (IncrementalSentimentWindows, WINDOWS, SENTIMENT_CODES, NEUTRAL_CODE,
+                                        INDICATOR_HISTORY_DAYS)
+from models.xgboost_model import Predictor, LatencyStats, MODEL_DIR, MODEL_FILE
+from pipeline.state import PipelineState, STATE_FILE, SOURCE_ID_FIELDS, SOURCE_TIME_FIELDS, parse_timestamp
+from pipeline.jsonl import write_records
+from pipeline import metrics
+
+SIGNALS_FILE = "data/signals/signals.jsonl"
+PROCESSED_STREAM = "data/processed/stream_with_sentiment.jsonl"
+# Name of the daemon's checkpoint in the pipeline state
+CHECKPOINT_NAME = "daemon"
+
+# Text fields sent to the LLM per source type
+TEXT_FIELDS = {**{name: fields for name, (_, _, fields) in SOURCES.items()}, "twitter": ("text",)}
+
+# Marks the end of the stream on a queue during shutdown
+_STOP = object()
+
+# One analyzed micro-batch on its way to the signal stage: [(record, read time)], the
+# stream offset after it, the processed file size after it, and [(source, results)]
+# still to be marked processed
+_Batch = namedtuple("_Batch", "items offset processed_size results")
+
+
+def tail_records(path: str, offset: int = 0):
+    """
+    Yield (offset_after_record, record) for the complete lines of a JSONL file
+    from `offset`; a final line still being written is left for the next read.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        position = offset
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            position += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield position, json.loads(line)
+            except json.JSONDecodeError:
+                print(f"[WARN] Skipping malformed line at byte {position} in {path}")
+
+
+class StreamingDaemon:
+    """
+    Ingest -> analyze -> signal threads joined by bounded queues.
+    run() blocks until stop() (or a signal handler) is called and the queues drain.
+    """
+
+    def __init__(self, llm_options: Dict, stream_path: str = STREAM_FILE, scheduler: Optional[IngestionScheduler] = None,
+                 poll_interval: float = 300.0, queue_size: int = 1000, batch_size: int = 50, batch_wait: float = 1.0,
+                 price_provider=None, price_ttl: float = 300.0, predictor: Optional[Predictor] = None,
+                 signals_path: str = SIGNALS_FILE, processed_path: str = PROCESSED_STREAM,
+                 state_path: str = STATE_FILE, checkpoint_interval: float = 10.0, report_interval: float = 60.0):
+        self.llm_options = llm_options
+        self.stream_path = stream_path
+        self.scheduler = scheduler
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.price_provider = price_provider
+        self.price_ttl = price_ttl
+        self.predictor = predictor
+        self.signals_path = signals_path
+        self.processed_path = processed_path
+        self.state_path = state_path
+        self.checkpoint_interval = checkpoint_interval
+        self.report_interval = report_interval
+        self.matcher = llm_options.get("matcher")
+
+        self.raw_queue = queue.Queue(maxsize=queue_size)
+        # Holds whole micro-batches, so about as many records as raw_queue
+        self.analyzed_queue = queue.Queue(maxsize=max(1, queue_size // batch_size))
+        self._stop = threading.Event()
+        self._failed = threading.Event()
+        # (stage name, exception) of the first stage that died
+        self.failure: Optional[tuple] = None
+        self._threads: List[threading.Thread] = []
+        # (source, record ID) analyzed but not committed with a checkpoint yet
+        self._uncommitted = set()
+        self._uncommitted_lock = threading.Lock()
+        # Publish -> signal, and read-from-stream -> signal
+        self.latency = LatencyStats()
+        self.processing_latency = LatencyStats()
+        self.counts = defaultdict(int)
+
+        self._load_checkpoint()
+
+    # ------------------------------------------------------------- checkpoints
+    def _load_checkpoint(self):
+        """Restore offset and window state, and drop output written after the checkpoint."""
+        self.offset = 0
+        self.windows = IncrementalSentimentWindows(WINDOWS)
+        # ticker -> [sum of codes, mentions, duplicates, last mention ts] (all-time, like build_feature_dataset)
+        self.totals: Dict[str, list] = {}
+        state = PipelineState(self.state_path)
+        try:
+            data = state.checkpoint(CHECKPOINT_NAME)
+        finally:
+            state.close()
+        if data is None:
+            return
+        checkpoint = pickle.loads(data)
+        self.windows, self.totals = checkpoint["windows"], checkpoint["totals"]
+        if checkpoint["input"] == self.stream_path:
+            self.offset = checkpoint["offset"]
+        # Those records are read from the stream again
+        for path, size in checkpoint["outputs"].items():
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+        print(f"[INFO] Restored checkpoint: offset {self.offset}, window state for {len(self.totals)} tickers")
+
+    def _save_checkpoint(self, state: PipelineState, batch: _Batch, results: List[tuple]):
+        """Processed IDs plus offset, windows and output sizes up to `batch`, in one transaction."""
+        signals_size = os.path.getsize(self.signals_path) if os.path.exists(self.signals_path) else 0
+        checkpoint = {
+            "input": self.stream_path, "offset": batch.offset, "windows": self.windows, "totals": self.totals,
+            "outputs": {self.processed_path: batch.processed_size, self.signals_path: signals_size},
+            "saved_at": datetime.utcnow().isoformat(),
+        }
+        with state.conn:
+            for source, records in results:
+                state.mark_processed(source, records, commit=False)
+            state.save_checkpoint(CHECKPOINT_NAME, pickle.dumps(checkpoint, protocol=pickle.HIGHEST_PROTOCOL),
+                                  commit=False)
+        with self._uncommitted_lock:
+            self._uncommitted.difference_update(self._record_keys(results))
+
+    @staticmethod
+    def _record_keys(results: List[tuple]) -> set:
+        keys = set()
+        for source, records in results:
+            id_field = SOURCE_ID_FIELDS[source]
+            keys.update((source, str(r[id_field])) for r in records
+                        if r.get(id_field) is not None and not r.get("analysis_error"))
+        return keys
+
+    # ---------------------------------------------------------------- control
+    def _put(self, q: queue.Queue, item, abandon_on_stop: bool = False) -> bool:
+        """
+        Blocking put (backpressure). Unread stream records may be abandoned on
+        shutdown (they are past the checkpoint); anything analyzed is delivered
+        unless a stage has died.
+        """
+        while True:
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                if self._failed.is_set() or (abandon_on_stop and self._stop.is_set()):
+                    return False
+
+    def _get(self, q: queue.Queue):
+        """Blocking get; ends the stream (_STOP) once a stage has died and the queue is empty."""
+        while True:
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                if self._failed.is_set():
+                    return _STOP
+
+    def _guarded(self, target):
+        """Run a stage; if it raises, record the failure and shut the other stages down."""
+        name = target.__name__.strip("_")
+
+        def run():
+            try:
+                target()
+            except BaseException as e:
+                print(f"[ERROR] Daemon stage '{name}' failed: {e!r}")
+                if self.failure is None:
+                    self.failure = (name, e)
+                self._failed.set()
+                self.stop()
+
+        return run
+
+    def stop(self, *_):
+        if not self._stop.is_set():
+            print("[INFO] Stopping: draining queues...")
+        self._stop.set()
+
+    def run(self):
+        targets = [self._ingest, self._analyze, self._signal]
+        if self.scheduler is not None:
+            targets.append(self._refresh)
+        self._threads = [threading.Thread(target=self._guarded(t), name=t.__name__.strip("_"), daemon=True)
+                         for t in targets]
+        for thread in self._threads:
+            thread.start()
+        print(f"[INFO] Daemon started (stream: {self.stream_path}, offset {self.offset})")
+
+        last_report = time.monotonic()
+        # The signal stage ends last, once the queues are drained (or a stage died)
+        while self._threads[2].is_alive():
+            self._threads[2].join(timeout=1.0)
+            if time.monotonic() - last_report >= self.report_interval:
+                self.report()
+                last_report = time.monotonic()
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=5.0)
+        self.report()
+        if self.failure is not None:
+            name, error = self.failure
+            raise RuntimeError(f"Daemon stage '{name}' failed: {error!r}") from error
+        print("[INFO] Daemon stopped.")
+
+    def report(self) -> Dict:
+        stats = {
+            "records_read": self.counts["read"], "records_analyzed": self.counts["analyzed"],
+            "signals": self.counts["signals"], "raw_queue": self.raw_queue.qsize(),
+            "analyzed_queue": self.analyzed_queue.qsize(),
+            "publish_to_signal": self.latency.summary(), "read_to_signal": self.processing_latency.summary(),
+        }
+        print(f"[INFO] Daemon: {json.dumps(stats)}")
+        return stats
+
+    # ----------------------------------------------------------------- stages
+    def _refresh(self):
+        """Periodically pull all sources into the stream file the ingest stage tails."""
+        while not self._stop.is_set():
+            try:
+                self.scheduler.run()
+            except Exception as e:
+                print(f"[WARN] Ingestion refresh failed: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def _ingest(self):
+        """Tail the stream file from the checkpointed offset."""
+        offset = self.offset
+        while not self._stop.is_set():
+            read = 0
+            if os.path.exists(self.stream_path):
+                for end, record in tail_records(self.stream_path, offset):
+                    if not self._put(self.raw_queue, (end, record, time.time()), abandon_on_stop=True):
+                        break
+                    offset = end
+                    read += 1
+                    if self._stop.is_set():
+                        break
+            self.counts["read"] += read
+            metrics.inc("daemon_records_read_total", read)
+            if not read:
+                self._stop.wait(0.5)
+        self._put(self.raw_queue, _STOP)
+
+    def _next_batch(self):
+        """Up to batch_size records, waiting at most batch_wait after the first; None at the end of the stream."""
+        batch = []
+        item = self._get(self.raw_queue)
+        if item is _STOP:
+            return None
+        batch.append(item)
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                item = self.raw_queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Finish this batch, then end
+                self.raw_queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _analyze(self):
+        # sqlite connections stay on the thread that opened them
+        state = PipelineState(self.state_path)
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    break
+                with metrics.span("stage", stage="daemon_analyze"):
+                    analyzed, results = self._analyze_batch(state, batch)
+                received = [item.pop("_received", None) for item in analyzed]
+                write_records(self.processed_path, analyzed, append=True)
+                entry = _Batch(list(zip(analyzed, received)), batch[-1][0],
+                               os.path.getsize(self.processed_path), results)
+                if not self._put(self.analyzed_queue, entry):
+                    break
+        finally:
+            state.close()
+            self._put(self.analyzed_queue, _STOP)
+
+    def _analyze_batch(self, state: PipelineState, batch):
+        """Analyzed records of a micro-batch, plus [(source, results)] for the checkpoint."""
+        by_source = defaultdict(list)
+        for _, record, received in batch:
+            source = record.get("source_type")
+            if source not in TEXT_FIELDS:
+                continue
+            by_source[source].append({**record, "_received": received})
+
+        analyzed, results = [], []
+        for source, records in by_source.items():
+            # Records analyzed earlier but not checkpointed yet are not in the state
+            with self._uncommitted_lock:
+                records = [r for r in state.new_records(source, records)
+                           if (source, str(r.get(SOURCE_ID_FIELDS[source]))) not in self._uncommitted]
+            if not records:
+                continue
+            source_results = analyze_dataset(records, text_fields=TEXT_FIELDS[source], **self.llm_options)
+            with self._uncommitted_lock:
+                self._uncommitted.update(self._record_keys([(source, source_results)]))
+            analyzed.extend(source_results)
+            results.append((source, source_results))
+        self.counts["analyzed"] += len(analyzed)
+        metrics.inc("daemon_records_analyzed_total", len(analyzed))
+        return analyzed, results
+
+    def _signal(self):
+        cache = OHLCVCache(self.price_provider, DEFAULT_PRICE_CACHE) if self.price_provider is not None else None
+        state = PipelineState(self.state_path)
+        prices: Dict[str, tuple] = {}   # ticker -> (fetched at, latest bar row with indicators)
+        last_checkpoint = time.monotonic()
+        # Newest batch applied to the windows but not checkpointed, and the results since the last checkpoint
+        applied, results = None, []
+        done = False
+        try:
+            while not done:
+                batches = [self._get(self.analyzed_queue)]
+                # Everything already waiting goes into one feature/predict pass
+                waiting = 0
+                while waiting < 1000:
+                    try:
+                        batches.append(self.analyzed_queue.get_nowait())
+                    except queue.Empty:
+                        break
+                    waiting += len(batches[-1].items) if batches[-1] is not _STOP else 0
+                if any(b is _STOP for b in batches):
+                    done = True
+                    batches = [b for b in batches if b is not _STOP]
+
+                touched = self._update_windows([item for b in batches for item in b.items])
+                if touched:
+                    with metrics.span("stage", stage="daemon_signal"):
+                        self._emit_signals(touched, cache, prices)
+                if batches:
+                    applied = batches[-1]
+                    results.extend(r for b in batches for r in b.results)
+                if applied is not None and (done or time.monotonic() - last_checkpoint >= self.checkpoint_interval):
+                    self._save_checkpoint(state, applied, results)
+                    applied, results = None, []
+                    last_checkpoint = time.monotonic()
+        finally:
+            state.close()
+            if cache is not None:
+                cache.close()
+
+    def _update_windows(self, items: List[tuple]) -> Dict[str, list]:
+        """Add each mention to its ticker's windows; returns ticker -> [(publish ts, read time)]."""
+        touched = defaultdict(list)
+        for item, received in items:
+            published = parse_timestamp(item.get(SOURCE_TIME_FIELDS.get(item.get("source_type"), ""))) \
+                or datetime.utcnow()
+            duplicate = item.get("duplicate_of") is not None
+            for ticker in set(item.get("tickers") or []):
+                if self.matcher is not None:
+                    ticker = self.matcher.normalize(ticker)
+                total = self.totals.setdefault(ticker, [0.0, 0, 0, None])
+                touched[ticker].append((published, received))
+                if duplicate:
+                    total[2] += 1
+                    continue
+                # Windows need per-ticker time order; a late mention counts at the ticker's latest time
+                ts = max(published, total[3]) if total[3] else published
+                total[3] = ts
+                self.windows.update(ticker, item.get("sentiment"), ts, item.get("source_type", "news"))
+                total[0] += SENTIMENT_CODES.get(item.get("sentiment"), NEUTRAL_CODE)
+                total[1] += 1
+        return touched
+
+    def _market_rows(self, tickers: List[str], cache, prices: Dict[str, tuple]) -> Dict[str, Dict]:
+        """Latest price and indicators per ticker, refetched once older than price_ttl."""
+        if cache is None:
+            return {}
+        now = time.monotonic()
+        stale = [t for t in tickers if t not in prices or now - prices[t][0] >= self.price_ttl]
+        if stale:
+            try:
+                history = fetch_history(stale, INDICATOR_HISTORY_DAYS, cache=cache)
+            except Exception as e:
+                print(f"[WARN] Price refresh failed: {e}")
+                history = {}
+            for ticker in stale:
+                frame = history.get(ticker)
+                if frame is None or frame.empty or frame["Close"].dropna().empty:
+                    prices[ticker] = (now, {})
+                    continue
+                latest = compute_indicators(frame).iloc[-1].to_dict()
+                latest["price"] = float(frame["Close"].dropna().iloc[-1])
+                prices[ticker] = (now, latest)
+        return {t: prices[t][1] for t in tickers if t in prices}
+
+    def _emit_signals(self, touched: Dict[str, list], cache, prices: Dict[str, tuple]):
+        tickers = sorted(touched)
+        market = self._market_rows(tickers, cache, prices)
+        now = datetime.utcnow()
+        rows = []
+        for ticker in tickers:
+            total = self.totals[ticker]
+            row = {**market.get(ticker, {}), **self.windows.features(ticker, now)}
+            row["avg_sentiment"] = total[0] / total[1] if total[1] else float(NEUTRAL_CODE)
+            row["mentions"] = total[1]
+            row["duplicates"] = total[2]
+            row["timestamp"] = now.isoformat()
+            rows.append(row)
+        predictions = self.predictor.predict_rows(rows) if self.predictor is not None else [{}] * len(rows)
+
+        emitted = time.time()
+        signals, latencies, processing = [], [], []
+        for row, prediction in zip(rows, predictions):
+            mentions = touched[row["ticker"]]
+            newest = max(published for published, _ in mentions)
+            latency = (now - newest).total_seconds()
+            latencies.extend((now - published).total_seconds() for published, _ in mentions)
+            processing.extend(emitted - received for _, received in mentions)
+            signals.append({**row, **prediction, "latency_seconds": round(latency, 3)})
+        write_records(self.signals_path, signals, append=True)
+        self.latency.record_batch(latencies)
+        self.processing_latency.record_batch(processing)
+        for value in latencies:
+            metrics.observe("daemon_publish_to_signal_seconds", value)
+        self.counts["signals"] += len(signals)
+        metrics.inc("daemon_signals_total", len(signals))
+
+
+def load_predictor(model_dir: str = MODEL_DIR) -> Optional[Predictor]:
+    """The trained model, or None (signals then carry features only)."""
+    if not os.path.exists(os.path.join(model_dir, MODEL_FILE)):
+        print(f"[WARN] No trained model in {model_dir}; emitting features without predictions")
+        return None
+    return Predictor.load(model_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stream", default=STREAM_FILE, help="Normalized record stream to tail")
+    parser.add_argument("--ingest", action="store_true", help="Also refresh the stream from the configured sources")
+    parser.add_argument("--keywords", nargs="+", default=["Tesla", "Bitcoin", "Apple", "Microsoft"])
+    parser.add_argument("--subreddits", nargs="+", default=["stocks", "wallstreetbets", "investing", "cryptocurrency"])
+    parser.add_argument("--poll-interval", type=float, default=300.0, help="Seconds between ingestion refreshes")
+    parser.add_argument("--queue-size", type=int, default=1000, help="Bound of each inter-stage queue")
+    parser.add_argument("--batch-size", type=int, default=50, help="Records per analyze micro-batch")
+    parser.add_argument("--batch-wait", type=float, default=1.0, help="Seconds to wait to fill a micro-batch")
+    parser.add_argument("--no-prices", action="store_true", help="Skip price/indicator refreshes")
+    parser.add_argument("--price-ttl", type=float, default=300.0, help="Seconds before a ticker's prices are refetched")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--signals", default=SIGNALS_FILE)
+    args = parser.parse_args()
+
+    scheduler = None
+    if args.ingest:
+        sources = default_sources(args.keywords, args.subreddits)
+        if not sources:
+            print("[WARN] No source credentials configured; only tailing the stream.")
+        else:
+            scheduler = IngestionScheduler(sources, args.stream)
+
+    provider = None
+    if not args.no_prices:
+        from market.providers import YahooProvider
+        provider = YahooProvider()
+
+    cache = LLMCache(LLM_CACHE_PATH, bypass=LLM_CACHE_BYPASS)
+    daemon = StreamingDaemon(
+        build_llm_options(cache), stream_path=args.stream, scheduler=scheduler, poll_interval=args.poll_interval,
+        queue_size=args.queue_size, batch_size=args.batch_size, batch_wait=args.batch_wait,
+        price_provider=provider, price_ttl=args.price_ttl, predictor=load_predictor(args.model_dir),
+        signals_path=args.signals,
+    )
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    try:
+        daemon.run()
+    except RuntimeError as e:
+        raise SystemExit(f"[ERROR] {e}")
+    finally:
+        cache.close()
+        # PIPELINE_METRICS=1: stage timings and latency histograms -> data/metrics/daemon.{prom,json}
+        metrics.dump(prefix="daemon")
@@ -0,0 +1,27 @@
+# pipeline/env.py
+"""
+Environment / Credentials
+-------------------------
+- load_env() reads .env into os.environ once, on first use (variables already
+  set in the environment win), instead of at import time in every module
+- require_env() returns a setting or raises ValueError naming it, so missing
+  credentials only fail the command that actually needs them
+"""
+
+import os
+import functools
+
+
+@functools.lru_cache(maxsize=None)
+def load_env() -> bool:
+    """Load .env once per process; returns whether a .env file was found."""
+    from dotenv import load_dotenv
+    return load_dotenv()
+
+
+def require_env(name: str, hint: str = "Please set it in the environment or the .env file.") -> str:
+    load_env()
+    value = os.getenv(name)
+    if not value:
+        raise ValueError(f"Missing {name}. {hint}")
+    return value
@@ -0,0 +1,133 @@
+# pipeline/jsonl.py
+"""
+Streaming JSONL Datasets
+------------------------
+- Newline-delimited JSON readers/writers, optionally gzip (.gz) or zstd (.zst) compressed
+- Readers are generators, so multi-GB files are processed in constant memory
+- iter_records_with_offsets() reports the byte offset after each record, so a
+  crashed run can resume from its last checkpoint
+- Legacy JSON array files (data/raw/*.json) still load through the same readers
+"""
+
+import io
+import os
+import gzip
+import json
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+JSONL_SUFFIXES = (".jsonl", ".ndjson")
+# Extensions tried (in order) when a dataset is referenced without one
+DATASET_EXTENSIONS = (".jsonl", ".jsonl.gz", ".jsonl.zst", ".json")
+
+
+def _compression(path: str) -> Optional[str]:
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+def is_jsonl(path: str) -> bool:
+    base = path
+    if _compression(path):
+        base = os.path.splitext(path)[0]
+    return base.endswith(JSONL_SUFFIXES)
+
+
+def find_dataset(stem: str) -> Optional[str]:
+    """Return the first existing file for a dataset stem (e.g. data/raw/news)."""
+    for ext in DATASET_EXTENSIONS:
+        if os.path.exists(stem + ext):
+            return stem + ext
+    return None
+
+
+def open_binary(path: str, mode: str = "rb"):
+    """Open a (possibly compressed) file in binary mode ("rb", "wb" or "ab")."""
+    compression = _compression(path)
+    if compression == "gzip":
+        return gzip.open(path, mode)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Reading/writing .zst files requires the 'zstandard' package.")
+        raw = open(path, mode)
+        if mode.startswith("r"):
+            # Buffered wrapper provides line iteration over the decompressed stream
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True))
+        return zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+    return open(path, mode)
+
+
+def _skip(f, offset: int):
+    """Position a stream at `offset` (uncompressed bytes), seeking when possible."""
+    if not offset:
+        return
+    try:
+        f.seek(offset)
+    except (io.UnsupportedOperation, OSError):
+        remaining = offset
+        while remaining:
+            chunk = f.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+
+
+def iter_records_with_offsets(path: str, offset: int = 0) -> Iterator[Tuple[int, Dict]]:
+    """
+    Yield (offset_after_record, record) pairs starting at byte `offset`.
+    JSON array files are loaded whole and report offset 0 (not resumable).
+    """
+    if not is_jsonl(path):
+        with open_binary(path) as f:
+            data = json.load(f)
+        if isinstance(data, dict):  # edge case: JSON saved as dict
+            data = [data]
+        for record in data:
+            yield 0, record
+        return
+
+    with open_binary(path) as f:
+        _skip(f, offset)
+        position = offset
+        for line in f:
+            position += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield position, json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a truncated final line; skip it
+                print(f"[WARN] Skipping malformed line at byte {position} in {path}")
+
+
+def iter_records(path: str, offset: int = 0) -> Iterator[Dict]:
+    """Yield records from a JSONL (optionally compressed) or JSON array file."""
+    for _, record in iter_records_with_offsets(path, offset):
+        yield record
+
+
+def write_records(path: str, records: Iterable[Dict], append: bool = False) -> int:
+    """
+    Write records as JSONL (or a JSON array for .json paths) and return how many
+    were written. Appending to a JSON array file rewrites it in full.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if not is_jsonl(path):
+        records = list(records)
+        if append and os.path.exists(path):
+            records = list(iter_records(path)) + records
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(records, f, indent=2, ensure_ascii=False)
+        return len(records)
+
+    count = 0
+    with open_binary(path, "ab" if append else "wb") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+            count += 1
+    return count
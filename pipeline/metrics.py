@@ -0,0 +1,226 @@
+# pipeline/metrics.py
+"""
+Pipeline Instrumentation
+------------------------
+- Counters (items, cache hits/misses, retries, parse failures, LLM tokens
+  and cost) and timing histograms (stages, external calls), with labels
+- span("stage", stage="analyze") times a block (timed() decorates a
+  function); errors inside a span are counted too
+- record_llm_usage() turns a completion's `usage` into token and cost counters
+  per model (MODEL_PRICES, USD per 1M tokens)
+- Exports Prometheus text format and JSON (dump() writes both)
+
+Off by default: enable with PIPELINE_METRICS=1 or enable(). While disabled,
+every call returns after one flag check (span() hands back a shared no-op).
+"""
+
+import os
+import json
+import time
+import threading
+import functools
+from typing import Dict, Optional, Tuple
+
+METRICS_DIR = "data/metrics"
+# Upper bounds (seconds) of the timing histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# USD per 1M (prompt, completion) tokens
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+_enabled = os.getenv("PIPELINE_METRICS", "0") == "1"
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Dict) -> Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Registry:
+    """Thread-safe store of labelled counters and histograms."""
+
+    def __init__(self):
+        self.counters: Dict[Key, float] = {}
+        self.histograms: Dict[Key, list] = {}    # key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    hist[i] += 1
+                    break
+            else:
+                hist[len(BUCKETS)] += 1
+            hist[-1] += value
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    # ------------------------------------------------------------ exports
+    def to_dict(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {k: list(v) for k, v in self.histograms.items()}
+        return {
+            "counters": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(counters.items())],
+            "timers": [
+                {"name": n, "labels": dict(l), "count": sum(h[:-1]), "sum": round(h[-1], 6),
+                 "mean": round(h[-1] / max(sum(h[:-1]), 1), 6)}
+                for (n, l), h in sorted(histograms.items())
+            ],
+        }
+
+    def to_prometheus(self) -> str:
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {k: list(v) for k, v in self.histograms.items()}
+        lines = []
+        typed = set()
+
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+        for (name, labels), value in sorted(counters.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{fmt(labels)} {value:g}")
+        for (name, labels), hist in sorted(histograms.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, count in zip(BUCKETS, hist):
+                cumulative += count
+                lines.append(f"{name}_bucket{fmt(labels, [('le', f'{bound:g}')])} {cumulative}")
+            cumulative += hist[len(BUCKETS)]
+            lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {cumulative}")
+            lines.append(f"{name}_sum{fmt(labels)} {hist[-1]:.6f}")
+            lines.append(f"{name}_count{fmt(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = Registry()
+
+
+# --------------------------------------------------------------------------- #
+# Module-level API (no-ops while disabled)
+# --------------------------------------------------------------------------- #
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(on: bool = True):
+    global _enabled
+    _enabled = on
+
+
+def inc(name: str, value: float = 1.0, **labels):
+    if _enabled:
+        REGISTRY.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    if _enabled:
+        REGISTRY.observe(name, value, **labels)
+
+
+class _Span:
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name: str, labels: Dict):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        REGISTRY.observe(f"{self.name}_seconds", time.perf_counter() - self.start, **self.labels)
+        if exc_type is not None:
+            REGISTRY.inc(f"{self.name}_errors_total", **self.labels)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **labels):
+    """Time a block as `<name>_seconds`; exceptions also count as `<name>_errors_total`."""
+    return _Span(name, labels) if _enabled else _NOOP
+
+
+def timed(name: str, **labels):
+    """Decorator form of span(); the enabled flag is checked on every call."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name, labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_llm_usage(model: str, usage: Optional[Dict]):
+    """Token and cost counters from a chat completion's `usage` block."""
+    if not _enabled or not usage:
+        return
+    prompt = usage.get("prompt_tokens", 0) or 0
+    completion = usage.get("completion_tokens", 0) or 0
+    REGISTRY.inc("llm_tokens_total", prompt, model=model, kind="prompt")
+    REGISTRY.inc("llm_tokens_total", completion, model=model, kind="completion")
+    prices = MODEL_PRICES.get(model)
+    if prices:
+        REGISTRY.inc("llm_cost_usd_total", (prompt * prices[0] + completion * prices[1]) / 1e6, model=model)
+
+
+def dump(directory: str = METRICS_DIR, prefix: str = "metrics") -> Optional[str]:
+    """Write <prefix>.prom and <prefix>.json under directory; returns the JSON path."""
+    if not _enabled:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, prefix + ".prom"), "w", encoding="utf-8") as f:
+        f.write(REGISTRY.to_prometheus())
+    path = os.path.join(directory, prefix + ".json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(REGISTRY.to_dict(), f, indent=2)
+    print(f"[INFO] Metrics written to {directory}/{prefix}.prom and .json")
+    return path
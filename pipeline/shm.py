@@ -0,0 +1,41 @@
+# pipeline/shm.py
+"""
+Shared-Memory Arrays
+--------------------
+- share() copies a NumPy array into a new SharedMemory block once and returns
+  the handle plus a small picklable spec (name, shape, dtype)
+- attach() maps a spec read-only in a worker process, so process pools get the
+  data through their initializer instead of pickling it per task
+- release() closes and unlinks the blocks created by share()
+Used by the parameter sweeps in models/backtest.py and models/walk_forward.py.
+"""
+
+from multiprocessing import shared_memory
+from typing import Iterable, Tuple
+
+import numpy as np
+
+# (shared memory name, shape, dtype string)
+Spec = Tuple[str, tuple, str]
+
+
+def share(array: np.ndarray) -> Tuple[shared_memory.SharedMemory, Spec]:
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    view[:] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def attach(spec: Spec) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """Read-only view of a shared array; keep the handle referenced while the view is used."""
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    view.flags.writeable = False
+    return shm, view
+
+
+def release(blocks: Iterable[shared_memory.SharedMemory]):
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
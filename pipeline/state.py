@@ -0,0 +1,181 @@
+# pipeline/state.py
+"""
+Incremental Pipeline State
+--------------------------
+- Per-source watermarks (newest record timestamp seen) and processed-ID sets
+  (Reddit `id`, news `url`, tweet `id`) stored in data/state/pipeline_state.db
+- Per-stage "dirty ticker" queues so downstream stages (prices, features) only
+  recompute tickers whose inputs changed since their last run
+- Named checkpoint blobs (e.g. the daemon's stream offset and window state),
+  which can be saved in the same transaction as processed IDs
+"""
+
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+STATE_FILE = "data/state/pipeline_state.db"
+
+# Record field holding the unique ID / timestamp for each source
+SOURCE_ID_FIELDS = {"reddit": "id", "news": "url", "twitter": "id"}
+SOURCE_TIME_FIELDS = {"reddit": "created_utc", "news": "published_at", "twitter": "created_at"}
+
+# Records older than (watermark - grace) are assumed already seen without an ID lookup
+LATE_ARRIVAL_GRACE = timedelta(days=2)
+
+_STORED = object()
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """Parse the ISO timestamps used across sources (Z suffix and offsets included)."""
+    if not value:
+        return None
+    try:
+        ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    # Compare everything as naive UTC
+    if ts.tzinfo is not None:
+        ts = ts.replace(tzinfo=None) - ts.utcoffset()
+    return ts
+
+
+class PipelineState:
+    """SQLite-backed watermarks, processed IDs and dirty-ticker queues."""
+
+    def __init__(self, path: str = STATE_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self._create_tables()
+
+    def _create_tables(self):
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS watermarks (
+                source TEXT PRIMARY KEY,
+                watermark TEXT,
+                updated_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS processed (
+                source TEXT,
+                record_id TEXT,
+                PRIMARY KEY (source, record_id)
+            );
+            CREATE TABLE IF NOT EXISTS dirty_tickers (
+                stage TEXT,
+                ticker TEXT,
+                PRIMARY KEY (stage, ticker)
+            );
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                name TEXT PRIMARY KEY,
+                data BLOB,
+                updated_at TEXT
+            );
+            """
+        )
+        self.conn.commit()
+
+    def watermark(self, source: str) -> Optional[datetime]:
+        row = self.conn.execute("SELECT watermark FROM watermarks WHERE source = ?", (source,)).fetchone()
+        return parse_timestamp(row[0]) if row else None
+
+    def _processed_ids(self, source: str, ids: List[str]) -> Set[str]:
+        seen = set()
+        # Chunk to stay under SQLite's bound-parameter limit
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT record_id FROM processed WHERE source = ? AND record_id IN ({placeholders})",
+                [source, *chunk],
+            )
+            seen.update(r[0] for r in rows)
+        return seen
+
+    def new_records(self, source: str, records: Iterable[Dict], watermark=_STORED) -> List[Dict]:
+        """
+        Return only the records of `source` that have not been processed yet.
+        Batched callers should pass the watermark read at the start of the run,
+        so records behind a watermark advanced mid-run are not skipped.
+        """
+        id_field, time_field = SOURCE_ID_FIELDS[source], SOURCE_TIME_FIELDS[source]
+        if watermark is _STORED:
+            watermark = self.watermark(source)
+        cutoff = watermark - LATE_ARRIVAL_GRACE if watermark else None
+
+        candidates = []
+        for record in records:
+            ts = parse_timestamp(record.get(time_field))
+            if cutoff and ts and ts < cutoff:
+                continue
+            candidates.append(record)
+
+        ids = [str(r.get(id_field)) for r in candidates if r.get(id_field) is not None]
+        seen = self._processed_ids(source, ids)
+        return [r for r in candidates if r.get(id_field) is None or str(r.get(id_field)) not in seen]
+
+    def mark_processed(self, source: str, records: Iterable[Dict], commit: bool = True):
+        """
+        Record IDs as processed and advance the source watermark. Records whose
+        analysis failed ("analysis_error") are left out, and the watermark stops
+        at the oldest of them, so the next run analyzes them again. With
+        commit=False the caller commits (e.g. together with save_checkpoint).
+        """
+        id_field, time_field = SOURCE_ID_FIELDS[source], SOURCE_TIME_FIELDS[source]
+        records = list(records)
+        done = [r for r in records if not r.get("analysis_error")]
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO processed (source, record_id) VALUES (?, ?)",
+            [(source, str(r[id_field])) for r in done if r.get(id_field) is not None],
+        )
+        timestamps = [t for t in (parse_timestamp(r.get(time_field)) for r in done) if t]
+        failed = [t for t in (parse_timestamp(r.get(time_field)) for r in records if r.get("analysis_error")) if t]
+        newest = max(timestamps) if timestamps else None
+        if newest and failed:
+            newest = min(newest, min(failed))
+        current = self.watermark(source)
+        if newest and (current is None or newest > current):
+            self.conn.execute(
+                "INSERT OR REPLACE INTO watermarks (source, watermark, updated_at) VALUES (?, ?, ?)",
+                (source, newest.isoformat(), datetime.utcnow().isoformat()),
+            )
+        if commit:
+            self.conn.commit()
+
+    def mark_dirty(self, stage: str, tickers: Iterable[str]):
+        """Queue tickers for recomputation by a downstream stage."""
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO dirty_tickers (stage, ticker) VALUES (?, ?)",
+            [(stage, t) for t in set(tickers) if t],
+        )
+        self.conn.commit()
+
+    def dirty_tickers(self, stage: str) -> Set[str]:
+        rows = self.conn.execute("SELECT ticker FROM dirty_tickers WHERE stage = ?", (stage,))
+        return {r[0] for r in rows}
+
+    def clear_dirty(self, stage: str, tickers: Optional[Iterable[str]] = None):
+        """Clear the queue once the stage has consumed it (all tickers by default)."""
+        if tickers is None:
+            self.conn.execute("DELETE FROM dirty_tickers WHERE stage = ?", (stage,))
+        else:
+            self.conn.executemany(
+                "DELETE FROM dirty_tickers WHERE stage = ? AND ticker = ?", [(stage, t) for t in tickers]
+            )
+        self.conn.commit()
+
+    def checkpoint(self, name: str) -> Optional[bytes]:
+        row = self.conn.execute("SELECT data FROM checkpoints WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def save_checkpoint(self, name: str, data: bytes, commit: bool = True):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO checkpoints (name, data, updated_at) VALUES (?, ?, ?)",
+            (name, sqlite3.Binary(data), datetime.utcnow().isoformat()),
+        )
+        if commit:
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,154 @@
+# sentiment/cache.py
+"""
+Persistent LLM Result Cache
+---------------------------
+- Stores sentiment/ticker results in SQLite (data/cache/llm_cache.db by default)
+- Content-addressed: key = sha256(normalized text + model + prompt version)
+- Age- and size-based eviction, hit/miss counters and a bypass flag
+- Hits only note their last-used time in memory; it is written in one batch
+  on the next put/evict/close (or every FLUSH_TOUCHES hits)
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from typing import Dict, Optional
+
+DEFAULT_CACHE_PATH = "data/cache/llm_cache.db"
+# Pending last-used updates written at once, so hits stay read-only
+FLUSH_TOUCHES = 1000
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace so trivial edits still hit."""
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+def cache_key(text: str, model: str, prompt_version: str) -> str:
+    payload = "\x1f".join([model, prompt_version, normalize_text(text)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLite-backed cache of analyze_text results, safe to share across threads."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: Optional[int] = 200_000,
+                 max_age_seconds: Optional[float] = 30 * 24 * 3600, bypass: bool = False):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._create_table()
+
+    def _create_table(self):
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_results (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                prompt_version TEXT,
+                result_json TEXT,
+                created_at REAL,
+                last_used REAL
+            );
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_results_last_used ON llm_results(last_used)")
+        self.conn.commit()
+
+    def get(self, text: str, model: str, prompt_version: str) -> Optional[Dict]:
+        """Return the cached result for this text, or None on a miss/bypass."""
+        if self.bypass:
+            return None
+        key = cache_key(text, model, prompt_version)
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT result_json, created_at FROM llm_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row and self.max_age_seconds and now - row[1] > self.max_age_seconds:
+                self.conn.execute("DELETE FROM llm_results WHERE key = ?", (key,))
+                self.conn.commit()
+                self._touched.pop(key, None)
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = now
+            if len(self._touched) >= FLUSH_TOUCHES:
+                self._flush_touched()
+                self.conn.commit()
+        return json.loads(row[0])
+
+    def _flush_touched(self):
+        """Write pending last-used times (caller holds the lock and commits)."""
+        if self._touched:
+            self.conn.executemany("UPDATE llm_results SET last_used = ? WHERE key = ?",
+                                  [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+
+    def put(self, text: str, model: str, prompt_version: str, result: Dict):
+        if self.bypass:
+            return
+        key = cache_key(text, model, prompt_version)
+        now = time.time()
+        with self._lock:
+            self._touched.pop(key, None)
+            self._flush_touched()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_results (key, model, prompt_version, result_json, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, prompt_version, json.dumps(result, ensure_ascii=False), now, now),
+            )
+            self.conn.commit()
+
+    def evict(self) -> int:
+        """Drop expired entries, then least-recently-used ones above max_entries."""
+        removed = 0
+        with self._lock:
+            self._flush_touched()
+            if self.max_age_seconds:
+                cur = self.conn.execute(
+                    "DELETE FROM llm_results WHERE created_at < ?", (time.time() - self.max_age_seconds,)
+                )
+                removed += cur.rowcount
+            if self.max_entries:
+                count = self.conn.execute("SELECT COUNT(*) FROM llm_results").fetchone()[0]
+                if count > self.max_entries:
+                    cur = self.conn.execute(
+                        "DELETE FROM llm_results WHERE key IN "
+                        "(SELECT key FROM llm_results ORDER BY last_used ASC LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+                    removed += cur.rowcount
+            self.conn.commit()
+        return removed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = self.conn.execute("SELECT COUNT(*) FROM llm_results").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self.conn.commit()
+        self.conn.close()
@@ -0,0 +1,198 @@
+# sentiment/dedup.py
+"""
+Near-Duplicate Detection (MinHash + LSH)
+----------------------------------------
+- Word-shingles each text and builds MinHash signatures for thousands of
+  documents at once with NumPy (multiply-shift hashing, min-reduced per document)
+- LSH banding finds candidate pairs, which are kept only if their estimated
+  Jaccard similarity reaches the threshold; connected pairs form clusters
+- cluster_near_duplicates(): one-shot clustering in roughly linear time and
+  O(num_perm) memory per document
+- NearDuplicateIndex: streaming version shared across batches and sources
+  (e.g. a syndicated article and its Reddit cross-post), remembering at most
+  `max_docs` recent documents so memory stays bounded
+"""
+
+import string
+from collections import deque
+from itertools import chain
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_PUNCTUATION = str.maketrans(dict.fromkeys(string.punctuation, " "))
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased words without punctuation; a text without words is one empty word."""
+    return (text or "").lower().translate(_PUNCTUATION).split() or [""]
+
+
+class MinHasher:
+    """Batched MinHash signatures over word k-shingles with num_perm multiply-shift hash functions."""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # Odd multipliers; the high 32 bits of (a * x + b) mod 2^64 give the hash
+        self.a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+        # Per-position multipliers that combine k word hashes into one shingle hash
+        self.mix = rng.integers(1, 2 ** 63, shingle_size, dtype=np.uint64) | np.uint64(1)
+
+    def shingle_hashes(self, texts: Sequence[str]):
+        """
+        Shingle hashes of all texts, flattened, plus each text's start offset.
+        A text shorter than k words yields one shingle of all its words.
+        """
+        words = [tokenize(t) for t in texts]
+        lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+        # Built-in str hashes are salted per process, which is fine for in-memory clustering
+        flat = np.fromiter(map(hash, chain.from_iterable(words)), dtype=np.int64,
+                           count=int(lengths.sum())).view(np.uint64)
+        doc = np.repeat(np.arange(len(texts)), lengths)
+        k = self.shingle_size
+        # Shingle i covers words i..i+k-1; words beyond the text's end contribute 0
+        padded = np.concatenate((flat, np.zeros(k, dtype=np.uint64)))
+        padded_doc = np.concatenate((doc, np.full(k, -1)))
+        grams = np.zeros(len(flat), dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for j in range(k):
+                part = padded[j:j + len(flat)] * self.mix[j]
+                grams += np.where(padded_doc[j:j + len(flat)] == doc, part, np.uint64(0))
+        # Keep the first max(len - k + 1, 1) shingles of every text
+        n_grams = np.maximum(lengths - k + 1, 1)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        keep = np.arange(len(flat)) - starts[doc] < n_grams[doc]
+        grams = grams[keep]
+        offsets = np.concatenate(([0], np.cumsum(n_grams)[:-1]))
+        return grams, offsets
+
+    def signatures(self, texts: Sequence[str], chunk_size: int = 4096) -> np.ndarray:
+        """(len(texts) x num_perm) uint32 signature matrix, computed chunk_size texts at a time."""
+        out = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for start in range(0, len(texts), chunk_size):
+            grams, offsets = self.shingle_hashes(texts[start:start + chunk_size])
+            block = out[start:start + len(offsets)]
+            # One permutation at a time keeps scratch memory at O(shingles in the chunk)
+            with np.errstate(over="ignore"):
+                for j in range(self.num_perm):
+                    block[:, j] = np.minimum.reduceat((grams * self.a[j] + self.b[j]) >> np.uint64(32), offsets)
+        return out
+
+
+def band_keys(signatures: np.ndarray, bands: int) -> np.ndarray:
+    """(n x bands) uint64 keys, one hash per band of rows."""
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    weights = np.random.default_rng(0).integers(1, 2 ** 63, rows, dtype=np.uint64) | np.uint64(1)
+    keys = np.empty((n, bands), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for band in range(bands):
+            block = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+            # Fold the band number in so equal rows in different bands do not collide
+            keys[:, band] = (block * weights).sum(axis=1, dtype=np.uint64) ^ np.uint64(band << 56)
+    return keys
+
+
+def _connected_components(n: int, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Smallest member index of each node's component, by min-label propagation with pointer jumping."""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[left], labels[right])
+        np.minimum.at(labels, left, low)
+        np.minimum.at(labels, right, low)
+        jumped = labels[labels]
+        while not np.array_equal(jumped, labels):
+            labels, jumped = jumped, jumped[jumped]
+        if np.array_equal(labels[left], labels[right]):
+            return labels
+
+
+def cluster_near_duplicates(texts: Sequence[str], threshold: float = 0.7, num_perm: int = 64,
+                            bands: int = 16, shingle_size: int = 3) -> np.ndarray:
+    """
+    Representative index per document: documents in the same near-duplicate
+    cluster share the index of the cluster's first document.
+    """
+    n = len(texts)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    sig = MinHasher(num_perm, shingle_size).signatures(texts)
+    keys = band_keys(sig, bands)
+    left, right = [], []
+    for band in range(bands):
+        # Pair each document with the first document sharing its bucket
+        _, first, inverse = np.unique(keys[:, band], return_index=True, return_inverse=True)
+        heads = first[inverse]
+        cand = np.nonzero(heads != np.arange(n))[0]
+        for start in range(0, len(cand), 65536):
+            i = cand[start:start + 65536]
+            similar = (sig[i] == sig[heads[i]]).mean(axis=1) >= threshold
+            left.append(i[similar])
+            right.append(heads[i][similar])
+    if not left:
+        return np.arange(n)
+    return _connected_components(n, np.concatenate(left), np.concatenate(right))
+
+
+class NearDuplicateIndex:
+    """
+    Streaming near-duplicate index. add_batch() assigns each new document to
+    an earlier similar document (its representative) or makes it a new one.
+    Documents get sequential integer ids; representatives keep a label (e.g.
+    the record's id or url) and a payload (e.g. the LLM analysis) for members.
+    """
+
+    def __init__(self, threshold: float = 0.7, num_perm: int = 64, bands: int = 16,
+                 shingle_size: int = 3, max_docs: int = 200_000):
+        self.threshold = threshold
+        self.bands = bands
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.max_docs = max_docs
+        self.next_id = 0
+        self._buckets: Dict[int, int] = {}           # band key -> representative id
+        self._signatures: Dict[int, np.ndarray] = {}
+        self._order = deque()                        # (rep id, band keys), oldest first
+        self.labels: Dict[int, Hashable] = {}
+        self.payloads: Dict[int, object] = {}
+        self.cluster_sizes: Dict[int, int] = {}
+
+    def add_batch(self, texts: Sequence[str], labels: Optional[Sequence[Hashable]] = None) -> List[Tuple[int, int]]:
+        """Return (document id, representative id) pairs; new representatives represent themselves."""
+        sig = self.hasher.signatures(texts)
+        keys = band_keys(sig, self.bands).tolist()
+        labels = labels if labels is not None else [None] * len(texts)
+        pairs = []
+        for row, doc_keys, label in zip(sig, keys, labels):
+            doc_id = self.next_id
+            self.next_id += 1
+            rep = self._match(row, doc_keys)
+            if rep is None:
+                rep = doc_id
+                self._remember(doc_id, row, doc_keys, label)
+            self.cluster_sizes[rep] = self.cluster_sizes.get(rep, 0) + 1
+            pairs.append((doc_id, rep))
+        return pairs
+
+    def _match(self, row: np.ndarray, doc_keys: List[int]) -> Optional[int]:
+        for key in doc_keys:
+            rep = self._buckets.get(key)
+            if rep is not None and (self._signatures[rep] == row).mean() >= self.threshold:
+                return rep
+        return None
+
+    def _remember(self, doc_id, row, doc_keys, label):
+        for key in doc_keys:
+            self._buckets.setdefault(key, doc_id)
+        self._signatures[doc_id] = row
+        self.labels[doc_id] = label
+        self._order.append((doc_id, doc_keys))
+        while len(self._order) > self.max_docs:
+            old_id, old_keys = self._order.popleft()
+            for key in old_keys:
+                if self._buckets.get(key) == old_id:
+                    del self._buckets[key]
+            for table in (self._signatures, self.labels, self.payloads, self.cluster_sizes):
+                table.pop(old_id, None)
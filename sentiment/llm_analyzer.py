@@ -1,18 +1,39 @@
 import os
 import json
-import openai
-from dotenv import load_dotenv
+import time
+import random
+import functools
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from sentiment.rate_limit import RateLimiter
+from sentiment.cache import LLMCache
+from sentiment.packing import analyze_packed, truncate_document, MAX_DOC_TOKENS
+from pipeline.env import load_env
+from pipeline import metrics
 
-# Load environment variables
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+MODEL = "gpt-4o-mini"
+# Bump whenever build_prompt changes so cached results are not reused across prompts
+PROMPT_VERSION = "v1"
+MAX_RETRIES = 6
+FALLBACK_RESULT = {"sentiment": "Neutral", "tickers": []}
 
-def analyze_text(text: str) -> dict:
+
+@functools.lru_cache(maxsize=None)
+def _openai():
     """
-    Analyze financial sentiment and extract tickers from text using LLM.
-    Returns a dict with sentiment + tickers an save it in 
+    The openai module, imported and configured on the first LLM call
+    (OPENAI_API_BASE may point at a local stub endpoint for testing).
     """
-    prompt = f"""
+    load_env()
+    import openai
+    openai.api_key = os.getenv("OPENAI_API_KEY")
+    if os.getenv("OPENAI_API_BASE"):
+        openai.api_base = os.getenv("OPENAI_API_BASE")
+    return openai
+
+
+def build_prompt(text: str) -> str:
+    return f"""
     You are a financial sentiment and ticker analyzer.
 
     Task:
@@ -29,29 +50,337 @@ def analyze_text(text: str) -> dict:
     }}
     """
 
-    response = openai.ChatCompletion.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0
-    )
 
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used for TPM budgeting."""
+    return len(text) // 4 + 1
+
+
+def _retry_after(error, default: float) -> float:
+    """Read the server's Retry-After hint from an OpenAI error, if any."""
+    headers = getattr(error, "headers", None) or {}
     try:
-        result = json.loads(response["choices"][0]["message"]["content"].strip())
+        return float(headers.get("retry-after", default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _complete(prompt: str, limiter: RateLimiter = None):
+    """Call the chat completion endpoint, backing off on 429s and transient errors."""
+    openai = _openai()
+    backoff = 1.0
+    for attempt in range(MAX_RETRIES):
+        if limiter:
+            limiter.acquire(estimate_tokens(prompt))
+        try:
+            with metrics.span("external_call", service="llm"):
+                response = openai.ChatCompletion.create(
+                    model=MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0
+                )
+            metrics.record_llm_usage(MODEL, response.get("usage"))
+            return response
+        except openai.error.RateLimitError as e:
+            wait = _retry_after(e, backoff)
+            metrics.inc("retries_total", service="llm", reason="rate_limit")
+            if limiter:
+                limiter.penalize(wait)
+        except (openai.error.APIConnectionError, openai.error.Timeout,
+                openai.error.ServiceUnavailableError, openai.error.APIError):
+            if attempt == MAX_RETRIES - 1:
+                raise
+            wait = backoff
+            metrics.inc("retries_total", service="llm", reason="transient")
+        if attempt == MAX_RETRIES - 1:
+            break
+        # Jitter keeps concurrent workers from retrying in lockstep
+        time.sleep(wait + random.uniform(0, wait / 2))
+        backoff = min(backoff * 2, 60)
+    raise RuntimeError(f"LLM request failed after {MAX_RETRIES} attempts")
+
+
+def _parse_response(response):
+    """Return the JSON result of a completion, or None if it is not valid JSON."""
+    try:
+        return json.loads(response["choices"][0]["message"]["content"].strip())
     except Exception:
-        result = {"sentiment": "Neutral", "tickers": []}
+        metrics.inc("llm_parse_failures_total", model=MODEL)
+        return None
+
+
+def analyze_text(text: str, limiter: RateLimiter = None) -> dict:
+    """
+    Analyze financial sentiment and extract tickers from text using LLM.
+    Returns a dict with sentiment + tickers an save it in
+    """
+    result = _parse_response(_complete(build_prompt(text), limiter))
+    if result is None:
+        result = dict(FALLBACK_RESULT)
+
+    return result
+
 
+def combine_text(item: dict, text_fields) -> str:
+    return " ".join([item.get(field, "") for field in text_fields if item.get(field)])
+
+
+def _analyze_cached(text: str, limiter: RateLimiter = None, cache: LLMCache = None) -> dict:
+    """Serve from the cache when possible; only well-formed LLM answers are stored."""
+    if cache is not None:
+        cached = cache.get(text, MODEL, PROMPT_VERSION)
+        if cached is not None:
+            metrics.inc("cache_hits_total", cache="llm")
+            return cached
+        metrics.inc("cache_misses_total", cache="llm")
+    result = _parse_response(_complete(build_prompt(text), limiter))
+    if result is None:
+        return dict(FALLBACK_RESULT)
+    if cache is not None:
+        cache.put(text, MODEL, PROMPT_VERSION, result)
     return result
 
-def analyze_dataset(dataset: list, text_fields=("title", "body", "description", "content")) -> list:
+
+def _merge_tickers(llm_tickers, local_tickers, matcher) -> list:
+    """Union of LLM and locally matched tickers, normalized to canonical symbols."""
+    merged = {}
+    for t in list(llm_tickers or []) + list(local_tickers):
+        merged.setdefault(matcher.normalize(t), None)
+    return list(merged)
+
+
+def _mark_skipped(item: dict) -> dict:
+    # No known financial entity: not worth an LLM call
+    item["sentiment"] = FALLBACK_RESULT["sentiment"]
+    item["tickers"] = []
+    item["analysis_skipped"] = True
+    metrics.inc("items_skipped_total", stage="analyze")
+    return item
+
+
+def _apply_analysis(item: dict, analysis: dict, local_tickers, matcher=None) -> dict:
+    item["sentiment"] = analysis.get("sentiment", "Neutral")
+    item["tickers"] = analysis.get("tickers", [])
+    if matcher is not None:
+        item["tickers"] = _merge_tickers(item["tickers"], local_tickers, matcher)
+    return item
+
+
+def _mark_failed(item: dict, local_tickers, error) -> dict:
+    metrics.inc("items_failed_total", stage="analyze")
+    print(f"[ERROR] Analysis failed for item {item.get('id') or item.get('url')}: {error}")
+    item["sentiment"] = FALLBACK_RESULT["sentiment"]
+    item["tickers"] = local_tickers
+    item["analysis_error"] = str(error)
+    return item
+
+
+def _analyze_item(item: dict, text_fields, limiter: RateLimiter = None, cache: LLMCache = None,
+                  matcher=None, skip_unmatched: bool = False) -> dict:
+    """Analyze one record; a failed call is recorded on the item instead of raised."""
+    text = combine_text(item, text_fields)
+    local_tickers = matcher.match(text) if matcher is not None else []
+    if matcher is not None and skip_unmatched and not local_tickers:
+        return _mark_skipped(item)
+    try:
+        return _apply_analysis(item, _analyze_cached(text, limiter, cache), local_tickers, matcher)
+    except Exception as e:
+        return _mark_failed(item, local_tickers, e)
+
+
+def _analyze_items_packed(items: list, text_fields, pack_tokens: int, limiter: RateLimiter = None,
+                          cache: LLMCache = None, matcher=None, skip_unmatched: bool = False,
+                          max_workers: int = 1, max_doc_tokens: int = MAX_DOC_TOKENS) -> list:
+    """Like _analyze_item over a list, but with truncated texts packed into shared requests."""
+    texts, targets = [], []
+    for item in items:
+        local_tickers = matcher.match(combine_text(item, text_fields)) if matcher is not None else []
+        if matcher is not None and skip_unmatched and not local_tickers:
+            _mark_skipped(item)
+            continue
+        texts.append(truncate_document([item.get(field) for field in text_fields], max_doc_tokens, matcher))
+        targets.append((item, local_tickers))
+
+    outcomes = analyze_packed(texts, lambda prompt: _complete(prompt, limiter), MODEL, cache,
+                              token_budget=pack_tokens, max_workers=max_workers)
+    for (item, local_tickers), (analysis, error) in zip(targets, outcomes):
+        if analysis is None:
+            _mark_failed(item, local_tickers, error)
+        else:
+            _apply_analysis(item, analysis, local_tickers, matcher)
+    return items
+
+
+# Fields copied from a cluster's representative to its near-duplicates
+PROPAGATED_FIELDS = ("sentiment", "tickers", "analysis_error", "analysis_skipped", "analysis_tier")
+
+
+def _local_tier(items: list, text_fields, local_model, matcher, skip_unmatched: bool = False,
+                audit_rate: float = 0.0):
+    """
+    Label items with the local model. Confident predictions for texts in which
+    the matcher finds tickers are done; the rest go to the LLM, which also
+    extracts tickers the matcher cannot. An audit_rate share of the accepted
+    ones go to the LLM as well, to measure live agreement.
+    Returns (items for the LLM, {id(item): (local label, outcome)}).
+    """
+    candidates, to_llm = [], []
+    for item in items:
+        text = combine_text(item, text_fields)
+        local_tickers = matcher.match(text)
+        if skip_unmatched and not local_tickers:
+            to_llm.append(item)  # marked skipped without a call
+            continue
+        candidates.append((item, text, local_tickers))
+
+    labels, confidence = local_model.predict([text for _, text, _ in candidates])
+    local = {}
+    for (item, _, local_tickers), label, conf in zip(candidates, labels, confidence):
+        if conf < local_model.threshold:
+            outcome = "escalated"
+        elif not local_tickers:
+            # The label alone is useless downstream: features and signals are per ticker
+            outcome = "no_tickers"
+        elif audit_rate and random.random() < audit_rate:
+            outcome = "audited"
+        else:
+            item["sentiment"] = label
+            item["tickers"] = local_tickers
+            item["analysis_tier"] = "local"
+            item["local_confidence"] = round(float(conf), 4)
+            continue
+        local[id(item)] = (label, outcome)
+        item["analysis_tier"] = "llm"
+        to_llm.append(item)
+
+    outcomes = Counter(outcome for _, outcome in local.values())
+    outcomes["accepted"] = len(candidates) - len(local)
+    for outcome, count in outcomes.items():
+        metrics.inc("local_tier_total", count, outcome=outcome)
+    return to_llm, local
+
+
+def _report_local_tier(items: list, local: dict, total: int):
+    """Coverage of the local tier and its agreement with the LLM where both labelled a text."""
+    agree = defaultdict(lambda: [0, 0])   # outcome -> [agreed, compared]
+    for item in items:
+        if id(item) not in local or item.get("analysis_error") or item.get("analysis_skipped"):
+            continue
+        label, outcome = local[id(item)]
+        agreed = label == item.get("sentiment")
+        agree[outcome][0] += agreed
+        agree[outcome][1] += 1
+        metrics.inc("local_tier_agreement_total", kind=outcome, agree=str(agreed).lower())
+    accepted = total - len(items)
+    parts = [f"accepted {accepted} of {total} locally ({accepted / max(total, 1):.1%})"]
+    for outcome in ("escalated", "no_tickers", "audited"):
+        agreed, compared = agree[outcome]
+        if compared:
+            parts.append(f"agreement on {outcome} {agreed / compared:.1%} (n={compared})")
+    print(f"[INFO] Local tier: {', '.join(parts)}")
+
+
+def _record_label(item: dict):
+    return item.get("id") or item.get("url")
+
+
+@metrics.timed("stage", stage="analyze")
+def analyze_dataset(dataset: list, text_fields=("title", "body", "description", "content"),
+                    max_workers: int = 1, requests_per_minute: float = None,
+                    tokens_per_minute: float = None, cache: LLMCache = None,
+                    matcher=None, skip_unmatched: bool = False, dedup=None,
+                    pack_tokens: int = 0, max_doc_tokens: int = MAX_DOC_TOKENS,
+                    local_model=None, audit_rate: float = 0.0) -> list:
     """
     Takes a list of JSON objects (Reddit or News articles),
     extracts text fields, and returns with sentiment + tickers attached.
+
+    With max_workers > 1 the LLM calls run on a bounded thread pool that shares
+    one requests/tokens-per-minute budget. Output keeps the input order, and an
+    item whose call fails gets the Neutral fallback plus an "analysis_error" key.
+
+    If a cache is given it is consulted before any network call. A
+    market.ticker_matcher.TickerMatcher adds locally matched, normalized
+    tickers, and with skip_unmatched=True texts without any match are marked
+    Neutral without calling the LLM.
+
+    With a sentiment.dedup.NearDuplicateIndex (shared across batches and
+    sources) only one representative per near-duplicate cluster is analyzed.
+    Members copy its result and get "duplicate_of" (the representative's id or
+    url); every item gets "duplicate_count", the cluster size seen so far. A
+    member whose representative's result is no longer held is analyzed itself.
+
+    With pack_tokens > 0 texts are truncated to ~max_doc_tokens and packed
+    into requests of up to pack_tokens prompt tokens (sentiment/packing.py);
+    documents missing from an answer are retried, and only they are.
+
+    With a sentiment.local_model.LocalSentimentModel (and a matcher), texts it
+    labels with at least its threshold confidence and in which the matcher
+    finds tickers are accepted without an LLM call ("analysis_tier": "local",
+    tickers from the matcher); the rest, plus an audit_rate sample of the
+    accepted ones, escalate to the LLM, and agreement between the two is reported.
     """
-    results = []
-    for item in dataset:
-        combined_text = " ".join([item.get(field, "") for field in text_fields if item.get(field)])
-        analysis = analyze_text(combined_text)
-        item["sentiment"] = analysis["sentiment"]
-        item["tickers"] = analysis["tickers"]
-        results.append(item)
-    return results
+    metrics.inc("items_total", len(dataset), stage="analyze")
+    limiter = None
+    if requests_per_minute or tokens_per_minute:
+        limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+
+    def analyze(item):
+        return _analyze_item(item, text_fields, limiter, cache, matcher, skip_unmatched)
+
+    pairs = None
+    to_analyze = dataset
+    if dedup is not None:
+        pairs = dedup.add_batch([combine_text(item, text_fields) for item in dataset],
+                                [_record_label(item) for item in dataset])
+        to_analyze = [item for item, (doc_id, rep) in zip(dataset, pairs) if doc_id == rep]
+
+    if local_model is not None and matcher is None:
+        print("[WARN] The local sentiment tier needs a ticker matcher; sending every text to the LLM")
+        local_model = None
+
+    def analyze_all(items):
+        """Local tier, then the LLM; items are updated in place."""
+        to_llm, local = items, None
+        if local_model is not None:
+            to_llm, local = _local_tier(items, text_fields, local_model, matcher, skip_unmatched, audit_rate)
+        if pack_tokens:
+            _analyze_items_packed(to_llm, text_fields, pack_tokens, limiter, cache, matcher,
+                                  skip_unmatched, max_workers, max_doc_tokens)
+        elif max_workers <= 1:
+            for item in to_llm:
+                analyze(item)
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                list(pool.map(analyze, to_llm))
+        if local is not None:
+            _report_local_tier(to_llm, local, len(items))
+
+    analyze_all(to_analyze)
+    if pairs is None:
+        return to_analyze
+
+    payloads, orphans = {}, []
+    for item, (doc_id, rep) in zip(dataset, pairs):
+        if doc_id == rep:
+            payloads[rep] = {k: item[k] for k in PROPAGATED_FIELDS if k in item}
+            # A representative already evicted from the index (batch larger than max_docs) is not kept
+            if rep in dedup.labels:
+                dedup.payloads[rep] = payloads[rep]
+            continue
+        payload = payloads.get(rep) or dedup.payloads.get(rep)
+        if payload is None:
+            # The representative's result is gone (evicted, or its batch never finished): analyze this one
+            orphans.append(item)
+            continue
+        item.update(payload)
+        item["tickers"] = list(item["tickers"])
+        item["duplicate_of"] = dedup.labels.get(rep)
+    if orphans:
+        analyze_all(orphans)
+    for item, (_, rep) in zip(dataset, pairs):
+        item["duplicate_count"] = dedup.cluster_sizes.get(rep, 1)
+    analyzed = len(to_analyze) + len(orphans)
+    metrics.inc("near_duplicates_total", len(dataset) - analyzed, stage="analyze")
+    print(f"[INFO] Near-duplicate clustering: analyzed {analyzed} of {len(dataset)} items")
+    return dataset
@@ -0,0 +1,342 @@
+# sentiment/local_model.py
+"""
+Local Sentiment Model (distilled from LLM labels)
+-------------------------------------------------
+- Trains a linear classifier (scikit-learn LogisticRegression) on the
+  sentiment labels the LLM already produced in data/processed/*_with_sentiment.*
+- Features: hashed word unigrams + bigrams (the HashingVectorizer idea), but
+  tokenized and hashed with NumPy on the bytes of a whole batch (no Python
+  object per word), with a stable hash so a saved model means the same in
+  every process
+- First tier in analyze_dataset(local_model=...): predictions at or above the
+  confidence threshold are accepted locally, the rest escalate to the LLM
+- The threshold is picked on a held-out split as the lowest confidence at
+  which the model agrees with the LLM at least --target-agreement of the
+  time; the agreement/coverage curve is saved with the model
+- Records labelled by this model ("analysis_tier": "local") are never used
+  to train it
+
+Usage:
+  python -m sentiment.local_model --mode train
+  python -m sentiment.local_model --mode eval     # agreement, coverage and texts/s
+"""
+
+import os
+import json
+import time
+import string
+import argparse
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from pipeline.jsonl import find_dataset, iter_records
+
+MODEL_DIR = "data/models"
+MODEL_FILE = "local_sentiment.npz"
+META_FILE = "local_sentiment.json"
+LABELS = ["Negative", "Neutral", "Positive"]
+# Processed datasets and the fields their texts were built from (as in pipeline.config.SOURCES)
+TRAINING_SETS = {
+    "data/processed/reddit_with_sentiment": ("title", "body"),
+    "data/processed/news_with_sentiment": ("title", "description"),
+}
+# Only the start of long posts is featurized (the title and lead carry the sentiment)
+MAX_CHARS = 1000
+DEFAULT_BITS = 20
+TARGET_AGREEMENT = 0.9
+THRESHOLDS = [round(float(t), 2) for t in np.arange(0.40, 1.0, 0.05)]
+
+# Bump when tokenization or hashing changes: saved models are only valid for their version
+FEATURES_VERSION = "bytes-v1"
+
+# Word bytes: ASCII letters/digits and every byte of a non-ASCII character; all else separates words
+_WORD_BYTES = np.zeros(256, dtype=bool)
+_WORD_BYTES[list((string.ascii_letters + string.digits).encode("ascii"))] = True
+_WORD_BYTES[128:] = True
+# Words are hashed from their first WORD_BYTES bytes plus their length
+WORD_BYTES = 24
+_PADDING = b" " * WORD_BYTES
+# Low k bytes of a little-endian 8-byte chunk, k = 0..8
+_CHUNK_MASKS = np.array([(1 << (8 * k)) - 1 for k in range(9)], dtype=np.uint64)
+_CHUNK_KEYS = [np.uint64(k) for k in (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9)]
+_LENGTH_KEY = np.uint64(0x27D4EB2F165667C5)
+_BIGRAM_KEY = np.uint64(0xFF51AFD7ED558CCD)
+# Odd multiplier for multiply-shift hashing into 2**bits buckets
+_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+class HashedNgrams:
+    """Hashed unigram + bigram counts, L2-normalized per text, for a batch at once."""
+
+    def __init__(self, bits: int = DEFAULT_BITS, max_chars: int = MAX_CHARS):
+        self.bits = bits
+        self.n_features = 1 << bits
+        self.max_chars = max_chars
+
+    def words(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        64-bit hash and text index of every word in the batch, in order.
+
+        The batch is lowercased and encoded once, word boundaries are found
+        on the bytes, and each word is hashed from 8-byte chunks read in
+        place, so no per-word Python objects are created.
+        """
+        parts = [(t or "")[:self.max_chars] for t in texts]
+        joined = " ".join(parts)
+        if joined.isascii():
+            data = joined.lower().encode("ascii")
+            lengths = np.fromiter(map(len, parts), dtype=np.int64, count=len(parts))
+        else:
+            encoded = [p.lower().encode("utf-8") for p in parts]
+            data = b" ".join(encoded)
+            lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+
+        size = len(data)
+        buffer = data + _PADDING
+        word = _WORD_BYTES[np.frombuffer(buffer, dtype=np.uint8, count=size)].view(np.int8)
+        edges = np.diff(word, prepend=np.int8(0), append=np.int8(0))
+        starts = np.flatnonzero(edges == 1)
+        length = np.flatnonzero(edges == -1) - starts
+        # An (unaligned) 8-byte chunk starting at every byte offset
+        chunks = np.ndarray(shape=(size + WORD_BYTES - 8,), dtype="<u8", buffer=buffer, strides=(1,))
+
+        with np.errstate(over="ignore"):
+            hashes = (chunks[starts] & _CHUNK_MASKS[np.minimum(length, 8)]) * _CHUNK_KEYS[0]
+            longer = np.flatnonzero(length > 8)
+            if len(longer):
+                first, rest = starts[longer], length[longer]
+                for k in (1, 2):
+                    tail = _CHUNK_MASKS[np.clip(rest - 8 * k, 0, 8)]
+                    hashes[longer] += (chunks[first + 8 * k] & tail) * _CHUNK_KEYS[k]
+            hashes += length.astype(np.uint64) * _LENGTH_KEY
+            hashes ^= hashes >> np.uint64(31)
+        # Text i covers the bytes before the i-th separating space of the joined batch
+        doc = np.searchsorted(np.cumsum(lengths + 1), starts, side="right")
+        return hashes, doc
+
+    def occurrences(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(row, column) of every feature occurrence, and the occurrence count per row."""
+        hashes, doc = self.words(texts)
+        # A bigram is both word hashes side by side; pairs across two texts are dropped
+        same_doc = doc[:-1] == doc[1:]
+        with np.errstate(over="ignore"):
+            bigrams = hashes[:-1][same_doc] * _BIGRAM_KEY + hashes[1:][same_doc]
+            keys = np.concatenate((hashes, bigrams))
+            cols = ((keys * _MULTIPLIER) >> np.uint64(64 - self.bits)).astype(np.int64)
+        rows = np.concatenate((doc, doc[:-1][same_doc]))
+        return rows, cols, np.bincount(rows, minlength=len(texts))
+
+    def entries(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(row, column, value) of every feature occurrence; repeated columns add up."""
+        rows, cols, counts = self.occurrences(texts)
+        return rows, cols, 1.0 / np.sqrt(counts[rows])
+
+    def transform(self, texts: Sequence[str]):
+        from scipy.sparse import csr_matrix
+
+        rows, cols, values = self.entries(texts)
+        return csr_matrix((values, (rows, cols)), shape=(len(texts), self.n_features))
+
+
+class LocalSentimentModel:
+    """Linear model over HashedNgrams; predict() needs only NumPy."""
+
+    def __init__(self, coef: np.ndarray, intercept: np.ndarray, classes: List[str],
+                 bits: int = DEFAULT_BITS, max_chars: int = MAX_CHARS, threshold: float = 1.0):
+        # One row per class; a binary model is stored as two opposite halves so softmax == sigmoid
+        if len(classes) == 2 and coef.shape[0] == 1:
+            coef = np.vstack((-coef / 2, coef / 2))
+            intercept = np.array([-intercept[0] / 2, intercept[0] / 2])
+        self.coef = np.ascontiguousarray(coef, dtype=np.float32)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.classes = list(classes)
+        self.features = HashedNgrams(bits, max_chars)
+        self.threshold = threshold
+
+    # ------------------------------------------------------------ inference
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        n = len(texts)
+        rows, cols, counts = self.features.occurrences(texts)
+        scores = np.empty((n, len(self.classes)))
+        for k, weights in enumerate(self.coef):
+            scores[:, k] = np.bincount(rows, weights=weights[cols], minlength=n)
+        # Every occurrence in a row has the same value, so normalize the row sums once
+        scores /= np.sqrt(np.maximum(counts, 1))[:, None]
+        scores += self.intercept
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        scores /= scores.sum(axis=1, keepdims=True)
+        return scores
+
+    def predict(self, texts: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+        """Label and confidence (highest class probability) per text."""
+        if not len(texts):
+            return [], np.empty(0)
+        proba = self.predict_proba(texts)
+        best = proba.argmax(axis=1)
+        return [self.classes[i] for i in best], proba[np.arange(len(texts)), best]
+
+    # ----------------------------------------------------------- persistence
+    def save(self, model_dir: str = MODEL_DIR, report: Optional[Dict] = None):
+        os.makedirs(model_dir, exist_ok=True)
+        np.savez_compressed(os.path.join(model_dir, MODEL_FILE), coef=self.coef, intercept=self.intercept)
+        meta = {"features": FEATURES_VERSION, "classes": self.classes, "bits": self.features.bits,
+                "max_chars": self.features.max_chars, "threshold": self.threshold, "report": report or {}}
+        with open(os.path.join(model_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        print(f"[INFO] Local sentiment model saved to {model_dir}/{MODEL_FILE}")
+
+    @classmethod
+    def load(cls, model_dir: str = MODEL_DIR, threshold: Optional[float] = None) -> "LocalSentimentModel":
+        with open(os.path.join(model_dir, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("features") != FEATURES_VERSION:
+            raise ValueError(f"Local model in {model_dir} was trained on other features "
+                             f"({meta.get('features')!r}, need {FEATURES_VERSION!r}); retrain it.")
+        arrays = np.load(os.path.join(model_dir, MODEL_FILE))
+        return cls(arrays["coef"], arrays["intercept"], meta["classes"], meta["bits"], meta["max_chars"],
+                   meta["threshold"] if threshold is None else threshold)
+
+
+# --------------------------------------------------------------------------- #
+# Training data, training and evaluation
+# --------------------------------------------------------------------------- #
+
+def _text(item: Dict, text_fields) -> str:
+    # Same text as llm_analyzer.combine_text
+    return " ".join([item.get(field, "") for field in text_fields if item.get(field)])
+
+
+def load_labelled(sets: Dict[str, Sequence[str]] = None) -> Tuple[List[str], List[str]]:
+    """(texts, labels) of records labelled by the LLM itself."""
+    texts, labels = [], []
+    for stem, text_fields in (sets or TRAINING_SETS).items():
+        path = find_dataset(stem)
+        if path is None:
+            print(f"[WARN] Missing: {stem}.*")
+            continue
+        for item in iter_records(path):
+            if item.get("sentiment") not in LABELS or item.get("analysis_tier") == "local":
+                continue
+            # Fallback labels, skipped texts and copies of another record teach nothing
+            if item.get("analysis_error") or item.get("analysis_skipped") or item.get("duplicate_of"):
+                continue
+            text = _text(item, text_fields)
+            if text.strip():
+                texts.append(text)
+                labels.append(item["sentiment"])
+    return texts, labels
+
+
+def fit(texts: Sequence[str], labels: Sequence[str], bits: int = DEFAULT_BITS, C: float = 10.0,
+        max_chars: int = MAX_CHARS) -> LocalSentimentModel:
+    from sklearn.linear_model import LogisticRegression
+
+    X = HashedNgrams(bits, max_chars).transform(texts)
+    # Fit on the columns that occur: the rest get weight 0 anyway, and L-BFGS keeps
+    # history vectors the size of the feature space (GBs over all 2**bits columns)
+    used = np.flatnonzero(X.getnnz(axis=0))
+    clf = LogisticRegression(C=C, max_iter=2000)
+    clf.fit(X[:, used], labels)
+    coef = np.zeros((clf.coef_.shape[0], X.shape[1]))
+    coef[:, used] = clf.coef_
+    return LocalSentimentModel(coef, clf.intercept_, [str(c) for c in clf.classes_], bits, max_chars)
+
+
+def agreement_curve(predicted: Sequence[str], confidence: np.ndarray, labels: Sequence[str],
+                    thresholds=THRESHOLDS) -> List[Dict]:
+    """Coverage (share accepted locally) and agreement with the LLM label at each threshold."""
+    agree = np.array(predicted) == np.array(labels)
+    curve = []
+    for t in thresholds:
+        accepted = confidence >= t
+        curve.append({"threshold": t, "coverage": round(float(accepted.mean()), 4) if len(agree) else 0.0,
+                      "agreement": round(float(agree[accepted].mean()), 4) if accepted.any() else None})
+    return curve
+
+
+def pick_threshold(curve: List[Dict], target: float = TARGET_AGREEMENT) -> float:
+    """Lowest threshold whose accepted predictions agree with the LLM at least `target`; 1.0 = escalate all."""
+    for point in curve:
+        if point["agreement"] is not None and point["agreement"] >= target and point["coverage"] > 0:
+            return point["threshold"]
+    return 1.0
+
+
+def train(texts: Sequence[str], labels: Sequence[str], test_fraction: float = 0.2,
+          target_agreement: float = TARGET_AGREEMENT, seed: int = 0, **fit_args) -> Tuple[LocalSentimentModel, Dict]:
+    """
+    Fit on a random split, choose the threshold on the held-out part, then
+    refit on everything with that threshold. Returns (model, report).
+    """
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(texts))
+    n_test = max(1, int(len(texts) * test_fraction))
+    test, fit_idx = order[:n_test], order[n_test:]
+    model = fit([texts[i] for i in fit_idx], [labels[i] for i in fit_idx], **fit_args)
+
+    test_labels = [labels[i] for i in test]
+    predicted, confidence = model.predict([texts[i] for i in test])
+    curve = agreement_curve(predicted, confidence, test_labels)
+    threshold = pick_threshold(curve, target_agreement)
+    report = {
+        "records": len(texts), "held_out": n_test,
+        "label_counts": {c: labels.count(c) for c in LABELS},
+        "accuracy": round(float(np.mean(np.array(predicted) == np.array(test_labels))), 4),
+        "target_agreement": target_agreement, "threshold": threshold, "curve": curve,
+    }
+    if threshold >= 1.0:
+        print(f"[WARN] No threshold reaches {target_agreement:.0%} agreement; every text will escalate")
+
+    model = fit(texts, labels, **fit_args)
+    model.threshold = threshold
+    return model, report
+
+
+def throughput(model: LocalSentimentModel, texts: Sequence[str], n: int = 100_000, batch_size: int = 10_000) -> float:
+    """Texts per second of batched predict() on one core (texts are repeated up to n)."""
+    sample = [texts[i % len(texts)] for i in range(n)]
+    started = time.perf_counter()
+    for i in range(0, n, batch_size):
+        model.predict(sample[i:i + batch_size])
+    return n / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=("train", "eval"), default="train")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--target-agreement", type=float, default=TARGET_AGREEMENT,
+                        help="Agreement with the LLM required of locally accepted predictions")
+    parser.add_argument("--bits", type=int, default=DEFAULT_BITS, help="log2 of the hashed feature space")
+    parser.add_argument("--C", type=float, default=10.0, help="Inverse regularization strength")
+    parser.add_argument("--max-chars", type=int, default=MAX_CHARS, help="Characters of each text featurized")
+    args = parser.parse_args()
+
+    texts, labels = load_labelled()
+    if not texts:
+        raise SystemExit("No LLM-labelled records found in data/processed.")
+    print(f"[INFO] {len(texts)} LLM-labelled records: {({c: labels.count(c) for c in LABELS})}")
+
+    if args.mode == "train":
+        model, report = train(texts, labels, target_agreement=args.target_agreement, bits=args.bits, C=args.C,
+                              max_chars=args.max_chars)
+        report["texts_per_second"] = round(throughput(model, texts))
+        model.save(args.model_dir, report)
+    else:
+        model = LocalSentimentModel.load(args.model_dir)
+        predicted, confidence = model.predict(texts)
+        # In-sample for the records it was trained on; the held-out numbers are in the saved report
+        report = {"records": len(texts), "threshold": model.threshold,
+                  "curve": agreement_curve(predicted, confidence, labels),
+                  "texts_per_second": round(throughput(model, texts))}
+
+    for point in report["curve"]:
+        marker = "  <- threshold" if point["threshold"] == report["threshold"] else ""
+        agreement = "-" if point["agreement"] is None else f"{point['agreement']:.1%}"
+        print(f"  confidence >= {point['threshold']:.2f}: coverage {point['coverage']:.1%}, "
+              f"agreement {agreement}{marker}")
+    mean_chars = sum(min(len(t), model.features.max_chars) for t in texts) / len(texts)
+    print(f"[INFO] Batch inference: {report['texts_per_second']:,} texts/s on one core "
+          f"(texts of {mean_chars:.0f} characters on average)")
@@ -0,0 +1,288 @@
+# sentiment/packing.py
+"""
+Token-Budgeted Prompt Packing
+-----------------------------
+- Packs many documents into one chat request under a prompt token budget;
+  the instruction block is sent once per request instead of once per text
+- The model answers with a JSON array of {"id", "sentiment", "tickers"}
+  objects keyed by the pack-local document ID
+- Over-long documents are truncated before packing: the title, the leading
+  sentences and then every sentence that mentions a ticker/company
+- Every array entry is validated; documents whose entry is missing or
+  malformed are re-packed (into smaller requests) and retried alone, the
+  rest of the request is kept
+
+Used by sentiment.llm_analyzer.analyze_dataset(pack_tokens=...).
+"""
+
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sentiment.cache import LLMCache
+from pipeline import metrics
+
+# Bump whenever build_packed_prompt or truncation changes (cache keys include it)
+PACKED_PROMPT_VERSION = "packed-v1"
+# Prompt tokens per request and documents per request (bounds the answer size too)
+DEFAULT_PACK_TOKENS = 3000
+MAX_DOCS_PER_PACK = 40
+# Per-document budget after truncation, and how much of it goes to the leading text
+MAX_DOC_TOKENS = 64
+LEAD_TOKENS = 32
+# Shorter leftovers are not worth a clipped ticker sentence
+MIN_PIECE_CHARS = 40
+# Packing rounds: the first sends everything, later ones only the failed documents
+MAX_ROUNDS = 3
+CHARS_PER_TOKEN = 4
+
+SENTIMENTS = {"positive": "Positive", "negative": "Negative", "neutral": "Neutral"}
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+CASHTAG_RE = re.compile(r"\$[A-Za-z][A-Za-z.\-]{0,9}\b")
+FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+GAP = " … "
+
+INSTRUCTIONS = """You are a financial sentiment and ticker analyzer.
+
+For EACH document below:
+1. Classify its sentiment as Positive, Negative, or Neutral.
+2. Extract any stock or crypto tickers (e.g., AAPL, TSLA, BTC-USD); use an empty list if there are none.
+
+Documents, one JSON object per line:
+"""
+
+ANSWER_FORMAT = """
+Return ONLY a JSON array with exactly one object per document id:
+[{"id": "1", "sentiment": "...", "tickers": ["..."]}]"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Same ~4 characters per token heuristic as llm_analyzer.estimate_tokens."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+# --------------------------------------------------------------------------- #
+# Truncation
+# --------------------------------------------------------------------------- #
+
+def _clip(text: str, chars: int) -> str:
+    """Cut at a word boundary to at most `chars` characters."""
+    if len(text) <= chars:
+        return text
+    cut = text[:chars]
+    space = cut.rfind(" ")
+    return cut[:space] if space > chars // 2 else cut
+
+
+def truncate_document(parts: Sequence[str], max_tokens: int = MAX_DOC_TOKENS, matcher=None,
+                      lead_tokens: int = LEAD_TOKENS) -> str:
+    """
+    Join a document's text fields within ~max_tokens. With several fields the
+    first is the title and is kept; the rest is cut to its leading sentences
+    (up to lead_tokens) plus the later sentences that mention a ticker (found
+    by the TickerMatcher, or cashtags without one), in their original order.
+    """
+    parts = [p.strip() for p in parts if p and p.strip()]
+    budget = max_tokens * CHARS_PER_TOKEN
+    full = " ".join(parts)
+    if len(full) <= budget:
+        return full
+
+    title, body = (parts[0], " ".join(parts[1:])) if len(parts) > 1 else ("", parts[0] if parts else "")
+    title = _clip(title, budget // 2)
+    remaining = budget - len(title) - 1
+    sentences = [s for s in SENTENCE_RE.split(body) if s.strip()]
+
+    keep: Dict[int, str] = {}
+    seen = set()
+
+    def take(i, limit):
+        piece = _clip(sentences[i], limit).strip()
+        keep[i] = piece
+        seen.add(sentences[i])
+        return len(piece)
+
+    lead = min(lead_tokens * CHARS_PER_TOKEN, remaining)
+    for i, sentence in enumerate(sentences):
+        if keep and lead < MIN_PIECE_CHARS:
+            break
+        if sentence in seen:
+            continue
+        used = take(i, lead) + 1
+        lead -= used
+        remaining -= used
+
+    def mentions_ticker(sentence):
+        return bool(matcher.match(sentence)) if matcher is not None else bool(CASHTAG_RE.search(sentence))
+
+    for i, sentence in enumerate(sentences):
+        if remaining - len(GAP) < MIN_PIECE_CHARS:
+            break
+        if i in keep or sentence in seen or not mentions_ticker(sentence):
+            continue
+        remaining -= take(i, remaining - len(GAP)) + len(GAP)
+
+    body_text, previous = "", None
+    for i in sorted(keep):
+        if previous is not None:
+            whole = keep[previous] == sentences[previous].strip()
+            body_text += " " if whole and i == previous + 1 else GAP
+        body_text += keep[i]
+        previous = i
+    # Mark that the document was cut
+    return f"{title} {body_text} …".strip()
+
+
+# --------------------------------------------------------------------------- #
+# Packing, prompt and response validation
+# --------------------------------------------------------------------------- #
+
+def _document_line(doc_id: str, text: str) -> str:
+    return json.dumps({"id": doc_id, "text": text}, ensure_ascii=False, separators=(",", ":"))
+
+
+def build_packed_prompt(docs: Sequence[Tuple[str, str]]) -> str:
+    """Prompt for (id, text) documents: instructions once, one JSON line per document."""
+    return INSTRUCTIONS + "\n".join(_document_line(i, t) for i, t in docs) + "\n" + ANSWER_FORMAT
+
+
+_OVERHEAD_TOKENS = estimate_tokens(INSTRUCTIONS + ANSWER_FORMAT)
+
+
+def pack_documents(docs: Sequence[Tuple[str, str]], token_budget: int = DEFAULT_PACK_TOKENS,
+                   max_docs: int = MAX_DOCS_PER_PACK) -> List[List[Tuple[str, str]]]:
+    """
+    Greedily fill requests in input order until the next document would push
+    the prompt past token_budget (or max_docs). A document larger than the
+    whole budget goes out alone.
+    """
+    packs, current, used = [], [], _OVERHEAD_TOKENS
+    for doc in docs:
+        cost = estimate_tokens(_document_line(*doc)) + 1
+        if current and (used + cost > token_budget or len(current) >= max_docs):
+            packs.append(current)
+            current, used = [], _OVERHEAD_TOKENS
+        current.append(doc)
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
+
+def validate_entry(entry) -> Optional[Dict]:
+    """{"sentiment", "tickers"} from one array entry, or None if it breaks the schema."""
+    if not isinstance(entry, dict):
+        return None
+    sentiment = SENTIMENTS.get(str(entry.get("sentiment", "")).strip().lower())
+    tickers = entry.get("tickers", [])
+    if sentiment is None or not isinstance(tickers, list) or not all(isinstance(t, str) for t in tickers):
+        return None
+    return {"sentiment": sentiment, "tickers": [t.strip() for t in tickers if t.strip()]}
+
+
+def parse_packed_response(content: str, expected_ids) -> Dict[str, Dict]:
+    """
+    Valid results by document ID from a packed answer. Unknown IDs, repeated
+    IDs and schema violations are dropped, so only those documents are retried.
+    """
+    try:
+        data = json.loads(FENCE_RE.sub("", (content or "").strip()))
+    except (TypeError, ValueError):
+        return {}
+    if isinstance(data, dict):
+        # Some answers wrap the array: {"results": [...]}
+        data = next((v for v in data.values() if isinstance(v, list)), [])
+    if not isinstance(data, list):
+        return {}
+    expected, results, repeated = set(expected_ids), {}, set()
+    for entry in data:
+        doc_id = str(entry.get("id")) if isinstance(entry, dict) else None
+        if doc_id not in expected:
+            continue
+        if doc_id in results:
+            repeated.add(doc_id)
+            continue
+        result = validate_entry(entry)
+        if result is not None:
+            results[doc_id] = result
+    for doc_id in repeated:
+        results.pop(doc_id, None)
+    return results
+
+
+# --------------------------------------------------------------------------- #
+# Driver
+# --------------------------------------------------------------------------- #
+
+def analyze_packed(texts: Sequence[str], complete: Callable[[str], Dict], model: str,
+                   cache: LLMCache = None, token_budget: int = DEFAULT_PACK_TOKENS,
+                   max_docs: int = MAX_DOCS_PER_PACK, max_workers: int = 1,
+                   max_rounds: int = MAX_ROUNDS) -> List[Tuple[Optional[Dict], Optional[str]]]:
+    """
+    Analyze (already truncated) texts with packed requests; `complete(prompt)`
+    returns a chat completion. Returns (result, error) per text in input order:
+    a result dict, or None plus the reason once max_rounds are used up.
+
+    Identical texts are sent once and cached results are not sent at all.
+    Each retry round re-packs only the failed documents, at half the previous
+    documents per request.
+    """
+    results: List[Optional[Dict]] = [None] * len(texts)
+    errors: Dict[str, str] = {}
+    by_text: Dict[str, List[int]] = {}
+    for i, text in enumerate(texts):
+        if cache is not None:
+            cached = cache.get(text, model, PACKED_PROMPT_VERSION)
+            if cached is not None:
+                metrics.inc("cache_hits_total", cache="llm")
+                results[i] = cached
+                continue
+            metrics.inc("cache_misses_total", cache="llm")
+        by_text.setdefault(text, []).append(i)
+
+    # Pack-local IDs are short ("1", "2", ...) to keep prompt and answer small
+    pending = {str(n + 1): text for n, text in enumerate(by_text)}
+
+    def run_pack(pack):
+        try:
+            response = complete(build_packed_prompt(pack))
+            content = response["choices"][0]["message"]["content"]
+        except Exception as e:
+            return {}, f"{type(e).__name__}: {e}"
+        return parse_packed_response(content, [doc_id for doc_id, _ in pack]), None
+
+    for round_ in range(max_rounds):
+        if not pending:
+            break
+        packs = pack_documents(list(pending.items()), token_budget, max(1, max_docs >> round_))
+        metrics.inc("llm_packed_requests_total", len(packs), model=model)
+        if max_workers <= 1 or len(packs) == 1:
+            outcomes = [run_pack(pack) for pack in packs]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(packs))) as pool:
+                outcomes = list(pool.map(run_pack, packs))
+
+        for pack, (parsed, error) in zip(packs, outcomes):
+            for doc_id, text in pack:
+                result = parsed.get(doc_id)
+                if result is None:
+                    errors[doc_id] = error or "missing or invalid entry in packed response"
+                    continue
+                pending.pop(doc_id)
+                errors.pop(doc_id, None)
+                for i in by_text[text]:
+                    results[i] = result
+                if cache is not None:
+                    cache.put(text, model, PACKED_PROMPT_VERSION, result)
+            failed = sum(1 for doc_id, _ in pack if doc_id in pending)
+            if failed:
+                metrics.inc("llm_parse_failures_total", failed, model=model)
+        if pending and round_ < max_rounds - 1:
+            metrics.inc("retries_total", len(pending), service="llm", reason="packed_parse")
+
+    failures = [None] * len(texts)
+    for doc_id, text in pending.items():
+        for i in by_text[text]:
+            failures[i] = errors.get(doc_id, "no result")
+    return list(zip(results, failures))
@@ -0,0 +1,78 @@
+# sentiment/rate_limit.py
+"""
+Rate limiting helpers for LLM calls
+-----------------------------------
+- Thread-safe token buckets for requests-per-minute and tokens-per-minute budgets
+- Shared by every worker of a concurrent analyze_dataset run
+"""
+
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Continuously refilling bucket holding up to `capacity` units."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        if per_minute <= 0:
+            raise ValueError("per_minute must be positive")
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else per_minute)
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)."""
+        self._refill(now)
+        # Requests larger than the whole bucket are allowed once it is full
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def consume(self, amount: float):
+        self.available -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Blocks callers until both the request and token budgets allow another call.
+    Either budget may be None (unlimited).
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 0):
+        """Wait until one request costing `tokens` tokens fits in both budgets."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = 0.0
+                if self.requests:
+                    wait = max(wait, self.requests.wait_time(1, now))
+                if self.tokens:
+                    wait = max(wait, self.tokens.wait_time(tokens, now))
+                if wait == 0.0:
+                    if self.requests:
+                        self.requests.consume(1)
+                    if self.tokens:
+                        self.tokens.consume(tokens)
+                    return
+            time.sleep(wait)
+
+    def penalize(self, seconds: float):
+        """Drain the buckets so every worker pauses after a 429 response."""
+        with self._lock:
+            now = time.monotonic()
+            for bucket in (self.requests, self.tokens):
+                if bucket:
+                    bucket._refill(now)
+                    bucket.available = min(bucket.available, -seconds * bucket.rate)
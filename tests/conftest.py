@@ -0,0 +1,68 @@
+# tests/conftest.py
+import json
+import os
+import re
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+# Modules are imported the same way as `python -m pkg.module` from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeChatCompletion:
+    """
+    Stand-in for openai.ChatCompletion: answers after `latency` seconds,
+    Positive for texts containing "up", Negative for "down", and raises for "boom".
+    Exceptions queued in `failures` are raised by the next calls, one per call.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.failures = []
+        self.errors = None  # the fake openai.error namespace, set by the fixture
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, messages, temperature=0):
+        prompt = messages[0]["content"]
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            with self._lock:
+                failure = self.failures.pop(0) if self.failures else None
+            if failure is not None:
+                raise failure
+            if self.latency:
+                time.sleep(self.latency)
+            text = re.search(r'Text: "(.*)"', prompt, re.S).group(1)
+            if "boom" in text:
+                raise ValueError("malformed upstream answer")
+            sentiment = "Positive" if "up" in text else "Negative" if "down" in text else "Neutral"
+            tickers = re.findall(r"\$([A-Z]+)", text)
+            content = json.dumps({"sentiment": sentiment, "tickers": tickers})
+            return {"choices": [{"message": {"content": content}}], "usage": None}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Route sentiment.llm_analyzer's chat completions to a FakeChatCompletion."""
+    from sentiment import llm_analyzer
+
+    completion = FakeChatCompletion()
+    error = types.SimpleNamespace(**{name: type(name, (Exception,), {}) for name in (
+        "RateLimitError", "APIConnectionError", "Timeout", "ServiceUnavailableError", "APIError")})
+    completion.errors = error
+    fake = types.SimpleNamespace(ChatCompletion=completion, error=error)
+    monkeypatch.setattr(llm_analyzer, "_openai", lambda: fake)
+    return completion
@@ -0,0 +1,99 @@
+# tests/test_backtest.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.backtest import align_signal, run_backtest, run_sweep
+from pipeline.shm import attach, release, share
+
+
+def test_shared_array_round_trip_is_read_only():
+    array = np.arange(12, dtype=np.float64).reshape(3, 4)
+    shm, spec = share(array)
+    try:
+        handle, view = attach(spec)
+        assert np.array_equal(view, array)
+        assert not view.flags.writeable
+        del view
+        handle.close()
+    finally:
+        release([shm])
+
+
+def test_parallel_sweep_matches_serial():
+    rng = np.random.default_rng(3)
+    close = 100 + np.cumsum(rng.normal(0, 1, (200, 5)), axis=0)
+    signal = rng.normal(0, 0.5, (200, 5))
+    grid = {"entry_threshold": [0.1, 0.3, 0.5]}
+    serial = run_sweep(close, signal, grid, processes=1)
+    parallel = run_sweep(close, signal, grid, processes=2)
+    key = "entry_threshold"
+    pd.testing.assert_frame_equal(serial.sort_values(key).reset_index(drop=True),
+                                  parallel.sort_values(key).reset_index(drop=True))
+
+
+def _run(prices, signal, **params):
+    close = np.array(prices, dtype=np.float64)[:, None]
+    signal = np.array(signal, dtype=np.float64)[:, None]
+    return run_backtest(close, signal, **{"max_position": 0.1, "fee_bps": 0.0, "slippage_bps": 0.0, **params})
+
+
+def test_fees_and_slippage_are_charged_on_turnover():
+    flat = [100.0] * 5
+    result = _run(flat, [0, 1, 1, 0, 0], fee_bps=6.0, slippage_bps=4.0)
+    # Enter 0.1 at bar 1 and exit at bar 3: 10 bps of 0.1 each time, nothing else
+    assert np.allclose(result["returns"], [0, -1e-4, 0, -1e-4, 0])
+    assert result["turnover"] == pytest.approx(0.2)
+    assert result["trades"] == 1
+    assert _run(flat, [0, 1, 1, 0, 0])["total_return"] == 0.0
+
+
+def test_position_earns_the_next_bar_return():
+    result = _run([100.0, 110.0, 110.0, 99.0], [1, 1, 0, 0])
+    # Long 0.1 from bar 0's close: +10% at bar 1, flat before the drop at bar 3
+    assert np.allclose(result["returns"], [0, 0.01, 0, 0])
+
+
+def test_stop_loss_exits_and_blocks_reentry_until_the_signal_changes():
+    prices = [100.0, 97.0, 94.0, 94.0, 94.0, 94.0, 90.0]
+    result = _run(prices, [1, 1, 1, 1, 0, 1, 1], stop_loss=0.05)
+    # -6% at bar 2 hits the 5% stop; the still-long signal does not re-enter until it resets at bar 4
+    assert np.allclose(result["returns"], [0, 0.1 * -0.03, 0.1 * (94 / 97 - 1), 0, 0, 0, 0.1 * (90 / 94 - 1)])
+    assert result["trades"] == 2
+    assert result["turnover"] == pytest.approx(0.3)
+
+
+def test_take_profit_exits():
+    result = _run([100.0, 104.0, 111.0, 120.0], [1, 1, 1, 1], take_profit=0.1)
+    assert np.allclose(result["returns"], [0, 0.004, 0.1 * (111 / 104 - 1), 0])
+    assert result["trades"] == 1
+
+
+def test_short_side_and_threshold():
+    result = _run([100.0, 90.0, 90.0], [-0.5, -0.1, -0.1], allow_short=True, entry_threshold=0.2)
+    # Short 0.1 on bar 0 earns +1% on the drop, then -0.1 is inside the threshold: flat
+    assert np.allclose(result["returns"], [0, 0.01, 0])
+    assert _run([100.0, 90.0, 90.0], [-0.5, -0.1, -0.1])["total_return"] == 0.0
+
+
+def test_align_signal_uses_a_feature_row_from_the_next_bar_on():
+    bars = pd.date_range("2024-01-01", periods=5, freq="D")
+    features = pd.DataFrame({
+        "ticker": ["TSLA", "TSLA", "AAPL", "AAPL"],
+        # Midnight of Jan 2 is that bar's own stamp, but the bar trades at its close: usable on Jan 3
+        "timestamp": ["2024-01-02T00:00:00Z", "2024-01-03T15:30:00Z", "2024-01-01T09:00:00Z",
+                      "2024-01-06T00:00:00Z"],
+        "avg_sentiment": [2.0, 0.0, 1.5, 0.0],
+    })
+    signal = align_signal(features, "avg_sentiment", bars, ["TSLA", "AAPL", "MSFT"])
+    expected = np.array([
+        [np.nan, np.nan, np.nan],
+        [np.nan, 0.5, np.nan],
+        [1.0, 0.5, np.nan],
+        [-1.0, 0.5, np.nan],
+        [-1.0, 0.5, np.nan],  # the Jan 6 row is after the last bar
+    ])
+    assert np.array_equal(signal, expected, equal_nan=True)
+    # A tz-aware price index gives the same alignment
+    assert np.array_equal(align_signal(features, "avg_sentiment", bars.tz_localize("UTC"),
+                                       ["TSLA", "AAPL", "MSFT"]), expected, equal_nan=True)
@@ -0,0 +1,79 @@
+# tests/test_cache.py
+import time
+
+from sentiment.cache import LLMCache, cache_key
+
+RESULT = {"sentiment": "Positive", "tickers": ["AAPL"]}
+
+
+def _last_used(cache, text):
+    key = cache_key(text, "m", "v1")
+    return cache.conn.execute("SELECT last_used FROM llm_results WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_hit_survives_reopen_and_normalization(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = LLMCache(path)
+    assert cache.get("Apple  beats\nestimates", "m", "v1") is None
+    cache.put("Apple  beats\nestimates", "m", "v1", RESULT)
+    cache.close()
+
+    cache = LLMCache(path)
+    assert cache.get("Apple beats estimates", "m", "v1") == RESULT
+    # Model and prompt version are part of the key
+    assert cache.get("Apple beats estimates", "other", "v1") is None
+    assert cache.get("Apple beats estimates", "m", "v2") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+    cache.close()
+
+
+def test_bypass_and_expiry(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.db"), max_age_seconds=60, bypass=True)
+    cache.put("text", "m", "v1", RESULT)
+    assert cache.stats()["entries"] == 0
+    cache.bypass = False
+    cache.put("text", "m", "v1", RESULT)
+    cache.conn.execute("UPDATE llm_results SET created_at = ?", (time.time() - 120,))
+    assert cache.get("text", "m", "v1") is None
+    assert cache.stats()["entries"] == 0
+    cache.close()
+
+
+def test_hits_do_not_write_until_flushed(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.db"))
+    cache.put("text", "m", "v1", RESULT)
+    stored = _last_used(cache, "text")
+    changes = cache.conn.total_changes
+    time.sleep(0.01)
+    for _ in range(50):
+        assert cache.get("text", "m", "v1") == RESULT
+    assert cache.conn.total_changes == changes
+    assert _last_used(cache, "text") == stored
+    cache.put("other", "m", "v1", RESULT)
+    assert _last_used(cache, "text") > stored
+    cache.close()
+
+
+def test_evict_keeps_recently_used_entries(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = LLMCache(path, max_entries=3)
+    for i in range(5):
+        cache.put(f"text {i}", "m", "v1", RESULT)
+        time.sleep(0.002)
+    # Touch the two oldest entries; eviction must see those hits
+    time.sleep(0.002)
+    cache.get("text 0", "m", "v1")
+    cache.get("text 1", "m", "v1")
+    assert cache.evict() == 2
+    kept = [i for i in range(5) if cache.get(f"text {i}", "m", "v1") is not None]
+    assert kept == [0, 1, 4]
+    cache.close()
+
+    # Hits noted before close are persisted
+    cache = LLMCache(path)
+    before = _last_used(cache, "text 4")
+    cache.get("text 4", "m", "v1")
+    cache.close()
+    cache = LLMCache(path)
+    assert _last_used(cache, "text 4") > before
+    cache.close()
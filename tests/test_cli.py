@@ -0,0 +1,76 @@
+# tests/test_cli.py
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cli
+from pipeline import env
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("pandas", "numpy", "openai", "pyarrow", "xgboost")
+
+
+def _run(*args, code=None):
+    command = [sys.executable, "-c", code] if code else [sys.executable, "-m", "cli", *args]
+    return subprocess.run(command, cwd=ROOT, capture_output=True, text=True, timeout=60)
+
+
+def _imports_after(argv):
+    code = ("import sys, cli\n"
+            "try:\n"
+            f"    cli.main({argv!r})\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            f"print('loaded:' + ','.join(m for m in {HEAVY!r} if m in sys.modules))")
+    result = _run(code=code)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip().splitlines()[-1].split("loaded:", 1)[1]
+
+
+def test_help_lists_every_command():
+    result = _run("--help")
+    assert result.returncode == 0
+    for name in cli.COMMANDS:
+        assert f"  {name}" in result.stdout
+
+
+@pytest.mark.parametrize("argv", [["--help"], [], ["twitter", "--help"], ["news", "--help"]])
+def test_light_commands_do_not_import_heavy_modules(argv):
+    assert _imports_after(argv) == ""
+
+
+def test_unknown_command_exits_non_zero():
+    result = _run("no-such-command")
+    assert result.returncode == 2
+    assert "unknown command: no-such-command" in result.stderr
+    assert "commands:" in result.stderr
+
+
+def test_subcommand_runs_its_module_with_its_own_arguments(monkeypatch):
+    calls = []
+    monkeypatch.setattr(sys, "argv", ["cli.py"])
+    monkeypatch.setattr(cli.runpy, "run_module",
+                        lambda module, run_name, alter_sys: calls.append((module, run_name, list(sys.argv))))
+    assert cli.main(["analyze", "--incremental", "--format", "jsonl"]) == 0
+    assert calls == [("main", "__main__", ["cli.py", "--incremental", "--format", "jsonl"])]
+
+
+@pytest.mark.parametrize("command", sorted(cli.COMMANDS))
+def test_every_command_module_exists(command):
+    assert importlib.util.find_spec(cli.COMMANDS[command][0]) is not None
+
+
+def test_require_env(monkeypatch):
+    monkeypatch.setattr(env, "load_env", lambda: False)
+    monkeypatch.setenv("SOME_TOKEN", "secret")
+    assert env.require_env("SOME_TOKEN") == "secret"
+
+    monkeypatch.delenv("SOME_TOKEN")
+    with pytest.raises(ValueError, match=r"^Missing SOME_TOKEN\. Please set it in the environment or the \.env file\.$"):
+        env.require_env("SOME_TOKEN")
+    monkeypatch.setenv("SOME_TOKEN", "")
+    with pytest.raises(ValueError, match="Create an app at example.com"):
+        env.require_env("SOME_TOKEN", hint="Create an app at example.com")
@@ -0,0 +1,83 @@
+# tests/test_daemon.py
+import threading
+import time
+
+import pytest
+
+from pipeline.daemon import StreamingDaemon
+from pipeline.jsonl import iter_records, write_records
+from pipeline.state import PipelineState
+
+
+def _records(start, n):
+    return [{"source_type": "reddit", "record_id": f"p{i}", "id": f"p{i}", "title": f"$TSLA goes up {i}",
+             "body": "", "created_utc": f"2024-01-01T00:{i % 60:02d}:00Z"} for i in range(start, start + n)]
+
+
+def _daemon(tmp_path, **kwargs):
+    return StreamingDaemon({}, stream_path=str(tmp_path / "stream.jsonl"), batch_size=5, batch_wait=0.05,
+                           queue_size=10, signals_path=str(tmp_path / "signals.jsonl"),
+                           processed_path=str(tmp_path / "processed.jsonl"), state_path=str(tmp_path / "state.db"),
+                           **kwargs)
+
+
+def _run_until(daemon, condition, timeout=10.0):
+    errors = []
+
+    def run():
+        try:
+            daemon.run()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline and thread.is_alive():
+        time.sleep(0.02)
+    daemon.stop()
+    thread.join(timeout)
+    assert not thread.is_alive(), "daemon did not shut down"
+    return errors
+
+
+def test_restart_resumes_from_the_checkpoint(tmp_path, fake_llm):
+    write_records(str(tmp_path / "stream.jsonl"), _records(0, 20))
+    daemon = _daemon(tmp_path)
+    assert _run_until(daemon, lambda: daemon.counts["analyzed"] == 20) == []
+    assert daemon.totals["TSLA"][1] == 20
+
+    state = PipelineState(str(tmp_path / "state.db"))
+    assert state.new_records("reddit", _records(0, 20), watermark=None) == []
+    state.close()
+    # Output written after the checkpoint (e.g. by a crashed run) is dropped on restart
+    processed_size = (tmp_path / "processed.jsonl").stat().st_size
+    with open(tmp_path / "processed.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"id": "partial"}\n')
+
+    write_records(str(tmp_path / "stream.jsonl"), _records(20, 10), append=True)
+    daemon = _daemon(tmp_path)
+    assert daemon.offset > 0 and daemon.totals["TSLA"][1] == 20
+    assert (tmp_path / "processed.jsonl").stat().st_size == processed_size
+    assert _run_until(daemon, lambda: daemon.counts["analyzed"] == 10) == []
+    assert daemon.totals["TSLA"][1] == 30
+    assert fake_llm.calls == 30
+    assert [r["id"] for r in iter_records(str(tmp_path / "processed.jsonl"))] == [f"p{i}" for i in range(30)]
+
+
+def test_signal_stage_failure_stops_the_daemon(tmp_path, fake_llm, monkeypatch):
+    write_records(str(tmp_path / "stream.jsonl"), _records(0, 200))
+    daemon = _daemon(tmp_path)
+
+    def fail(*args):
+        raise ValueError("feature store unavailable")
+
+    monkeypatch.setattr(daemon, "_emit_signals", fail)
+    # Without stopping, the daemon only ends because the signal stage died
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match="signal"):
+        daemon.run()
+    assert time.monotonic() - started < 10
+    assert daemon.counts["analyzed"] < 200
+    # Nothing was checkpointed, so a restart reads the stream from the start
+    assert _daemon(tmp_path).offset == 0
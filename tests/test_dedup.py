@@ -0,0 +1,50 @@
+# tests/test_dedup.py
+from sentiment.dedup import NearDuplicateIndex, cluster_near_duplicates
+from sentiment.llm_analyzer import analyze_dataset
+
+STORY = "Tesla shares move up after record quarterly deliveries beat analyst estimates by a wide margin"
+
+
+def _item(i, text):
+    return {"id": f"p{i}", "title": text}
+
+
+def test_clusters_near_duplicates_only():
+    texts = [STORY, STORY + " today", "Completely unrelated text about the weather this weekend in town", STORY]
+    reps = list(cluster_near_duplicates(texts, threshold=0.7))
+    assert reps[0] == reps[1] == reps[3]
+    assert reps[2] != reps[0]
+
+
+def test_members_copy_the_representative_result(fake_llm):
+    index = NearDuplicateIndex(0.7)
+    batch = [_item(0, STORY), _item(1, STORY + " today"), _item(2, "down day for $AAPL")]
+    analyzed = analyze_dataset(batch, text_fields=("title",), dedup=index)
+    assert fake_llm.calls == 2
+    assert analyzed[1]["sentiment"] == "Positive"
+    assert analyzed[1]["duplicate_of"] == "p0"
+    assert [item["duplicate_count"] for item in analyzed] == [2, 2, 1]
+
+    # A later batch (or source) reuses the stored result
+    later = analyze_dataset([_item(3, "Breaking: " + STORY)], text_fields=("title",), dedup=index)
+    assert fake_llm.calls == 2
+    assert later[0]["duplicate_of"] == "p0" and later[0]["duplicate_count"] == 3
+
+
+def test_representative_evicted_within_the_batch(fake_llm):
+    index = NearDuplicateIndex(0.7, max_docs=1)
+    batch = [_item(0, STORY), _item(1, STORY + " today"), _item(2, "down day for $AAPL")]
+    analyzed = analyze_dataset(batch, text_fields=("title",), dedup=index)
+    assert analyzed[1]["sentiment"] == "Positive"
+    assert analyzed[1]["duplicate_of"] is None  # label evicted with the representative
+    assert 0 not in index.payloads
+
+
+def test_missing_representative_result_is_analyzed_again(fake_llm):
+    index = NearDuplicateIndex(0.7)
+    # The representative's batch never finished, so no result was stored for it
+    index.add_batch([STORY], ["p0"])
+    analyzed = analyze_dataset([_item(1, STORY + " today")], text_fields=("title",), dedup=index)
+    assert fake_llm.calls == 1
+    assert analyzed[0]["sentiment"] == "Positive"
+    assert "duplicate_of" not in analyzed[0]
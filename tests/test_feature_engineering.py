@@ -0,0 +1,38 @@
+# tests/test_feature_engineering.py
+import numpy as np
+import pandas as pd
+
+from models.feature_engineering import IncrementalSentimentWindows, flatten_mentions, window_features
+
+
+def _records():
+    rng = np.random.default_rng(5)
+    start = pd.Timestamp("2024-01-01", tz="UTC")
+    records = []
+    for i in range(300):
+        ts = start + pd.Timedelta(seconds=int(i * 600 + rng.integers(0, 300)))
+        source = ["news", "reddit", "twitter"][i % 3]
+        record = {"tickers": [["TSLA"], ["AAPL"], ["TSLA", "AAPL"]][i % 3],
+                  "sentiment": ["Positive", "Negative", "Neutral"][int(rng.integers(0, 3))]}
+        key = {"news": "published_at", "reddit": "created_utc", "twitter": "created_at"}[source]
+        record[key] = ts.isoformat()
+        if source == "reddit":
+            record["subreddit"] = "stocks"
+        records.append(record)
+    return records
+
+
+def test_incremental_windows_match_batch():
+    flat = flatten_mentions(pd.DataFrame(_records())).sort_values("ts", kind="stable")
+    windows = IncrementalSentimentWindows()
+    for row in flat.itertuples(index=False):
+        windows.update(row.ticker, row.sentiment, row.ts, row.source_type)
+
+    # Right after the last mention, and years later (the decayed weight underflows to 0)
+    for as_of in (flat["ts"].max(), flat["ts"].max() + pd.Timedelta(days=3650)):
+        query = pd.DataFrame({"ticker": ["TSLA", "AAPL"], "as_of": [as_of, as_of]})
+        batch = window_features(flat, query).set_index("ticker")
+        for ticker in ("TSLA", "AAPL"):
+            incremental = windows.features(ticker, as_of)
+            for column, expected in batch.loc[ticker].items():
+                assert np.isclose(incremental[column], expected), (ticker, as_of, column)
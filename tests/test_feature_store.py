@@ -0,0 +1,47 @@
+# tests/test_feature_store.py
+import pandas as pd
+import pytest
+
+from models.feature_store import FeatureStore
+
+
+def _rows(tickers=("TSLA", "AAPL"), days=3, price=1.0, **extra):
+    stamps = pd.date_range("2025-08-18", periods=days, freq="D", tz="UTC")
+    rows = pd.DataFrame([{"ticker": t, "timestamp": ts, "price": price, "avg_sentiment": 1.0}
+                         for t in tickers for ts in stamps])
+    return rows.assign(**extra)
+
+
+def test_append_and_filtered_read(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    assert store.append(_rows()) == 6
+    df = store.read(tickers=["TSLA"], start="2025-08-19", end="2025-08-20", columns=["price"])
+    assert list(df.columns) == ["ticker", "timestamp", "price"]
+    assert df["ticker"].tolist() == ["TSLA"]
+    assert df["timestamp"].tolist() == [pd.Timestamp("2025-08-19")]
+    assert "written_at" not in store.read().columns
+
+
+def test_reappended_rows_resolve_to_the_latest_write(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    for price in range(20):
+        store.append(_rows(tickers=("TSLA",), days=1, price=float(price)))
+    df = store.read()
+    assert len(df) == 1
+    assert df["price"].iloc[0] == 19.0
+    assert store.read(latest_only=True, columns=["price"])["price"].tolist() == [19.0]
+
+
+def test_columns_added_by_later_appends_are_readable(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    store.append(_rows(days=2))
+    store.append(_rows(days=1, rsi_14=55.0).assign(timestamp=pd.Timestamp("2025-08-25", tz="UTC")))
+
+    df = store.read(columns=["rsi_14"])
+    assert len(df) == 6
+    assert df["rsi_14"].notna().sum() == 2
+    assert (df.loc[df["rsi_14"].notna(), "timestamp"] == pd.Timestamp("2025-08-25")).all()
+    assert "rsi_14" in store.read().columns
+
+    with pytest.raises(KeyError, match="no_such_column"):
+        store.read(columns=["no_such_column"])
@@ -0,0 +1,47 @@
+# tests/test_indicators.py
+import numpy as np
+import pandas as pd
+
+from market.indicators import IndicatorState, RollingSum, compute_indicators, sma
+
+
+def _bars(n=120, nan_rows=(), seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    high = close + rng.uniform(0, 1, n)
+    low = close - rng.uniform(0, 1, n)
+    frame = pd.DataFrame({"Open": close, "High": high, "Low": low, "Close": close,
+                          "Volume": rng.uniform(1e3, 1e4, n)})
+    frame.iloc[list(nan_rows)] = np.nan
+    return frame
+
+
+def _incremental(frame):
+    state = IndicatorState()
+    rows = [state.update(*bar) for bar in frame[["Open", "High", "Low", "Close", "Volume"]].itertuples(index=False)]
+    return pd.DataFrame(rows, index=frame.index)
+
+
+def test_batch_and_incremental_match():
+    frame = _bars()
+    batch, incremental = compute_indicators(frame), _incremental(frame)
+    np.testing.assert_allclose(incremental[batch.columns].to_numpy(), batch.to_numpy(), rtol=1e-9, equal_nan=True)
+
+
+def test_batch_and_incremental_match_with_nan_bars():
+    frame = _bars(nan_rows=(30, 31, 75))
+    batch, incremental = compute_indicators(frame), _incremental(frame)
+    np.testing.assert_allclose(incremental[batch.columns].to_numpy(), batch.to_numpy(), rtol=1e-9, equal_nan=True)
+    # Windowed indicators recover once the NaN bars leave the window
+    assert np.isfinite(incremental["sma_20"].iloc[-1])
+    assert np.isfinite(incremental["vwap_20"].iloc[-1])
+    assert np.isfinite(incremental["bb_mid"].iloc[-1])
+
+
+def test_rolling_sum_recovers_after_nan():
+    window = RollingSum(3)
+    values = [1.0, 2.0, float("nan"), 4.0, 5.0, 6.0, 7.0]
+    got = [window.update(x) for x in values]
+    expected = sma(values, 3) * 3
+    np.testing.assert_allclose(got, expected, equal_nan=True)
+    assert got[-2:] == [15.0, 18.0]
@@ -0,0 +1,93 @@
+# tests/test_jsonl.py
+import json
+
+import pytest
+
+import main
+from pipeline.jsonl import iter_records, iter_records_with_offsets, write_records
+from pipeline.state import PipelineState
+
+
+@pytest.mark.parametrize("name", ["records.jsonl", "records.jsonl.gz", "records.json"])
+def test_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    records = [{"id": str(i), "title": f"ünïcode {i}"} for i in range(5)]
+    assert write_records(path, records[:3]) == 3
+    write_records(path, records[3:], append=True)
+    assert list(iter_records(path)) == records
+
+
+@pytest.mark.parametrize("name", ["records.jsonl", "records.jsonl.gz"])
+def test_resume_from_offset(tmp_path, name):
+    path = str(tmp_path / name)
+    write_records(path, [{"id": i} for i in range(10)])
+    offsets = [offset for offset, _ in iter_records_with_offsets(path)]
+    assert offsets == sorted(offsets)
+    resumed = [record["id"] for _, record in iter_records_with_offsets(path, offsets[3])]
+    assert resumed == list(range(4, 10))
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    path = tmp_path / "records.jsonl"
+    path.write_text('{"id": 1}\n{"id": 2}\n{"id": 3, "ti', encoding="utf-8")
+    assert [r["id"] for r in iter_records(str(path))] == [1, 2]
+
+
+def test_interrupted_run_resumes_from_checkpoint(tmp_path, monkeypatch):
+    raw = tmp_path / "raw"
+    write_records(str(raw) + ".jsonl", [{"id": f"p{i}", "title": f"post {i}"} for i in range(10)])
+    out = tmp_path / "processed"
+    monkeypatch.setattr(main, "SOURCES", {"reddit": (str(raw), str(out), ("title",))})
+    monkeypatch.setattr(main, "BATCH_SIZE", 4)
+
+    calls = []
+
+    def analyze(records, text_fields, **options):
+        calls.append([r["id"] for r in records])
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        return [dict(r, sentiment="Neutral", tickers=[]) for r in records]
+
+    monkeypatch.setattr(main, "analyze_dataset", analyze)
+    with pytest.raises(KeyboardInterrupt):
+        main.process_source("reddit", {}, fmt="jsonl")
+    output = str(out) + ".jsonl"
+    with open(output + ".ckpt", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    assert checkpoint["input"] == str(raw) + ".jsonl"
+    assert [r["id"] for r in iter_records(output)] == ["p0", "p1", "p2", "p3"]
+
+    # The resumed run starts after the last checkpointed batch and appends
+    assert main.process_source("reddit", {}, fmt="jsonl", resume=True) == 6
+    assert calls[2:] == [["p4", "p5", "p6", "p7"], ["p8", "p9"]]
+    assert [r["id"] for r in iter_records(output)] == [f"p{i}" for i in range(10)]
+    assert not (tmp_path / "processed.jsonl.ckpt").exists()
+
+
+def test_incremental_json_run_interrupted_between_batches_loses_nothing(tmp_path, monkeypatch):
+    raw = tmp_path / "raw"
+    write_records(str(raw) + ".jsonl", [{"id": f"p{i}", "title": f"post {i}"} for i in range(10)])
+    out = tmp_path / "processed"
+    monkeypatch.setattr(main, "SOURCES", {"reddit": (str(raw), str(out), ("title",))})
+    monkeypatch.setattr(main, "BATCH_SIZE", 4)
+
+    calls = []
+
+    def analyze(records, text_fields, **options):
+        calls.append([r["id"] for r in records])
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        return [dict(r, sentiment="Neutral", tickers=[]) for r in records]
+
+    monkeypatch.setattr(main, "analyze_dataset", analyze)
+    state = PipelineState(str(tmp_path / "state.db"))
+    with pytest.raises(KeyboardInterrupt):
+        main.process_source("reddit", {}, state)
+    # Nothing was written, so nothing may be marked processed
+    assert state.new_records("reddit", [{"id": "p0"}]) == [{"id": "p0"}]
+
+    assert main.process_source("reddit", {}, state) == 10
+    assert calls[2:] == [["p0", "p1", "p2", "p3"], ["p4", "p5", "p6", "p7"], ["p8", "p9"]]
+    assert [r["id"] for r in iter_records(str(out) + ".json")] == [f"p{i}" for i in range(10)]
+    assert main.process_source("reddit", {}, state) == 0
+    state.close()
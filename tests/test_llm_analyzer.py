@@ -0,0 +1,128 @@
+# tests/test_llm_analyzer.py
+import threading
+import time
+
+import pytest
+
+from sentiment import llm_analyzer
+from sentiment.llm_analyzer import analyze_dataset, analyze_text
+from sentiment.rate_limit import RateLimiter, TokenBucket
+
+
+def _dataset(n):
+    words = ("up", "down", "flat")
+    return [{"id": str(i), "title": f"$T{chr(65 + i % 26)} moves {words[i % 3]} today"} for i in range(n)]
+
+
+def test_results_keep_input_order(fake_llm):
+    dataset = _dataset(30)
+    analyzed = analyze_dataset(dataset, max_workers=8)
+    assert [item["id"] for item in analyzed] == [str(i) for i in range(30)]
+    expected = {"up": "Positive", "down": "Negative", "flat": "Neutral"}
+    for item in analyzed:
+        assert item["sentiment"] == expected[item["title"].split()[2]]
+        assert item["tickers"] == [item["title"].split()[0][1:]]
+
+
+def test_failed_call_is_recorded_on_the_item(fake_llm):
+    dataset = _dataset(5) + [{"id": "bad", "title": "boom"}]
+    analyzed = analyze_dataset(dataset, max_workers=4)
+    assert analyzed[-1]["sentiment"] == "Neutral"
+    assert "analysis_error" in analyzed[-1]
+    assert not any("analysis_error" in item for item in analyzed[:-1])
+
+
+def test_calls_run_concurrently_up_to_max_workers(fake_llm):
+    fake_llm.latency = 0.1
+    analyze_dataset(_dataset(16), max_workers=8)
+    assert fake_llm.calls == 16
+    assert fake_llm.peak == 8
+
+    fake_llm.peak = 0
+    analyze_dataset(_dataset(4), max_workers=1)
+    assert fake_llm.peak == 1
+
+
+def test_rate_limiter_caps_throughput_across_workers():
+    limiter = RateLimiter(requests_per_minute=1200)
+    limiter.requests = TokenBucket(1200, capacity=1)  # 20 requests/s, no burst
+    started = time.perf_counter()
+    threads = [threading.Thread(target=lambda: [limiter.acquire() for _ in range(3)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    # 12 requests: the first is free, the other 11 need 1/20 s each
+    assert elapsed >= 11 / 20 * 0.95
+
+
+def test_token_budget_and_penalty():
+    bucket = TokenBucket(600)
+    now = time.monotonic()
+    assert bucket.wait_time(600, now) == 0.0
+    bucket.consume(600)
+    assert abs(bucket.wait_time(100, now) - 10.0) < 1e-6
+    # Larger than the bucket: allowed once the bucket is full
+    assert bucket.wait_time(10_000, now + 60) == 0.0
+
+    limiter = RateLimiter(requests_per_minute=6000)
+    limiter.penalize(0.2)
+    started = time.perf_counter()
+    limiter.acquire()
+    assert time.perf_counter() - started >= 0.19
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record _complete's back-off sleeps instead of sleeping (no jitter)."""
+    waits = []
+    monkeypatch.setattr(llm_analyzer.time, "sleep", waits.append)
+    monkeypatch.setattr(llm_analyzer.random, "uniform", lambda a, b: 0.0)
+    return waits
+
+
+class PenaltySpy:
+    def __init__(self):
+        self.penalties = []
+
+    def acquire(self, tokens=0):
+        pass
+
+    def penalize(self, seconds):
+        self.penalties.append(seconds)
+
+
+def test_rate_limit_waits_for_retry_after(fake_llm, sleeps):
+    error = fake_llm.errors.RateLimitError("429")
+    error.headers = {"retry-after": "7"}
+    fake_llm.failures = [error, fake_llm.errors.RateLimitError("429 without a hint")]
+    limiter = PenaltySpy()
+    assert analyze_text("$TSLA up", limiter) == {"sentiment": "Positive", "tickers": ["TSLA"]}
+    assert fake_llm.calls == 3
+    # Retry-After when given, the exponential back-off otherwise; every worker pauses as well
+    assert sleeps == [7.0, 2.0]
+    assert limiter.penalties == [7.0, 2.0]
+
+
+def test_transient_errors_back_off_exponentially(fake_llm, sleeps):
+    errors = fake_llm.errors
+    fake_llm.failures = [errors.APIConnectionError(), errors.Timeout(), errors.ServiceUnavailableError()]
+    assert analyze_text("$NVDA down")["sentiment"] == "Negative"
+    assert sleeps == [1.0, 2.0, 4.0]
+
+
+def test_retries_are_bounded(fake_llm, sleeps):
+    fake_llm.failures = [fake_llm.errors.APIError("down")] * llm_analyzer.MAX_RETRIES
+    with pytest.raises(fake_llm.errors.APIError):
+        analyze_text("$NVDA down")
+    assert fake_llm.calls == llm_analyzer.MAX_RETRIES
+    assert len(sleeps) == llm_analyzer.MAX_RETRIES - 1
+
+    fake_llm.failures = [fake_llm.errors.RateLimitError("429")] * llm_analyzer.MAX_RETRIES
+    with pytest.raises(RuntimeError, match="failed after"):
+        analyze_text("$NVDA down")
+    # analyze_dataset records the failure on the item instead of raising
+    fake_llm.failures = [fake_llm.errors.APIError("down")] * llm_analyzer.MAX_RETRIES
+    [item] = analyze_dataset([{"id": "1", "title": "$NVDA down"}])
+    assert item["sentiment"] == "Neutral" and "analysis_error" in item
@@ -0,0 +1,152 @@
+# tests/test_local_model.py
+import json
+import os
+import random
+
+import numpy as np
+import pytest
+
+from sentiment import llm_analyzer
+from sentiment.llm_analyzer import _local_tier, analyze_dataset
+from sentiment.local_model import (FEATURES_VERSION, META_FILE, HashedNgrams, LocalSentimentModel,
+                                   agreement_curve, pick_threshold, train)
+
+LABEL_ORDER = ["Positive", "Negative", "Neutral"]
+
+
+def _columns(features, text):
+    rows, cols, _ = features.occurrences([text])
+    return sorted(cols.tolist())
+
+
+def test_tokenization_is_case_and_punctuation_insensitive():
+    features = HashedNgrams(bits=18)
+    assert _columns(features, "Tesla, beats estimates!") == _columns(features, "tesla beats   ESTIMATES")
+    assert _columns(features, "tesla beats") != _columns(features, "beats tesla")  # bigrams keep order
+    # 2 words + 1 bigram; words of 8+ and 24+ bytes are hashed from their chunks plus length
+    assert len(_columns(features, "a b")) == 3
+    long_a, long_b = "x" * 30 + "a", "x" * 30 + "b"
+    assert _columns(features, "supercalifragilistic") != _columns(features, "supercalifragilistik")
+    assert _columns(features, long_a) == _columns(features, long_b)  # only the first 24 bytes count
+
+
+def test_features_do_not_depend_on_the_batch():
+    features = HashedNgrams(bits=18)
+    texts = ["Tesla beats estimates", "Ölpreis fällt – Aktien unter Druck", "", "NVDA up 5%"]
+    rows, cols, counts = features.occurrences(texts)
+    for i, text in enumerate(texts):
+        assert sorted(cols[rows == i].tolist()) == _columns(features, text)
+    # No bigram spans two texts. Non-ASCII bytes are word bytes, so "–" is a word: 6 words + 5 bigrams
+    assert counts.tolist() == [5, 11, 0, 5]
+    # Rows are L2-normalized
+    _, _, values = features.entries(texts[:1])
+    assert np.isclose(np.sum(values ** 2), 1.0)
+
+
+def test_agreement_curve_and_threshold_selection():
+    predicted = ["Positive", "Positive", "Negative", "Neutral"]
+    labels = ["Positive", "Negative", "Negative", "Positive"]
+    confidence = np.array([0.95, 0.5, 0.8, 0.45])
+    curve = agreement_curve(predicted, confidence, labels, thresholds=[0.4, 0.6, 0.9])
+    assert curve == [{"threshold": 0.4, "coverage": 1.0, "agreement": 0.5},
+                     {"threshold": 0.6, "coverage": 0.5, "agreement": 1.0},
+                     {"threshold": 0.9, "coverage": 0.25, "agreement": 1.0}]
+    assert pick_threshold(curve, target=0.9) == 0.6
+    assert pick_threshold(curve, target=0.5) == 0.4
+    # Nothing reaches the target: escalate everything
+    assert pick_threshold([{"threshold": 0.4, "coverage": 1.0, "agreement": 0.3}], target=0.9) == 1.0
+
+
+def test_train_save_and_load(tmp_path):
+    rng = random.Random(0)
+    words = {"Positive": ["surges", "beats", "rallies"], "Negative": ["plunges", "misses", "slumps"],
+             "Neutral": ["holds", "reports", "schedules"]}
+    texts, labels = [], []
+    for i in range(600):
+        label = LABEL_ORDER[i % 3]
+        texts.append(f"company {rng.choice(words[label])} {rng.choice(['today', 'again', 'after earnings'])}")
+        labels.append(label)
+    model, report = train(texts, labels, bits=16)
+    assert report["accuracy"] > 0.95
+    assert report["threshold"] < 1.0
+    assert model.predict(["company surges today"])[0] == ["Positive"]
+
+    model.save(str(tmp_path), report)
+    loaded = LocalSentimentModel.load(str(tmp_path))
+    assert loaded.threshold == model.threshold
+    assert np.allclose(loaded.predict_proba(texts[:20]), model.predict_proba(texts[:20]))
+    assert LocalSentimentModel.load(str(tmp_path), threshold=0.99).threshold == 0.99
+
+
+def test_model_with_other_feature_version_is_refused(tmp_path):
+    LocalSentimentModel(np.zeros((3, 16)), np.zeros(3), LABEL_ORDER, bits=4).save(str(tmp_path))
+    meta_path = os.path.join(str(tmp_path), META_FILE)
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    assert meta["features"] == FEATURES_VERSION
+    meta["features"] = "words-v0"
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    with pytest.raises(ValueError, match="retrain"):
+        LocalSentimentModel.load(str(tmp_path))
+
+
+class FakeModel:
+    """Positive for "up" texts, with the confidence given by a "cNN" word (c90 -> 0.90)."""
+
+    threshold = 0.8
+
+    def predict(self, texts):
+        confidence = [int(next(w for w in t.split() if w.startswith("c"))[1:]) / 100 for t in texts]
+        return ["Positive" if "up" in t else "Negative" for t in texts], np.array(confidence)
+
+
+class FakeMatcher:
+    def match(self, text):
+        return [w[1:] for w in text.split() if w.startswith("$")]
+
+
+def _items():
+    return [{"id": "accepted", "title": "$TSLA up c95"},
+            {"id": "unsure", "title": "$TSLA up c50"},
+            {"id": "no_tickers", "title": "market up c99"},
+            {"id": "accepted2", "title": "$AAPL $MSFT down c90"}]
+
+
+def test_tier_accepts_only_confident_texts_with_tickers():
+    items = _items()
+    to_llm, local = _local_tier(items, ("title",), FakeModel(), FakeMatcher())
+    assert [item["id"] for item in to_llm] == ["unsure", "no_tickers"]
+    assert local == {id(items[1]): ("Positive", "escalated"), id(items[2]): ("Positive", "no_tickers")}
+    accepted = items[0]
+    assert (accepted["sentiment"], accepted["tickers"], accepted["analysis_tier"]) == ("Positive", ["TSLA"], "local")
+    assert accepted["local_confidence"] == 0.95
+    assert items[3]["tickers"] == ["AAPL", "MSFT"]
+    assert all(item["analysis_tier"] == "llm" for item in to_llm)
+
+
+def test_audit_sample_goes_to_the_llm(monkeypatch):
+    draws = iter([0.05, 0.5])
+    monkeypatch.setattr(llm_analyzer.random, "random", lambda: next(draws))
+    items = _items()
+    to_llm, local = _local_tier(items, ("title",), FakeModel(), FakeMatcher(), audit_rate=0.1)
+    # The first accepted text is drawn below audit_rate, the second is not
+    assert [item["id"] for item in to_llm] == ["accepted", "unsure", "no_tickers"]
+    assert local[id(items[0])] == ("Positive", "audited")
+    assert items[3]["analysis_tier"] == "local"
+
+
+def test_analyze_dataset_keeps_local_tickers_and_skips_their_calls(fake_llm):
+    analyzed = analyze_dataset(_items(), text_fields=("title",), local_model=FakeModel(), matcher=FakeMatcher())
+    by_id = {item["id"]: item for item in analyzed}
+    assert fake_llm.calls == 2
+    assert by_id["accepted"]["tickers"] == ["TSLA"]
+    assert by_id["accepted2"]["tickers"] == ["AAPL", "MSFT"]
+    assert by_id["accepted2"]["sentiment"] == "Negative"
+    assert by_id["unsure"]["analysis_tier"] == "llm"
+
+    # Without a matcher the tier is off: every text goes to the LLM
+    fake_llm.calls = 0
+    analyzed = analyze_dataset(_items(), text_fields=("title",), local_model=FakeModel())
+    assert fake_llm.calls == 4
+    assert not any(item.get("analysis_tier") == "local" for item in analyzed)
@@ -0,0 +1,117 @@
+# tests/test_metrics.py
+import json
+import re
+import threading
+import urllib.request
+
+import numpy as np
+import pytest
+
+from models.xgboost_model import CLASSES, MicroBatcher, Predictor, make_server
+from pipeline import metrics
+from sentiment.llm_analyzer import analyze_dataset
+
+SAMPLE = re.compile(r'^([a-z_]+)(?:\{(.*)\})? (\S+)$')
+
+
+@pytest.fixture
+def registry():
+    was_enabled = metrics.enabled()
+    metrics.enable()
+    metrics.REGISTRY.reset()
+    yield metrics.REGISTRY
+    metrics.REGISTRY.reset()
+    metrics.enable(was_enabled)
+
+
+def _parse(text):
+    """Prometheus text -> ({(name, labels): value}, {name: type})."""
+    samples, types = {}, {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split()
+            types[name] = kind
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        pairs = tuple(sorted(re.findall(r'(\w+)="([^"]*)"', labels or "")))
+        samples[name, pairs] = float(value)
+    return samples, types
+
+
+class ConstantModel:
+    def predict_proba(self, X):
+        return np.tile([0.2, 0.3, 0.5], (len(X), 1))
+
+
+def _scrape(batcher):
+    server = make_server(batcher, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics", timeout=10) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            return response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_exporter_reports_a_small_run(registry, fake_llm):
+    analyze_dataset([{"id": "1", "title": "$TSLA up"}, {"id": "2", "title": "$AAPL down"},
+                     {"id": "3", "title": "boom"}], max_workers=2)
+    metrics.record_llm_usage("gpt-4o-mini", {"prompt_tokens": 1000, "completion_tokens": 500})
+    batcher = MicroBatcher(Predictor(ConstantModel(), CLASSES, ["a"]))
+    batcher.predict_many([{"a": 1.0}, {"a": 2.0}], timeout=5)
+    batcher.close()
+
+    samples, types = _parse(_scrape(batcher))
+    assert types["items_total"] == "counter"
+    assert types["stage_seconds"] == "histogram"
+    assert samples["items_total", (("stage", "analyze"),)] == 3
+    assert samples["items_failed_total", (("stage", "analyze"),)] == 1
+    assert samples["items_total", (("stage", "predict"),)] == 2
+    assert samples["external_call_seconds_count", (("service", "llm"),)] == 3
+    assert samples["external_call_errors_total", (("service", "llm"),)] == 1
+    assert samples["llm_tokens_total", (("kind", "prompt"), ("model", "gpt-4o-mini"))] == 1000
+    assert samples["llm_cost_usd_total", (("model", "gpt-4o-mini"),)] == pytest.approx(0.00045)
+
+    # Histogram buckets are cumulative and end at the count
+    stage = (("stage", "analyze"),)
+    buckets = [v for (name, labels), v in samples.items()
+               if name == "stage_seconds_bucket" and dict(labels).get("stage") == "analyze"]
+    assert buckets == sorted(buckets)
+    assert samples["stage_seconds_bucket", (("le", "+Inf"), ("stage", "analyze"))] == 1
+    assert samples["stage_seconds_count", stage] == 1
+    assert samples["stage_seconds_sum", stage] > 0
+
+
+def test_histogram_buckets_and_dump(registry, tmp_path):
+    for value in (0.001, 0.02, 0.02, 7.0, 100.0):
+        metrics.observe("job_seconds", value, job="x")
+    with pytest.raises(KeyError):
+        with metrics.span("stage", stage="fails"):
+            raise KeyError("x")
+
+    samples, _ = _parse(registry.to_prometheus())
+
+    def bucket(le):
+        return samples["job_seconds_bucket", (("job", "x"), ("le", le))]
+
+    assert (bucket("0.005"), bucket("0.025"), bucket("5"), bucket("10"), bucket("+Inf")) == (1, 3, 3, 4, 5)
+    assert samples["job_seconds_sum", (("job", "x"),)] == pytest.approx(107.041)
+    assert samples["stage_errors_total", (("stage", "fails"),)] == 1
+
+    path = metrics.dump(str(tmp_path), prefix="run")
+    with open(path, encoding="utf-8") as f:
+        exported = json.load(f)
+    timer = next(t for t in exported["timers"] if t["name"] == "job_seconds")
+    assert (timer["count"], timer["labels"]) == (5, {"job": "x"})
+    assert (tmp_path / "run.prom").read_text(encoding="utf-8") == registry.to_prometheus()
+
+
+def test_disabled_metrics_record_nothing(registry):
+    metrics.enable(False)
+    metrics.inc("items_total", stage="x")
+    with metrics.span("stage", stage="x"):
+        pass
+    assert registry.to_prometheus() == "\n"
+    assert metrics.dump() is None
@@ -0,0 +1,89 @@
+# tests/test_packing.py
+import json
+import re
+
+from sentiment.cache import LLMCache
+from sentiment.packing import (
+    analyze_packed, build_packed_prompt, estimate_tokens, pack_documents, parse_packed_response,
+    truncate_document,
+)
+
+
+def _answer(entries):
+    return {"choices": [{"message": {"content": json.dumps(entries)}}]}
+
+
+def _documents(prompt):
+    return [json.loads(line) for line in prompt.splitlines() if line.startswith('{"id"')]
+
+
+def test_parse_keeps_valid_entries_only():
+    content = "```json\n" + json.dumps([
+        {"id": "1", "sentiment": "positive", "tickers": [" TSLA ", ""]},
+        {"id": "2", "sentiment": "Bullish", "tickers": []},       # unknown label
+        {"id": "3", "sentiment": "Neutral", "tickers": "AAPL"},   # tickers not a list
+        {"id": "4", "sentiment": "Neutral", "tickers": []},
+        {"id": "4", "sentiment": "Negative", "tickers": []},      # repeated id
+        {"id": "9", "sentiment": "Neutral", "tickers": []},       # not in the request
+        "garbage",
+    ]) + "\n```"
+    parsed = parse_packed_response(content, ["1", "2", "3", "4", "5"])
+    assert parsed == {"1": {"sentiment": "Positive", "tickers": ["TSLA"]}}
+
+
+def test_parse_wrapped_and_broken_answers():
+    wrapped = json.dumps({"results": [{"id": 1, "sentiment": "Negative", "tickers": []}]})
+    assert parse_packed_response(wrapped, ["1"]) == {"1": {"sentiment": "Negative", "tickers": []}}
+    assert parse_packed_response('[{"id": "1", "sentim', ["1"]) == {}
+    assert parse_packed_response(None, ["1"]) == {}
+
+
+def test_packs_respect_budget_and_order():
+    docs = [(str(i), "word " * (10 + i % 7)) for i in range(60)]
+    packs = pack_documents(docs, token_budget=400, max_docs=8)
+    assert [doc for pack in packs for doc in pack] == docs
+    for pack in packs:
+        assert len(pack) <= 8
+        assert estimate_tokens(build_packed_prompt(pack)) <= 400
+
+
+def test_truncation_keeps_title_lead_and_ticker_sentences():
+    body = "Opening remarks about the market. " + "Filler sentence without names. " * 30 + "Later $TSLA fell sharply."
+    text = truncate_document(["Big title", body], max_tokens=40)
+    assert text.startswith("Big title Opening remarks")
+    assert "$TSLA fell sharply." in text
+    assert len(text) <= 40 * 4 + 10
+
+
+def test_missing_entries_are_retried_alone(tmp_path):
+    prompts = []
+
+    def complete(prompt):
+        prompts.append(prompt)
+        docs = _documents(prompt)
+        # The first request drops every third document
+        keep = docs if len(prompts) > 1 else [d for n, d in enumerate(docs) if n % 3]
+        return _answer([{"id": d["id"], "sentiment": "Positive" if "up" in d["text"] else "Neutral",
+                         "tickers": re.findall(r"\$([A-Z]+)", d["text"])} for d in keep])
+
+    texts = [f"$T{chr(65 + i)} goes {'up' if i % 2 else 'flat'}" for i in range(9)] + ["$TA goes flat"]
+    cache = LLMCache(str(tmp_path / "cache.db"))
+    outcomes = analyze_packed(texts, complete, "m", cache=cache, token_budget=3000)
+    assert all(error is None for _, error in outcomes)
+    assert [r["tickers"] for r, _ in outcomes] == [[t.split()[0][1:]] for t in texts]
+    assert outcomes[-1] == outcomes[0]
+    # Nine distinct texts in one request, then only the three dropped ones
+    assert [len(_documents(p)) for p in prompts] == [9, 3]
+
+    # Cached results are not sent again
+    analyze_packed(texts, complete, "m", cache=cache)
+    assert len(prompts) == 2
+    cache.close()
+
+
+def test_failures_after_all_rounds():
+    def complete(prompt):
+        raise TimeoutError("upstream timeout")
+
+    outcomes = analyze_packed(["a", "b"], complete, "m", max_rounds=2)
+    assert outcomes == [(None, "TimeoutError: upstream timeout")] * 2
@@ -0,0 +1,129 @@
+# tests/test_price_cache.py
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from market import price_cache
+from market.price_cache import OHLCVCache
+from market.providers import StaticProvider
+
+
+def _bars(start, end):
+    index = pd.date_range(start, end, freq="B", inclusive="left", name="Date")
+    close = np.linspace(100, 110, len(index))
+    return pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close,
+                         "Volume": 1e6}, index=index)
+
+
+class OutageProvider(StaticProvider):
+    """StaticProvider that answers empty (like yfinance during an outage) or raises while `down`."""
+
+    def __init__(self, frames, raises=False):
+        super().__init__(frames)
+        self.down, self.raises = False, raises
+
+    def fetch_ohlcv(self, tickers, start, end, interval="1d"):
+        if self.down:
+            self.calls.append((tuple(tickers), start, end, interval))
+            if self.raises:
+                raise ConnectionError("provider unavailable")
+            return {}
+        return super().fetch_ohlcv(tickers, start, end, interval)
+
+
+@pytest.fixture
+def frames():
+    return {"TSLA": _bars("2023-01-02", "2024-07-01"), "AAPL": _bars("2023-01-02", "2024-07-01"),
+            "NEWCO": _bars("2024-03-01", "2024-07-01")}
+
+
+def _ranges(provider):
+    return [(tickers, str(start.date()), str(end.date())) for tickers, start, end, _ in provider.calls]
+
+
+def test_only_missing_ranges_are_fetched(tmp_path, frames):
+    provider = StaticProvider(frames)
+    cache = OHLCVCache(provider, str(tmp_path / "ohlcv.db"))
+    first = cache.get_ohlcv(["TSLA", "AAPL"], "2024-02-01", "2024-03-01")
+    assert _ranges(provider) == [(("TSLA", "AAPL"), "2024-02-01", "2024-03-01")]
+    assert len(first["TSLA"]) == 21
+
+    provider.calls.clear()
+    again = cache.get_ohlcv(["TSLA", "AAPL"], "2024-02-01", "2024-03-01")
+    assert provider.calls == []
+    pd.testing.assert_frame_equal(again["TSLA"], first["TSLA"], check_freq=False)
+
+    # Head and tail of a wider window; tickers missing the same range share one call
+    wider = cache.get_ohlcv(["TSLA", "AAPL"], "2024-01-01", "2024-04-01")
+    assert sorted(_ranges(provider)) == [(("TSLA", "AAPL"), "2024-01-01", "2024-02-01"),
+                                         (("TSLA", "AAPL"), "2024-03-01", "2024-04-01")]
+    pd.testing.assert_frame_equal(wider["TSLA"], frames["TSLA"].loc["2024-01-01":"2024-03-31"], check_freq=False)
+    cache.close()
+
+
+@pytest.mark.parametrize("raises", [False, True])
+def test_provider_outage_is_not_cached(tmp_path, frames, raises):
+    provider = OutageProvider(frames, raises=raises)
+    cache = OHLCVCache(provider, str(tmp_path / "ohlcv.db"))
+    cache.get_ohlcv(["TSLA"], "2024-02-01", "2024-03-01")
+
+    provider.down = True
+    assert cache.get_ohlcv(["TSLA"], "2024-02-01", "2024-04-01")["TSLA"].index.max() < pd.Timestamp("2024-03-01")
+    provider.down = False
+    provider.calls.clear()
+    assert len(cache.get_ohlcv(["TSLA"], "2024-02-01", "2024-04-01")["TSLA"]) == 21 + 21
+    assert _ranges(provider) == [(("TSLA",), "2024-03-01", "2024-04-01")]
+    assert not cache.is_invalid("TSLA")
+    cache.close()
+
+
+def test_empty_range_before_the_first_bar_is_covered(tmp_path, frames):
+    provider = StaticProvider(frames)
+    cache = OHLCVCache(provider, str(tmp_path / "ohlcv.db"))
+    cache.get_ohlcv(["NEWCO"], "2024-03-01", "2024-04-01")
+
+    # Pre-IPO head: empty, but the provider still serves NEWCO's first bars, so it is real
+    provider.calls.clear()
+    assert len(cache.get_ohlcv(["NEWCO"], "2024-01-01", "2024-04-01")["NEWCO"]) == 21
+    assert _ranges(provider)[0] == (("NEWCO",), "2024-01-01", "2024-03-01")
+    provider.calls.clear()
+    cache.get_ohlcv(["NEWCO"], "2024-01-01", "2024-04-01")
+    assert provider.calls == []
+    cache.close()
+
+
+def test_empty_head_during_an_outage_is_fetched_again(tmp_path, frames):
+    provider = OutageProvider(frames)
+    cache = OHLCVCache(provider, str(tmp_path / "ohlcv.db"))
+    cache.get_ohlcv(["TSLA"], "2024-03-01", "2024-04-01")
+    provider.down = True
+    cache.get_ohlcv(["TSLA"], "2024-01-01", "2024-04-01")
+    provider.down = False
+    provider.calls.clear()
+    assert len(cache.get_ohlcv(["TSLA"], "2024-01-01", "2024-04-01")["TSLA"]) == 65
+    assert _ranges(provider) == [(("TSLA",), "2024-01-01", "2024-03-01")]
+    cache.close()
+
+
+def test_unknown_symbol_is_cached_as_invalid_after_repeated_misses(tmp_path, frames, monkeypatch):
+    provider = StaticProvider(frames)
+    cache = OHLCVCache(provider, str(tmp_path / "ohlcv.db"))
+    assert cache.get_ohlcv(["FAKE"], "2024-01-01", "2024-02-01")["FAKE"].empty
+    # A second empty answer within MISS_INTERVAL is the same miss
+    assert "FAKE" in cache.get_ohlcv(["FAKE"], "2024-01-01", "2024-02-01")
+    assert not cache.is_invalid("FAKE")
+
+    monkeypatch.setattr(price_cache, "MISS_INTERVAL", timedelta(0))
+    assert "FAKE" not in cache.get_ohlcv(["FAKE", "TSLA"], "2024-01-01", "2024-02-01")
+    assert cache.is_invalid("FAKE")
+    provider.calls.clear()
+    assert list(cache.get_ohlcv(["FAKE", "TSLA"], "2024-01-01", "2024-02-01")) == ["TSLA"]
+    assert provider.calls == []
+
+    # A weekend-sized empty answer never marks a symbol invalid
+    assert "OTHER" in cache.get_ohlcv(["OTHER"], "2024-01-06", "2024-01-08")
+    assert "OTHER" in cache.get_ohlcv(["OTHER"], "2024-01-06", "2024-01-08")
+    assert not cache.is_invalid("OTHER")
+    cache.close()
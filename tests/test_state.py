@@ -0,0 +1,71 @@
+# tests/test_state.py
+from datetime import datetime
+
+import pytest
+
+from pipeline.state import PipelineState, parse_timestamp
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = PipelineState(str(tmp_path / "state.db"))
+    yield state
+    state.close()
+
+
+def _post(i, day, **extra):
+    return {"id": f"p{i}", "created_utc": f"2024-01-{day:02d}T12:00:00Z", **extra}
+
+
+def test_parse_timestamp_normalizes_to_naive_utc():
+    assert parse_timestamp("2024-01-05T12:00:00Z") == datetime(2024, 1, 5, 12)
+    assert parse_timestamp("2024-01-05T14:00:00+02:00") == datetime(2024, 1, 5, 12)
+    assert parse_timestamp("not a date") is None
+    assert parse_timestamp(None) is None
+
+
+def test_processed_records_are_filtered(state):
+    records = [_post(i, 10 + i) for i in range(3)]
+    assert state.new_records("reddit", records) == records
+    state.mark_processed("reddit", records[:2])
+    assert state.new_records("reddit", records) == records[2:]
+    assert state.watermark("reddit") == datetime(2024, 1, 11, 12)
+
+
+def test_watermark_grace_window(state):
+    state.mark_processed("reddit", [_post(0, 20)])
+    late = [_post(1, 19), _post(2, 10)]
+    # Within the late-arrival grace the ID decides; far behind the watermark the record is skipped
+    assert state.new_records("reddit", late) == late[:1]
+    # Batched callers pass the watermark read before the run
+    assert state.new_records("reddit", late, watermark=None) == late
+
+
+def test_watermark_never_moves_back(state):
+    state.mark_processed("reddit", [_post(0, 20)])
+    state.mark_processed("reddit", [_post(1, 5)])
+    assert state.watermark("reddit") == datetime(2024, 1, 20, 12)
+
+
+def test_failed_records_are_retried(state):
+    records = [_post(0, 10), _post(1, 12, analysis_error="timeout"), _post(2, 14)]
+    state.mark_processed("reddit", records)
+    # The watermark stops at the oldest failure, and the failure is not marked processed
+    assert state.watermark("reddit") == datetime(2024, 1, 12, 12)
+    assert state.new_records("reddit", records) == records[1:2]
+
+    retried = dict(records[1])
+    del retried["analysis_error"]
+    state.mark_processed("reddit", [retried])
+    assert state.new_records("reddit", records) == []
+
+
+def test_dirty_tickers(state):
+    state.mark_dirty("prices", ["TSLA", "AAPL", "", "TSLA"])
+    state.mark_dirty("features", ["TSLA"])
+    assert state.dirty_tickers("prices") == {"TSLA", "AAPL"}
+    state.clear_dirty("prices", ["TSLA"])
+    assert state.dirty_tickers("prices") == {"AAPL"}
+    state.clear_dirty("prices")
+    assert state.dirty_tickers("prices") == set()
+    assert state.dirty_tickers("features") == {"TSLA"}
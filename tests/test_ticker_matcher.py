@@ -0,0 +1,57 @@
+# tests/test_ticker_matcher.py
+import pytest
+
+from benchmarks.corpus import CorpusGenerator
+from market.ticker_matcher import UNIVERSE_FILE, TickerMatcher
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return TickerMatcher.from_file(UNIVERSE_FILE)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Tesla beats delivery estimates", ["TSLA"]),
+    ("tesla and nvda", ["TSLA"]),  # names are case-insensitive, symbols are not
+    ("NVDA and Nvidia", ["NVDA"]),
+    ("Berkshire Hathaway adds to BRK.B buyback", ["BRK-B"]),
+    ("$btc and $brk.b", ["BTC-USD", "BRK-B"]),
+    ("BTC-USD breaks out", ["BTC-USD"]),
+    ("Bought more $HOOD today", ["HOOD"]),
+    ("going to hood later", []),  # word-like symbols are cashtag-only
+    # Hyphenated compounds still reveal the company name
+    ("Tesla-backed startup raises funds", ["TSLA"]),
+    ("A Microsoft-Nvidia partnership", ["MSFT", "NVDA"]),
+    # ... but a symbol never matches on a fragment
+    ("T-Mobile and U-turns", []),
+    ("COST-cutting at MSFT", ["MSFT"]),
+    # Common-word names only match with their capitalization
+    ("Apple reports earnings", ["AAPL"]),
+    ("an apple a day", []),
+    ("ripple effects across markets as ether and tether rates rose", []),
+    ("Ripple and Ether rally", ["XRP-USD", "ETH-USD"]),
+    ("The team is bullish on rates", []),
+])
+def test_match(matcher, text, expected):
+    assert matcher.match(text) == expected
+
+
+def test_normalize(matcher):
+    assert matcher.normalize("$TSLA") == "TSLA"
+    assert matcher.normalize("BTC") == "BTC-USD"
+    assert matcher.normalize("brk.b") == "BRK-B"
+    assert matcher.normalize("Tesla") == "TSLA"
+    assert matcher.normalize("zzzz") == "ZZZZ"
+
+
+def test_accuracy_on_synthetic_corpus(matcher):
+    generator = CorpusGenerator(seed=3)
+    records = generator.reddit(4000, processed=True)
+    texts = [f"{r['title']} {r['body']}" for r in records]
+    results = [matcher.match(text) for text in texts]
+    expected = sum(len(r["tickers"]) for r in records)
+    hits = sum(len(set(r["tickers"]) & set(found)) for r, found in zip(records, results))
+    spurious = sum(len(set(found) - set(r["tickers"])) for r, found in zip(records, results))
+    # Bare word-like symbols ("HOOD") are cashtag-only by design, so recall stays below 1
+    assert hits / expected > 0.9
+    assert spurious == 0
@@ -0,0 +1,96 @@
+# tests/test_twitter.py
+import pytest
+
+from benchmarks.corpus import CorpusGenerator
+from benchmarks.stubs import StubTwitterServer
+from ingestion.twitter import SQLiteStorage, TwitterIngestor
+
+QUERIES = ("surges", "plunges", "earnings")
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "twitter.db"))
+    yield storage
+    storage.conn.close()
+
+
+def _ids(tweets):
+    return {t["id"] for t in tweets}
+
+
+def test_save_tweets_and_since_ids(storage):
+    tweets = CorpusGenerator(seed=1).tweets(250)
+    assert storage.save_tweets(tweets) == 250
+    assert storage.save_tweets(tweets[:10]) == 10  # replaced, not duplicated
+    assert storage.conn.execute("SELECT COUNT(*) FROM tweets").fetchone()[0] == 250
+    assert storage.save_tweets([]) == 0
+
+    assert storage.newest_id("q") is None
+    storage.set_newest_id("q", "1000")
+    storage.set_newest_id("q", "999")  # never moves back, compared as integers
+    storage.set_newest_id("other", "5")
+    assert storage.newest_id("q") == "1000"
+    assert storage.newest_id("other") == "5"
+
+
+def test_each_query_resumes_from_its_own_since_id(storage):
+    tweets = CorpusGenerator(seed=2).tweets(1500)
+    with StubTwitterServer(tweets, latency_ms=0, released=700) as api:
+        ingestor = TwitterIngestor(bearer_token="stub", storage=storage, search_url=api.search_url)
+        for round_ in ("backfill", "incremental"):
+            if round_ == "incremental":
+                # The second query used to skip tweets older than the first query's newest one
+                known = {q: _ids(api.matching(q)) for q in QUERIES}
+                api.release()
+            for query in QUERIES:
+                fetched = ingestor.fetch_recent(query, max_results=len(tweets), resume=True)
+                expected = _ids(api.matching(query))
+                if round_ == "incremental":
+                    expected -= known[query]
+                assert _ids(fetched) == expected
+                assert len(fetched) == len(expected)  # no page fetched twice
+                assert storage.newest_id(f"{query} lang:en") == max(api.matching(query), key=lambda t: int(t["id"]))["id"]
+        # Nothing new: one empty page per query
+        requests = api.requests
+        for query in QUERIES:
+            assert ingestor.fetch_recent(query, resume=True) == []
+        assert api.requests - requests == len(QUERIES)
+
+
+def test_pages_up_to_max_results(storage):
+    tweets = [{"id": str(100 + i), "text": f"stock surges {i}", "created_at": "2024-01-01T00:00:00.000Z"}
+              for i in range(250)]
+    with StubTwitterServer(tweets, latency_ms=0) as api:
+        ingestor = TwitterIngestor(bearer_token="stub", storage=storage, search_url=api.search_url)
+        fetched = ingestor.fetch_recent("surges", max_results=230)
+    assert len(fetched) == 230
+    assert api.requests == 3
+    assert [t["id"] for t in fetched] == [str(349 - i) for i in range(230)]
+
+
+def test_refresh_cut_at_max_results_fetches_the_rest_later(storage):
+    tweets = [{"id": str(100 + i), "text": f"stock surges {i}", "created_at": "2024-01-01T00:00:00.000Z"}
+              for i in range(400)]
+    with StubTwitterServer(tweets, latency_ms=0, released=50) as api:
+        ingestor = TwitterIngestor(bearer_token="stub", storage=storage, search_url=api.search_url)
+        first = ingestor.fetch_recent("surges", max_results=100, resume=True)
+        assert len(first) == 50
+        assert storage.gaps("surges lang:en") == []
+
+        api.release()  # 350 new matches, more than one refresh may fetch
+        fetched = _ids(first)
+        for _ in range(4):
+            batch = ingestor.fetch_recent("surges", max_results=100, resume=True)
+            assert len(batch) <= 100
+            assert not fetched & _ids(batch)
+            fetched |= _ids(batch)
+        assert fetched == _ids(tweets)
+        assert storage.gaps("surges lang:en") == []
+        assert storage.newest_id("surges lang:en") == "499"
+
+        # Once the gap is filled only newer tweets are fetched
+        api.tweets.append({"id": "500", "text": "stock surges again", "created_at": "2024-01-02T00:00:00.000Z"})
+        api._lowered.append("stock surges again")
+        api.release()
+        assert [t["id"] for t in ingestor.fetch_recent("surges", max_results=100, resume=True)] == ["500"]
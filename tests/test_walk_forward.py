@@ -0,0 +1,99 @@
+# tests/test_walk_forward.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.walk_forward import prepare, purged_kfold_folds, run_walk_forward, walk_forward_folds
+
+HOUR = pd.Timedelta(hours=1)
+
+
+def _times(n):
+    return pd.Series(pd.date_range("2024-01-01", periods=n, freq="h", tz="UTC"))
+
+
+def test_walk_forward_folds_train_only_on_the_past():
+    times = _times(60)
+    folds = walk_forward_folds(times, n_folds=5)
+    assert folds == [([(0, 10)], (10, 20)), ([(0, 20)], (20, 30)), ([(0, 30)], (30, 40)),
+                     ([(0, 40)], (40, 50)), ([(0, 50)], (50, 60))]
+
+    purged = walk_forward_folds(times, n_folds=5, purge=2 * HOUR)
+    assert [train for train, _ in purged] == [[(0, 8)], [(0, 18)], [(0, 28)], [(0, 38)], [(0, 48)]]
+    for [(_, train_stop)], (test_start, _) in purged:
+        # The newest training row is more than `purge` before the first test row
+        assert times[train_stop - 1] < times[test_start] - 2 * HOUR
+        assert times[train_stop] >= times[test_start] - 2 * HOUR
+
+    rolling = walk_forward_folds(times, n_folds=5, train_size=15)
+    assert [train for train, _ in rolling] == [[(0, 10)], [(5, 20)], [(15, 30)], [(25, 40)], [(35, 50)]]
+
+
+def test_purged_kfold_leaves_gaps_around_each_test_block():
+    times = _times(50)
+    folds = purged_kfold_folds(times, n_folds=5, purge=2 * HOUR, embargo=3 * HOUR)
+    assert folds[2] == ([(0, 18), (33, 50)], (20, 30))
+    assert folds[0] == ([(13, 50)], (0, 10))
+    assert folds[4] == ([(0, 38)], (40, 50))
+    for train, (test_start, test_stop) in folds:
+        gap = (times >= times[test_start] - 2 * HOUR) & (times <= times[test_stop - 1] + 3 * HOUR)
+        train_rows = np.concatenate([np.arange(a, b) for a, b in train])
+        # No training row inside the purge/embargo gap, and every row outside it is used
+        assert not gap[train_rows].any()
+        assert len(train_rows) == int((~gap).sum())
+
+
+def test_purge_works_on_irregular_timestamps():
+    # Several rows per timestamp: a test block's first timestamp is never also a training timestamp
+    times = pd.Series(pd.to_datetime(["2024-01-01"] * 4 + ["2024-01-02"] * 4 + ["2024-01-03"] * 4, utc=True))
+    folds = walk_forward_folds(times, n_folds=2)
+    for [(_, train_stop)], (test_start, _) in folds:
+        assert times[train_stop - 1] < times[test_start]
+
+
+def _features(n=120, label=False):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "ticker": "TSLA",
+        "timestamp": pd.date_range("2024-01-01", periods=n, freq="h", tz="UTC").astype(str)[::-1],
+        "avg_sentiment": rng.uniform(0, 2, n),
+        "mentions": rng.integers(0, 10, n),
+        "rsi_14": rng.uniform(0, 100, n),
+    })
+    df["sentiment_1h"] = df["avg_sentiment"] + rng.normal(0, 0.01, n)
+    df["sentiment_ewm_1d"] = df["avg_sentiment"]
+    if label:
+        df["label"] = np.where(df["rsi_14"] > 50, "BUY", "SELL")
+    return df
+
+
+def test_prepare_keeps_label_sources_out_of_the_inputs():
+    with pytest.warns(UserWarning, match="weak label"):
+        X, y, times, features, classes = prepare(_features())
+    assert features == ["mentions", "rsi_14"]
+    assert times.is_monotonic_increasing
+    assert X.shape == (120, 2)
+    assert classes == ["SELL", "HOLD", "BUY"]
+
+    # With a real label the sentiment features are legitimate inputs
+    _, _, _, features, classes = prepare(_features(label=True))
+    assert features == ["avg_sentiment", "mentions", "rsi_14", "sentiment_1h", "sentiment_ewm_1d"]
+    assert classes == ["SELL", "BUY"]
+
+
+def test_prepare_needs_a_label_source():
+    with pytest.raises(ValueError, match="avg_sentiment"):
+        prepare(_features().drop(columns=["avg_sentiment"]))
+    with pytest.raises(ValueError, match="timestamp"):
+        prepare(_features().drop(columns=["timestamp"]))
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_run_walk_forward(processes):
+    pytest.importorskip("xgboost")
+    results, summary = run_walk_forward(_features(label=True), grid={"max_depth": [2, 3]}, n_folds=3,
+                                        purge="2h", processes=processes)
+    assert len(results) == 6
+    assert set(summary["max_depth"]) == {2, 3}
+    assert results.groupby("fold")["test_start"].nunique().eq(1).all()
+    assert summary["accuracy"].min() > 0.8
@@ -0,0 +1,162 @@
+# tests/test_xgboost_model.py
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.xgboost_model import CLASSES, MicroBatcher, Predictor, make_server, train
+
+
+class FakeModel:
+    """predict_proba stand-in: BUY when feature "a" > 0, else SELL; records batch sizes."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.batches = []
+
+    def predict_proba(self, X):
+        self.batches.append(len(X))
+        time.sleep(self.latency)
+        buy = (np.nan_to_num(X[:, 0]) > 0).astype(float)
+        return np.column_stack((1 - buy, np.zeros(len(X)), buy))
+
+
+@pytest.fixture
+def model():
+    return FakeModel()
+
+
+@pytest.fixture
+def batcher(model):
+    batcher = MicroBatcher(Predictor(model, CLASSES, ["a", "b"]), max_batch=8, max_wait_ms=50)
+    yield batcher
+    batcher.close()
+
+
+def test_concurrent_requests_share_batches(batcher, model):
+    futures = [batcher.submit({"a": i - 10, "b": 0}) for i in range(20)]
+    results = [f.result(5) for f in futures]
+    assert [r["signal"] for r in results] == ["SELL"] * 11 + ["BUY"] * 9
+    assert max(model.batches) <= 8
+    assert len(model.batches) < 20
+    assert batcher.stats.summary()["requests"] == 20
+
+
+def test_malformed_row_only_fails_its_own_request(batcher):
+    good, bad, wrong_type = batcher.submit({"a": 1}), batcher.submit({"a": "x"}), batcher.submit([1, 2])
+    assert good.result(5)["signal"] == "BUY"
+    with pytest.raises(ValueError, match="not numeric"):
+        bad.result(5)
+    with pytest.raises(TypeError):
+        wrong_type.result(5)
+
+
+def test_close_answers_queued_requests_and_rejects_new_ones():
+    model = FakeModel(latency=0.01)
+    batcher = MicroBatcher(Predictor(model, CLASSES, ["a"]), max_batch=2, max_wait_ms=1)
+    futures = []
+
+    def submitter():
+        for _ in range(50):
+            try:
+                futures.append(batcher.submit({"a": 1}))
+            except RuntimeError:
+                return
+            time.sleep(0.001)
+
+    threads = [threading.Thread(target=submitter) for _ in range(4)]
+    for t in threads:
+        t.start()
+    time.sleep(0.02)
+    batcher.close()
+    for t in threads:
+        t.join()
+    # Every request accepted before close() is answered, none is left pending
+    assert futures and all(f.done() for f in futures)
+    assert all(f.result()["signal"] == "BUY" for f in futures)
+    with pytest.raises(RuntimeError, match="closed"):
+        batcher.submit({"a": 1})
+
+
+def test_request_racing_close_is_answered(model):
+    batcher = MicroBatcher(Predictor(model, CLASSES, ["a"]), max_wait_ms=1)
+    put, closer = batcher._queue.put, threading.Thread(target=batcher.close)
+
+    def slow_put(item):
+        # close() starts between the stopped check and the enqueue
+        closer.start()
+        time.sleep(0.3)
+        put(item)
+
+    batcher._queue.put = slow_put
+    future = batcher.submit({"a": 1})
+    closer.join(5)
+    assert future.result(2)["signal"] == "BUY"
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_server_status_codes(batcher, monkeypatch):
+    server = make_server(batcher, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/predict"
+    try:
+        status, body = _post(url, {"features": {"a": 2}})
+        assert (status, body["signal"]) == (200, "BUY")
+        status, body = _post(url, {"rows": [{"a": 1}, {"a": -1}]})
+        assert [p["signal"] for p in body["predictions"]] == ["BUY", "SELL"]
+        assert _post(url, {"features": {"a": "high"}})[0] == 400
+
+        def timed_out(*args, **kwargs):
+            raise FutureTimeoutError()
+
+        monkeypatch.setattr(batcher, "predict", timed_out)
+        assert _post(url, {"features": {"a": 2}})[0] == 504
+        monkeypatch.undo()
+
+        batcher.close()
+        status, body = _post(url, {"features": {"a": 2}})
+        assert status == 503 and "closed" in body["error"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _frame(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"ticker": "TSLA", "timestamp": pd.date_range("2024-01-01", periods=n, freq="h"),
+                       "momentum": rng.normal(size=n), "noise": rng.normal(size=n)})
+    df["label"] = np.where(df["momentum"] > 0.5, "BUY", np.where(df["momentum"] < -0.5, "SELL", "HOLD"))
+    return df
+
+
+def test_train_saves_a_loadable_model(tmp_path):
+    pytest.importorskip("xgboost")
+    meta = train(_frame(), str(tmp_path), params={"n_estimators": 50})
+    assert meta["features"] == ["momentum", "noise"]
+    assert meta["validation_accuracy"] > 0.8
+    predictor = Predictor.load(str(tmp_path))
+    assert predictor.classes == CLASSES
+    assert predictor.predict_rows([{"momentum": 2.0, "noise": 0.0}])[0]["signal"] == "BUY"
+
+
+def test_train_needs_two_classes(tmp_path):
+    pytest.importorskip("xgboost")
+    df = _frame().assign(label="HOLD")
+    with pytest.raises(ValueError, match="two label classes"):
+        train(df, str(tmp_path))